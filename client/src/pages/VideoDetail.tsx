@@ -39,6 +39,13 @@ export default function VideoDetail() {
       retryDelay: 1000,
     }
   );
+  const { data: partialResults } = trpc.videoAnalysis.getPartialResults.useQuery(
+    { videoId },
+    {
+      enabled: analysisProgress?.status === "processing",
+      refetchInterval: 5000, // Finished tracks arrive as the analysis runs
+    }
+  );
   const { data: analysisResults } = trpc.videoAnalysis.getResults.useQuery(
     { videoId },
     { enabled: analysisProgress?.status === "completed" }
@@ -246,6 +253,21 @@ export default function VideoDetail() {
                         {analysisProgress.message}
                       </p>
                     )}
+                    {partialResults && partialResults.playerTracking.length > 0 && (
+                      <div className="space-y-2">
+                        <p className="text-sm font-medium">
+                          {partialResults.playerTracking.length} player tracks finished so far
+                        </p>
+                        {partialResults.playerTracking.map((player) => (
+                          <div key={player.trackId} className="flex justify-between text-sm text-muted-foreground">
+                            <span>Player Track #{player.trackId}</span>
+                            <span>
+                              {player.metrics.totalDistance}m, max {player.metrics.maxSpeed} km/h
+                            </span>
+                          </div>
+                        ))}
+                      </div>
+                    )}
                   </div>
                 )}
 
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Batch Video Analysis Script
+Analyzes every video in a directory or manifest with a pool of
+persistent `analyze_video.py --serve` workers, so each worker process
+loads the models once and keeps them for all the videos it runs.
+Emits one aggregated progress stream on stdout and a run summary, and
+resumes an interrupted run by skipping videos already completed.
+
+Manifest files are either JSON (a list of {"videoPath", "videoId"}
+objects, videoId optional) or plain text with one video path per line.
+"""
+
+import os
+import sys
+import json
+import argparse
+import queue
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from inference_backends import BACKENDS
+from profiles import PROFILES
+
+ANALYZE_SCRIPT = Path(__file__).resolve().with_name('analyze_video.py')
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.m4v')
+
+# Completed videos are appended here as they finish, for resuming
+BATCH_LOG = 'batch_log.ndjson'
+BATCH_SUMMARY = 'batch_summary.json'
+
+# analyze_batch.py flag -> worker job field
+JOB_ARGS = {
+    'batch_size': 'batchSize',
+    'queue_size': 'queueSize',
+    'target_fps': 'targetFps',
+    'motion_threshold': 'motionThreshold',
+    'max_gap': 'maxGap',
+    'output_format': 'outputFormat',
+    'pose_mode': 'poseMode',
+    'rink_calibration': 'rinkCalibration',
+    'motion_compensation': 'motionCompensation',
+    'detect_events': 'events',
+    'puck_tracking': 'puckTracking'
+}
+
+
+def emit(message):
+    """Write one aggregated progress message to stdout"""
+    print(json.dumps(message), flush=True)
+
+
+def video_id_for(path, root):
+    """Video ID from a path relative to the input directory, e.g. day1/game3.mp4 -> day1-game3"""
+    return '-'.join(path.relative_to(root).with_suffix('').parts)
+
+
+def find_videos(source):
+    """[{"videoPath", "videoId"}] for a directory of videos or a manifest file"""
+    source = Path(source)
+    if source.is_dir():
+        videos = [
+            {'videoPath': str(path), 'videoId': video_id_for(path, source)}
+            for path in sorted(source.rglob('*'))
+            if path.suffix.lower() in VIDEO_EXTENSIONS and path.is_file()
+        ]
+    elif source.suffix.lower() == '.json':
+        with open(source) as f:
+            entries = json.load(f)
+        videos = [
+            {'videoPath': entry['videoPath'], 'videoId': entry.get('videoId') or Path(entry['videoPath']).stem}
+            for entry in entries
+        ]
+    else:
+        with open(source) as f:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        videos = [{'videoPath': path, 'videoId': Path(path).stem} for path in paths]
+
+    seen = set()
+    for video in videos:
+        if video['videoId'] in seen:
+            raise ValueError(f"Duplicate video ID: {video['videoId']}")
+        seen.add(video['videoId'])
+    return videos
+
+
+def load_completed(output_dir):
+    """Video IDs recorded as completed in the batch log whose output still exists"""
+    completed = {}
+    log_path = os.path.join(output_dir, BATCH_LOG)
+    if not os.path.exists(log_path):
+        return completed
+    with open(log_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partially written by an interrupted run
+            if record.get('status') == 'completed' and os.path.exists(record.get('outputPath', '')):
+                completed[record['videoId']] = record
+    return completed
+
+
+class AnalysisWorker:
+    """One `analyze_video.py --serve` process that runs one video at a time"""
+
+    def __init__(self, index, serve_args, threads):
+        self.index = index
+        self.serve_args = serve_args
+        self.threads = threads
+        self.process = None
+        self.last_error = None
+
+    def start(self):
+        env = dict(os.environ, OMP_NUM_THREADS=str(self.threads))
+        self.process = subprocess.Popen(
+            # Exported backends ignore OMP_NUM_THREADS, so their thread pools are capped explicitly
+            [sys.executable, str(ANALYZE_SCRIPT), '--serve', '--intra-op-threads', str(self.threads),
+             *self.serve_args],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # Merged so a job's ERROR line arrives before its jobComplete
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env=env
+        )
+        # Models are loaded before the worker announces it is ready
+        for message in self._messages():
+            if message.get('type') == 'ready':
+                return True
+        self.stop()
+        return False
+
+    def _messages(self):
+        """
+        JSON messages from the worker's output until it exits. Errors and
+        warnings are passed on to stderr; model log lines are dropped.
+        """
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                if line.startswith(('ERROR', 'WARNING')):
+                    sys.stderr.write(f"[worker {self.index}] {line}")
+                    if line.startswith('ERROR'):
+                        self.last_error = line.strip()
+                continue
+            if isinstance(message, dict):
+                yield message
+
+    def run(self, job, on_message):
+        """Run one job and return its exit code; restarts the worker if it has died"""
+        if self.process is None or self.process.poll() is not None:
+            if not self.start():
+                return 1
+        self.last_error = None
+        try:
+            self.process.stdin.write(json.dumps(job) + '\n')
+            self.process.stdin.flush()
+        except OSError:
+            self.stop()
+            return 1
+
+        for message in self._messages():
+            if message.get('type') == 'jobComplete' and message.get('jobId') == job['jobId']:
+                return message['exitCode']
+            on_message(message)
+        self.stop()  # Exited mid-job
+        return 1
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+class BatchProgress:
+    """Aggregates per-video progress from all workers into one stream and the run summary"""
+
+    def __init__(self, total, skipped):
+        self.lock = threading.Lock()
+        self.total = total
+        self.skipped = skipped
+        self.started = time.perf_counter()
+        self.progress = {}
+        self.results = []
+
+    def update(self, video_id, message):
+        if message.get('type') != 'progress':
+            return
+        with self.lock:
+            state = self.progress.setdefault(video_id, {'progress': 0, 'totalFrames': 0})
+            state['progress'] = message['progress']
+            state['totalFrames'] = message.get('totalFrames') or state['totalFrames']
+            emit({
+                'type': 'progress',
+                'progress': self._overall(),
+                'videoId': video_id,
+                'videoProgress': message['progress'],
+                'videosCompleted': len(self.results),
+                'videosTotal': self.total,
+                'message': message.get('message', '')
+            })
+
+    def _overall(self):
+        if not self.total:
+            return 100
+        return int(sum(state['progress'] for state in self.progress.values()) / self.total)
+
+    def finish(self, video, status, wall_seconds, error=None):
+        with self.lock:
+            state = self.progress.setdefault(video['videoId'], {'progress': 0, 'totalFrames': 0})
+            state['progress'] = 100
+            frames = state['totalFrames'] if status == 'completed' else 0
+            record = {
+                'videoId': video['videoId'],
+                'videoPath': video['videoPath'],
+                'outputPath': video['outputPath'],
+                'status': status,
+                'wallSeconds': round(wall_seconds, 2),
+                'frames': frames,
+                'framesPerSecond': round(frames / wall_seconds, 2) if wall_seconds > 0 else 0
+            }
+            if error:
+                record['error'] = error
+            self.results.append(record)
+            emit({'type': 'videoComplete', **record, 'videosCompleted': len(self.results), 'videosTotal': self.total})
+            return record
+
+    def summary(self):
+        wall_seconds = time.perf_counter() - self.started
+        frames = sum(record['frames'] for record in self.results)
+        failed = [record for record in self.results if record['status'] != 'completed']
+        return {
+            'videos': self.total + self.skipped,
+            'completed': len(self.results) - len(failed),
+            'skipped': self.skipped,
+            'failed': len(failed),
+            'wallSeconds': round(wall_seconds, 2),
+            'frames': frames,
+            'framesPerSecond': round(frames / wall_seconds, 2) if wall_seconds > 0 else 0,
+            'failures': [{'videoId': record['videoId'], 'error': record.get('error')} for record in failed],
+            'perVideo': self.results
+        }
+
+
+def run_batch(videos, output_dir, jobs=1, resume=True, job_options=None, serve_args=()):
+    """
+    Analyze `videos` with `jobs` worker processes, writing results to
+    output_dir. Returns the run summary, which is also saved there.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    job_options = job_options or {}
+    extension = 'ndjson' if job_options.get('outputFormat') == 'ndjson' else 'json'
+
+    completed = load_completed(output_dir) if resume else {}
+    pending = [video for video in videos if video['videoId'] not in completed]
+    # Longest videos first, so the run doesn't end waiting on one big file
+    pending.sort(key=lambda video: os.path.getsize(video['videoPath']) if os.path.exists(video['videoPath']) else 0,
+                 reverse=True)
+    for video in pending:
+        video['outputPath'] = os.path.join(output_dir, f"{video['videoId']}.{extension}")
+
+    jobs = max(1, min(jobs, len(pending)))
+    progress = BatchProgress(len(pending), len(videos) - len(pending))
+    emit({'type': 'batchStart', 'videos': len(videos), 'pending': len(pending),
+          'skipped': len(videos) - len(pending), 'workers': jobs})
+
+    work = queue.Queue()
+    for video in pending:
+        work.put(video)
+    log_lock = threading.Lock()
+    log_file = open(os.path.join(output_dir, BATCH_LOG), 'a')
+
+    def worker_loop(index):
+        worker = AnalysisWorker(index, serve_args, threads=max(1, (os.cpu_count() or 1) // jobs))
+        try:
+            while True:
+                try:
+                    video = work.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                job = {'jobId': video['videoId'], **video, **job_options}
+                exit_code = worker.run(job, lambda message: progress.update(video['videoId'], message))
+                status = 'completed' if exit_code == 0 else 'failed'
+                error = None if exit_code == 0 else (worker.last_error or f"Exit code {exit_code}")
+                record = progress.finish(video, status, time.perf_counter() - started, error)
+                with log_lock:
+                    log_file.write(json.dumps(record) + '\n')
+                    log_file.flush()
+        finally:
+            worker.stop()
+
+    threads = [threading.Thread(target=worker_loop, args=(i,), name=f'batch-worker-{i}') for i in range(jobs)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        log_file.close()
+
+    summary = progress.summary()
+    with open(os.path.join(output_dir, BATCH_SUMMARY), 'w') as f:
+        json.dump(summary, f, indent=2)
+    emit({'type': 'batchSummary', **summary})
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of hockey videos")
+    parser.add_argument("source", help="Directory of videos, or a .json / text manifest")
+    parser.add_argument("output_dir", help="Directory for the results, batch log and summary")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Videos analyzed at once, each in its own worker process with its own models")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Re-analyze videos the batch log already records as completed")
+    parser.add_argument("--profile", choices=PROFILES, default=None,
+                        help="Performance profile the workers load and run every video with")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Inference backend the workers run the models on, overriding the profile's")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--target-fps", type=float, default=None)
+    parser.add_argument("--motion-threshold", type=float, default=None)
+    parser.add_argument("--max-gap", type=float, default=None)
+    parser.add_argument("--output-format", choices=('json', 'ndjson'), default=None)
+    parser.add_argument("--pose-mode", choices=('frame', 'crops'), default=None)
+    parser.add_argument("--rink-calibration", action="store_true", default=None,
+                        help="Compute metrics in rink meters from the rink markings")
+    parser.add_argument("--motion-compensation", action="store_true", default=None,
+                        help="Take camera pans and zooms out of player movement")
+    parser.add_argument("--no-events", dest="detect_events", action="store_false", default=None,
+                        help="Don't detect game events")
+    parser.add_argument("--puck-tracking", action="store_true", default=None,
+                        help="Track the puck and output its trajectory")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Don't read or write the result cache")
+    args = parser.parse_args()
+
+    try:
+        videos = find_videos(args.source)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(2)
+
+    job_options = {field: getattr(args, arg) for arg, field in JOB_ARGS.items() if getattr(args, arg) is not None}
+    serve_args = ['--no-cache'] if args.no_cache else []
+    if args.profile:
+        serve_args += ['--profile', args.profile]
+    if args.backend:
+        serve_args += ['--backend', args.backend]
+    summary = run_batch(
+        videos,
+        args.output_dir,
+        jobs=args.jobs,
+        resume=not args.no_resume,
+        job_options=job_options,
+        serve_args=serve_args
+    )
+    sys.exit(1 if summary['failed'] else 0)
@@ -4,25 +4,45 @@ Hockey Video Analysis Script
 Uses YOLOv8 for player detection, tracking, and pose estimation
 """
 
+import os
 import sys
 import json
+import argparse
 import cv2
 import numpy as np
 from pathlib import Path
-from ultralytics import YOLO
-from collections import defaultdict
 import time
+import shutil
+from contextlib import nullcontext
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import torch
 
-# Custom JSON encoder to handle numpy types
-class NumpyEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (np.integer, np.int32, np.int64)):
-            return int(obj)
-        elif isinstance(obj, (np.floating, np.float32, np.float64)):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        return super().default(obj)
+from batch_inference import TRACK_BUFFER, TRACKER_CONFIG, ReplayTracker, reset_tracking, track_batch
+from pipeline import FramePipeline
+from sampling import SamplingPolicy, merge_sampling_stats, sample_frames
+from segmented_analysis import DEFAULT_OVERLAP_SECONDS, plan_segments, stitch_segments
+from track_store import KEYPOINT_NAMES, PoseStore, TrackStore
+from metrics import (
+    compute_track_metrics, frame_points, frame_positions, skating_angles, summarize_metrics, track_positions
+)
+from inference_store import InferenceRecorder
+from instrumentation import Instrumentation, profiled, stage_timer
+from association import associate_poses
+from pose_crops import POSE_CROP_PADDING, POSE_CROP_SIZE, estimate_crop_poses
+from inference_backends import BACKENDS, DEFAULT_EXPORT_DIR
+from profiles import (
+    DEFAULT_PROFILE, PROFILES, get_profile, inference_args, load_profile_models, precision_args
+)
+from result_writer import OUTPUT_FORMATS, copy_result, open_result_writer
+from result_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache, code_version, hash_file
+from rink_calibration import (
+    CHECK_INTERVAL_SECONDS, DEFAULT_CALIBRATION_DIR, CalibrationCache, RinkCalibrator, RinkMapping,
+    calibration_key, calibration_stats
+)
+from camera_motion import CameraMotion, CameraMotionEstimator
+from event_detection import EventDetector
+from puck_tracking import PuckTracker, PuckTrajectory, puck_stats
 
 def send_progress(progress, current_frame, total_frames, message):
     """Send progress update to Node.js via stdout"""
@@ -35,27 +55,428 @@ def send_progress(progress, current_frame, total_frames, message):
     }
     print(json.dumps(progress_data), flush=True)
 
-def calculate_distance(point1, point2):
-    """Calculate Euclidean distance between two points"""
-    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+POSE_CONF = 0.3
 
-def pixels_to_meters(pixels, reference_pixels_per_meter=50):
-    """Convert pixels to meters (rough estimation)"""
-    # This is a rough estimation - in production, use perspective transformation
-    # based on rink dimensions
-    return pixels / reference_pixels_per_meter
+# Detection settings shared by the per-frame and batched paths
+DETECTION_ARGS = {
+    'classes': [0],  # person class
+    'conf': 0.3,
+    'iou': 0.5
+}
+POSE_INTERVAL = 5  # Run pose estimation every N frames
+# 'frame' runs pose over the whole frame; 'crops' only over the tracked player boxes
+POSE_MODES = ('frame', 'crops')
+FLUSH_INTERVAL_SECONDS = 5  # How often streaming output writes finished tracks
+WARMUP_FRAME_SIZE = (720, 1280)  # Frame shape pushed through the models at worker startup
 
-def analyze_video(video_path, video_id, output_path):
+# Cached results expire whenever any of the analysis modules change
+CODE_VERSION = code_version(Path(__file__).resolve().parent.glob('*.py'))
+
+def load_models(profile=DEFAULT_PROFILE, runtime_options=None):
+    """
+    Load the detection and pose models of a performance profile (see
+    profiles.PROFILES). runtime_options may set the 'backend' (overriding
+    the profile's), 'export_dir', 'intra_op_threads' and 'inter_op_threads'
+    (see inference_backends).
+    """
+    runtime_options = dict(runtime_options or {})
+    backend = runtime_options.pop('backend', None)
+    return load_profile_models(get_profile(profile, backend), **runtime_options)
+
+def warm_up_models(detection_model, pose_model, profile=DEFAULT_PROFILE):
+    """
+    Run a blank frame through both models so predictor setup, layer
+    fusion and device initialization happen before the first real job
+    """
+    frame = np.zeros(WARMUP_FRAME_SIZE + (3,), dtype=np.uint8)
+    model_args = inference_args(get_profile(profile))
+    detection_model.track(frame, persist=True, tracker=TRACKER_CONFIG, verbose=False, **DETECTION_ARGS, **model_args)
+    pose_model(frame, conf=POSE_CONF, verbose=False, **model_args)
+    reset_tracking(detection_model)
+
+def detection_arrays(detection_result):
+    """(track_ids, xyxy boxes, confidences) of one frame's tracked detections"""
+    boxes = detection_result.boxes
+    if boxes is None or len(boxes) == 0:
+        return [], np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+    
+    # Get tracking IDs (detection order if the tracker assigned none)
+    track_ids = boxes.id.int().tolist() if boxes.id is not None else list(range(len(boxes)))
+    
+    return track_ids, boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()
+
+def pose_arrays(pose_result):
+    """(keypoints (n, 17, 3), person boxes (n, 4)) of one frame's pose estimates"""
+    if pose_result.keypoints is None:
+        return np.empty((0, len(KEYPOINT_NAMES), 3), dtype=np.float32), np.empty((0, 4), dtype=np.float32)
+    
+    keypoints = pose_result.keypoints.data.cpu().numpy()[:, :len(KEYPOINT_NAMES)]
+    return keypoints, pose_result.boxes.xyxy.cpu().numpy()
+
+def record_poses(pose_data, frame_number, timestamp, detections, poses):
+    """
+    Append one frame's pose estimates to the pose store under the track
+    IDs of the player boxes they match; unmatched poses are dropped
+    """
+    track_ids, track_boxes, _ = detections
+    keypoints, pose_boxes = poses
+    track_ids, keypoints = associate_poses(keypoints, pose_boxes, track_ids, track_boxes)
+    
+    # Body lean from the shoulder and hip keypoints
+    pose_data.add_frame(frame_number, timestamp, track_ids, keypoints, skating_angles(keypoints))
+
+def send_cache_stats(cache, hit):
+    """Send the result cache lookup outcome and counters to Node.js via stdout"""
+    print(json.dumps({"type": "cache", "hit": hit, **cache.stats()}), flush=True)
+
+def result_cache_key(video_path, target_fps, motion_threshold, max_gap_seconds, output_format,
+                     binary_output, inference_output, workers, segment_overlap, pose_mode, profile,
+                     backend=None, rink_calibration=False, motion_compensation=False, detect_events=True,
+                     puck_tracking=False):
+    """Cache key covering the video's content and every setting that changes the results"""
+    return ResultCache.key(
+        hash_file(video_path),
+        profile=get_profile(profile, backend),
+        detectionArgs=DETECTION_ARGS,
+        poseConf=POSE_CONF,
+        tracker=TRACKER_CONFIG,
+        poseInterval=POSE_INTERVAL,
+        poseMode=pose_mode,
+        poseCrops={'padding': POSE_CROP_PADDING, 'size': POSE_CROP_SIZE} if pose_mode == 'crops' else None,
+        targetFps=target_fps,
+        motionThreshold=motion_threshold,
+        maxGap=max_gap_seconds,
+        outputFormat=output_format,
+        binaryOutput=bool(binary_output),
+        inferenceOutput=bool(inference_output),
+        # Stitched track IDs can differ from a single-process run's
+        workers=workers,
+        segmentOverlap=segment_overlap if workers > 1 else None,
+        rinkCalibration=rink_calibration,
+        motionCompensation=motion_compensation,
+        events=detect_events,
+        puckTracking=puck_tracking,
+        codeVersion=CODE_VERSION
+    )
+
+def send_pipeline_stats(stats):
+    """Send pipeline stage throughput and queue depths to Node.js via stdout"""
+    print(json.dumps({"type": "pipeline", **stats}), flush=True)
+
+def send_metrics(instruments):
+    """Send per-stage timings, frames per second and memory use to Node.js via stdout"""
+    print(json.dumps({"type": "metrics", **instruments.snapshot()}), flush=True)
+
+def infer_frame_batch(batch, detection_model, pose_model, tracker, pose_mode='frame', profile=DEFAULT_PROFILE,
+                      instruments=None):
+    """
+    Run detection, tracking and pose estimation on a batch of
+    (frame_number, timestamp, frame, run_pose) tuples.
+    
+    With no tracker each frame goes through `detection_model.track`
+    individually; otherwise detection runs once over the whole batch and
+    the tracker is replayed frame by frame in order. pose_mode 'crops'
+    estimates poses on crops of the tracked boxes (see pose_crops)
+    instead of on the full frames. profile sets the model input size and
+    precision. Detection and pose are timed into instruments if given.
+    
+    Returns the per-frame detection results and a {frame_number:
+    (keypoints, pose boxes)} dict for the frames that got pose estimation.
+    """
+    model_args = inference_args(get_profile(profile))
+    with stage_timer(instruments, 'detection'):
+        if tracker is None:
+            detection_results = [
+                detection_model.track(
+                    frame,
+                    persist=True,
+                    tracker=TRACKER_CONFIG,
+                    **DETECTION_ARGS,
+                    **model_args
+                )[0]
+                for _, _, frame, _ in batch
+            ]
+        else:
+            detection_results = track_batch(
+                detection_model,
+                tracker,
+                [frame for _, _, frame, _ in batch],
+                **DETECTION_ARGS,
+                **model_args
+            )
+    
+    # Run pose estimation every few frames (to save processing time)
+    pose_results = {}
+    pose_batch = [(item, result) for item, result in zip(batch, detection_results) if item[3]]
+    if pose_batch and pose_mode == 'crops':
+        with stage_timer(instruments, 'pose'):
+            poses = estimate_crop_poses(
+                pose_model,
+                [frame for (_, _, frame, _), _ in pose_batch],
+                [detection_arrays(result)[1] for _, result in pose_batch],
+                conf=POSE_CONF,
+                **precision_args(get_profile(profile))
+            )
+        pose_results = {frame_number: pose for ((frame_number, _, _, _), _), pose in zip(pose_batch, poses)}
+    elif pose_batch:
+        with stage_timer(instruments, 'pose'):
+            results = pose_model([frame for (_, _, frame, _), _ in pose_batch], conf=POSE_CONF, **model_args)
+            pose_results = {
+                frame_number: pose_arrays(result)
+                for ((frame_number, _, _, _), _), result in zip(pose_batch, results)
+            }
+    
+    return detection_results, pose_results
+
+def open_calibrator(fps, calibration_dir, cache_key):
+    """RinkCalibrator checking the scene every CHECK_INTERVAL_SECONDS, sharing transforms through calibration_dir"""
+    cache = None
+    if cache_key is not None:
+        try:
+            cache = CalibrationCache(calibration_dir)
+        except OSError as e:
+            print(f"WARNING: Rink calibration cache disabled: {str(e)}", file=sys.stderr)
+    return RinkCalibrator(int(round(CHECK_INTERVAL_SECONDS * fps)), cache, cache_key)
+
+# This process's models when it is a segment worker (see init_segment_worker)
+segment_models = None
+
+def init_segment_worker(threads, profile=DEFAULT_PROFILE, runtime_options=None):
+    """Segment process initializer: cap intra-op threads and load this process's own models"""
+    global segment_models
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    runtime_options = dict(runtime_options or {})
+    runtime_options['intra_op_threads'] = runtime_options.get('intra_op_threads') or threads
+    segment_models = load_models(profile, runtime_options)
+
+def analyze_segment(video_path, fps, decode_start, end_frame, batch_size, queue_size, sampling_options,
+                    pose_mode='frame', profile=DEFAULT_PROFILE, calibration=None, motion_compensation=False,
+                    puck_tracking=False):
+    """
+    Analyze source frames decode_start..end_frame in a segment worker
+    process, with a fresh tracker and a decoder seeked to decode_start.
+    Returns the analyzed frames as (frame_number, timestamp, detections,
+    poses) tuples plus the segment's sampling and pipeline stats, its
+    Instrumentation, its RinkCalibrator (None unless `calibration`, a
+    (calibration_dir, cache key) pair, is given), its
+    CameraMotionEstimator (None unless motion_compensation) and its
+    PuckTracker (None unless puck_tracking).
+    """
+    detection_model, pose_model = segment_models
+    reset_tracking(detection_model)
+    tracker = ReplayTracker(TRACKER_CONFIG) if batch_size > 1 else None
+    sampling = SamplingPolicy(fps, pose_interval=POSE_INTERVAL, **sampling_options)
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    if decode_start > 1:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, decode_start - 1)
+    
+    frames = []
+    instruments = Instrumentation()
+    calibrator = None
+    if calibration is not None:
+        calibrator = open_calibrator(fps, *calibration)
+    estimator = CameraMotionEstimator() if motion_compensation else None
+    puck_tracker = PuckTracker() if puck_tracking else None
+    
+    def infer(batch):
+        return infer_frame_batch(batch, detection_model, pose_model, tracker, pose_mode, profile, instruments)
+    
+    def aggregate(batch, output):
+        detection_results, pose_results = output
+        if calibrator is not None:
+            with instruments.time('calibration'):
+                for frame_number, _, frame, _ in batch:
+                    calibrator.update(frame_number, frame)
+        for (frame_number, timestamp, frame, _), detection_result in zip(batch, detection_results):
+            with instruments.time('postprocess'):
+                poses = pose_results.get(frame_number, (None, None))
+                detections = detection_arrays(detection_result)
+                frames.append((frame_number, timestamp, detections, poses))
+            if estimator is not None:
+                with instruments.time('motion'):
+                    estimator.update(frame_number, frame, detections[1])
+            if puck_tracker is not None:
+                with instruments.time('puck'):
+                    puck_tracker.update(frame_number, timestamp, frame)
+    
+    pipeline = FramePipeline(infer, aggregate, batch_size=batch_size, queue_size=queue_size)
+    try:
+        pipeline.run(instruments.time_iterator(
+            'decode',
+            sample_frames(cap, fps, sampling, start_frame=decode_start, end_frame=end_frame)
+        ))
+    finally:
+        cap.release()
+    instruments.sample_memory()
+    return frames, sampling.stats(), pipeline.stats(), instruments, calibrator, estimator, puck_tracker
+
+def analyze_segments(video_path, fps, total_frames, workers, overlap_seconds, batch_size, queue_size,
+                     sampling_options, pose_mode='frame', profile=DEFAULT_PROFILE, runtime_options=None,
+                     instruments=None, calibration=None, motion_compensation=False, puck_tracking=False):
+    """
+    Analyze a video as up to `workers` time segments in parallel
+    processes, each with its own models and decoder, and stitch track
+    IDs across the segment boundaries (see segmented_analysis).
+    Returns the frames in order, combined sampling and pipeline stats,
+    the segments' combined (RinkMapping, calibration stats), or None
+    without `calibration`, their combined (CameraMotion, stats), or None
+    without motion_compensation, and their combined (PuckTrajectory,
+    stats), or None without puck_tracking. The segments' stage timings
+    are merged into instruments if given.
+    """
+    plan = plan_segments(total_frames, workers, int(round(overlap_seconds * fps)))
+    threads = max(1, (os.cpu_count() or 1) // len(plan))
+    send_progress(15, 0, total_frames, f"Analyzing {len(plan)} segments in parallel...")
+    
+    started = time.perf_counter()
+    results = [None] * len(plan)
+    frames_done = 0
+    # Spawned rather than forked: forking a process that has already
+    # started torch/OpenMP threads can deadlock the children
+    with ProcessPoolExecutor(
+        max_workers=len(plan),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_segment_worker,
+        initargs=(threads, profile, runtime_options)
+    ) as pool:
+        futures = {
+            # The last segment runs to the end of the stream, whatever the frame count said
+            pool.submit(analyze_segment, video_path, fps, decode_start, end if i < len(plan) - 1 else None,
+                        batch_size, queue_size, sampling_options, pose_mode, profile, calibration,
+                        motion_compensation, puck_tracking): i
+            for i, (decode_start, _, end) in enumerate(plan)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            frames_done += plan[i][2] - plan[i][1] + 1
+            send_progress(
+                15 + int((frames_done / total_frames) * 70),
+                frames_done,
+                total_frames,
+                f"Analyzed segment {i + 1}/{len(plan)}"
+            )
+    
+    segment_frames, sampling_stats, segment_stats, segment_instruments, calibrators, estimators, pucks = zip(*results)
+    if instruments is not None:
+        for segment in segment_instruments:
+            instruments.merge(segment)
+    frames = stitch_segments(list(segment_frames), plan)
+    pipeline_stats = {
+        'elapsedSeconds': round(time.perf_counter() - started, 3),
+        'workers': len(plan),
+        'segments': list(segment_stats)
+    }
+    starts = [start for _, start, _ in plan]
+    rink = None
+    if calibration is not None:
+        # Each segment's transforms apply to the frames it owns
+        mapping = RinkMapping.concatenate([
+            (start, calibrator.mapping) for start, calibrator in zip(starts, calibrators)
+        ])
+        rink = mapping, calibration_stats(calibrators, mapping)
+    motion = None
+    if motion_compensation:
+        combined = CameraMotion.concatenate([(start, estimator.motion) for start, estimator in zip(starts, estimators)])
+        motion = combined, {**combined.stats(), 'lostFrames': sum(estimator.lost_frames for estimator in estimators)}
+    puck = None
+    if puck_tracking:
+        trajectory = PuckTrajectory.concatenate([(start, tracker.trajectory) for start, tracker in zip(starts, pucks)])
+        puck = trajectory, puck_stats(pucks, trajectory)
+    return frames, merge_sampling_stats(list(sampling_stats)), pipeline_stats, rink, motion, puck
+
+def analyze_video(video_path, video_id, output_path, batch_size=1, queue_size=32,
+                  target_fps=None, motion_threshold=None, max_gap_seconds=1.0,
+                  output_format='json', binary_output=None, inference_output=None,
+                  models=None, cache=None, workers=1, segment_overlap=DEFAULT_OVERLAP_SECONDS,
+                  pose_mode='frame', profile=DEFAULT_PROFILE, runtime_options=None,
+                  rink_calibration=False, camera_id=None, calibration_dir=DEFAULT_CALIBRATION_DIR,
+                  motion_compensation=False, detect_events=True, puck_tracking=False):
     """
     Analyze hockey video using YOLOv8
+    
+    batch_size > 1 groups decoded frames so detection and pose each run
+    once per batch; tracking results are identical to the per-frame path.
+    queue_size caps how many decoded frames wait for inference.
+    target_fps / motion_threshold / max_gap_seconds configure the frame
+    sampling policy (see sampling.SamplingPolicy); by default every frame
+    is analyzed.
+    output_format 'ndjson' streams finished tracks to output_path while
+    analysis runs instead of writing one JSON document at the end.
+    binary_output, if given, is a path for an additional compressed .npz
+    artifact with the same results as columnar tables.
+    inference_output, if given, is a path for the raw per-frame
+    detections and keypoints (see inference_store), from which
+    recompute_metrics.py can rebuild the results without the models.
+    models is an already loaded (detection_model, pose_model) pair to
+    reuse, as in worker mode; by default the models are loaded here.
+    cache is a ResultCache; a video analyzed before with the same
+    settings is served from it without running the models. Only local
+    files are cached (URLs would have to be downloaded to hash them).
+    workers > 1 splits the video into that many time segments, each
+    analyzed in its own process with its own models, overlapping by
+    segment_overlap seconds so track IDs can be stitched across them.
+    pose_mode 'crops' runs pose estimation on padded crops of the tracked
+    player boxes in one batched call instead of over the full frame.
+    profile names the performance profile (see profiles.PROFILES) that
+    picks the models, input size and precision, and the analysis frame
+    rate when target_fps isn't given; models must be that profile's.
+    runtime_options choose the inference backend and thread counts the
+    models are loaded with (see load_models).
+    rink_calibration maps player positions to rink meters with a
+    homography estimated from the rink markings (see rink_calibration)
+    before computing metrics, instead of the rough pixel scale. The
+    transforms are cached in calibration_dir per camera_id, or per video
+    file without one.
+    motion_compensation estimates the camera's pan, tilt and zoom from
+    frame to frame (see camera_motion) and takes it out of the player
+    positions before computing metrics.
+    detect_events fills the results' events list with sprints, hard
+    stops, direction changes, players entering and leaving and line
+    changes, detected while frames are aggregated (see event_detection).
+    puck_tracking adds the puck's trajectory (see puck_tracking) as
+    puckTracking, and puck possession events.
     """
     try:
-        send_progress(5, 0, 0, "Loading AI models...")
+        if pose_mode not in POSE_MODES:
+            raise ValueError(f"Unknown pose mode: {pose_mode}")
+        if target_fps is None:
+            target_fps = get_profile(profile)['target_fps']
+        
+        if cache is not None and not os.path.isfile(video_path):
+            cache = None
         
-        # Load YOLOv8 models
-        # Using YOLOv8x for best accuracy (can switch to yolov8n for speed)
-        detection_model = YOLO('yolov8x.pt')  # Object detection
-        pose_model = YOLO('yolov8x-pose.pt')  # Pose estimation
+        if cache is not None:
+            send_progress(5, 0, 0, "Checking result cache...")
+            cache_key = result_cache_key(video_path, target_fps, motion_threshold, max_gap_seconds,
+                                         output_format, binary_output, inference_output,
+                                         workers, segment_overlap, pose_mode, profile,
+                                         (runtime_options or {}).get('backend'), rink_calibration,
+                                         motion_compensation, detect_events, puck_tracking)
+            cached = cache.get(cache_key)
+            send_cache_stats(cache, hit=cached is not None)
+            if cached:
+                copy_result(cached['output'], output_path, output_format, video_id)
+                if binary_output:
+                    copy_result(cached['binary'], binary_output, 'npz', video_id)
+                if inference_output:
+                    shutil.copyfile(cached['inference'], inference_output)
+                send_progress(100, 0, 0, "Analysis complete! (cached result)")
+                return 0
+        
+        if workers > 1:
+            pass  # Each segment process loads its own models
+        elif models is None:
+            send_progress(5, 0, 0, "Loading AI models...")
+            detection_model, pose_model = load_models(profile, runtime_options)
+        else:
+            detection_model, pose_model = models
+            # Don't carry track IDs over from the previous video
+            reset_tracking(detection_model)
         
         send_progress(10, 0, 0, "Opening video file...")
         
@@ -73,33 +494,151 @@ def analyze_video(video_path, video_id, output_path):
         
         send_progress(15, 0, total_frames, f"Video loaded: {total_frames} frames at {fps} FPS")
         
+        # Per-stage timings, reported as "metrics" messages and in the summary
+        instruments = Instrumentation()
+        
         # Data structures for tracking
-        player_tracks = defaultdict(lambda: {
-            'frames': [],
-            'positions': [],
-            'timestamps': []
-        })
+        player_tracks = TrackStore()
         
-        pose_data = defaultdict(lambda: {
-            'frames': []
-        })
+        pose_data = PoseStore()
         
         events = []
         
-        # Process video frame by frame
-        frame_number = 0
+        sampling = SamplingPolicy(
+            fps,
+            target_fps=target_fps,
+            motion_threshold=motion_threshold,
+            max_gap_seconds=max_gap_seconds,
+            pose_interval=POSE_INTERVAL
+        )
+        
+        # Batched mode replays the tracker itself over batched detections
+        tracker = ReplayTracker(TRACKER_CONFIG) if batch_size > 1 else None
+        
+        writer = open_result_writer(output_path, output_format, {
+            'videoId': video_id,
+            'totalFrames': total_frames,
+            'fps': fps,
+            'duration': duration
+        }, binary_path=binary_output)
+        written_metrics = []
+        
+        # Rink calibration keeps a mapping of the transforms seen so far
+        calibration = None
+        calibrator = None
+        rink = None
+        if rink_calibration:
+            calibration = (calibration_dir, calibration_key(video_path, camera_id))
+            calibrator = open_calibrator(fps, *calibration)
+            rink = calibrator.mapping
+        
+        # Camera-motion compensation, estimated as frames are aggregated
+        estimator = CameraMotionEstimator() if motion_compensation else None
+        motion = None
+        
+        # The puck is tracked on the frames as they are aggregated
+        puck_tracker = PuckTracker() if puck_tracking else None
+        trajectory = None
+        
+        # Events are detected frame by frame, on the metrics' positions
+        detector = None
+        if detect_events:
+            detector = EventDetector(fps, sampling.stride, sampling.min_track_detections)
+        
+        recorder = None
+        if inference_output:
+            recorder = InferenceRecorder(inference_output, {
+                'totalFrames': total_frames,
+                'fps': fps,
+                'duration': duration,
+                'width': width,
+                'height': height
+            })
+        
+        def write_track(track_id, data):
+            # Skip tracks with too few detections (10 source frames' worth)
+            if len(data) < sampling.min_track_detections:
+                return
+            
+            with instruments.time('metrics'):
+                positions, pixels_per_meter = track_positions(
+                    data, rink, estimator.motion if estimator is not None else motion)
+                metrics = compute_track_metrics(positions, data.timestamps, pixels_per_meter=pixels_per_meter)
+            written_metrics.append(metrics)
+            with instruments.time('serialization'):
+                writer.write_track(track_id, data, metrics)
+        
+        def write_poses():
+            with instruments.time('serialization'):
+                for track_id, data in pose_data.items():
+                    writer.write_pose(track_id, data)
+            pose_data.clear()
+        
+        # A track the tracker hasn't matched for this many source frames
+        # has been dropped by it and can be written out
+        stale_frames = (TRACK_BUFFER + 1) * sampling.max_frame_step
+        flush_interval = max(1, int(FLUSH_INTERVAL_SECONDS * fps))
+        last_flush = 0
+        events_calibrated = False
+        
         last_progress = 15
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def infer(batch):
+            return infer_frame_batch(batch, detection_model, pose_model, tracker, pose_mode, profile, instruments)
+        
+        def record_frame(frame_number, timestamp, detections, poses, puck=None):
+            nonlocal last_flush, events_calibrated
+            with instruments.time('aggregation'):
+                player_tracks.add_frame(frame_number, timestamp, *detections)
+                if poses[0] is not None:
+                    record_poses(pose_data, frame_number, timestamp, detections, poses)
+                
+                if recorder:
+                    recorder.add_frame(frame_number, timestamp, *detections, *poses)
+            if detector is not None:
+                with instruments.time('events'):
+                    # Positions switch from the pixel scale to rink meters once calibration succeeds
+                    if rink is not None and not events_calibrated and rink.calibrated:
+                        detector.rebase()
+                        events_calibrated = True
+                    camera = estimator if estimator is not None else motion
+                    positions = frame_positions(frame_number, detections[1], rink, camera)
+                    if puck is not None:
+                        puck = frame_points(frame_number, [puck], rink, camera)[0]
+                    detector.update(frame_number, timestamp, detections[0], positions, puck)
+            instruments.add_frames()
+            
+            # Streaming output writes finished tracks as it goes
+            if writer.streaming and frame_number - last_flush >= flush_interval:
+                for track_id, data in player_tracks.pop_stale(frame_number, stale_frames):
+                    write_track(track_id, data)
+                write_poses()
+                last_flush = frame_number
+        
+        def aggregate(batch, output):
+            nonlocal last_progress
+            detection_results, pose_results = output
             
-            frame_number += 1
-            timestamp = frame_number / fps
+            if calibrator is not None:
+                with instruments.time('calibration'):
+                    for frame_number, _, frame, _ in batch:
+                        calibrator.update(frame_number, frame)
             
-            # Update progress every 10 frames
-            if frame_number % 10 == 0:
+            for (frame_number, timestamp, frame, _), detection_result in zip(batch, detection_results):
+                poses = pose_results.get(frame_number, (None, None))
+                with instruments.time('postprocess'):
+                    detections = detection_arrays(detection_result)
+                if estimator is not None:
+                    with instruments.time('motion'):
+                        estimator.update(frame_number, frame, detections[1])
+                puck = None
+                if puck_tracker is not None:
+                    with instruments.time('puck'):
+                        puck = puck_tracker.update(frame_number, timestamp, frame)
+                record_frame(frame_number, timestamp, detections, poses, puck)
+                
+                # Update progress whenever the percentage advances (sampled
+                # frame numbers may never land on a fixed multiple)
                 progress = 15 + int((frame_number / total_frames) * 70)  # 15-85%
                 if progress > last_progress:
                     send_progress(
@@ -108,193 +647,94 @@ def analyze_video(video_path, video_id, output_path):
                         total_frames,
                         f"Analyzing frame {frame_number}/{total_frames}"
                     )
+                    send_pipeline_stats(pipeline.stats())
+                    send_metrics(instruments)
                     last_progress = progress
-            
-            # Run object detection with tracking
-            detection_results = detection_model.track(
-                frame,
-                persist=True,
-                classes=[0],  # person class
-                conf=0.3,
-                iou=0.5,
-                tracker="bytetrack.yaml"
+        
+        if workers > 1:
+            cap.release()
+            frames, sampling_stats, pipeline_stats, segment_calibration, segment_motion, segment_puck = analyze_segments(
+                video_path, fps, total_frames, workers, segment_overlap, batch_size, queue_size,
+                {'target_fps': target_fps, 'motion_threshold': motion_threshold, 'max_gap_seconds': max_gap_seconds},
+                pose_mode,
+                profile,
+                runtime_options,
+                instruments,
+                calibration,
+                motion_compensation,
+                puck_tracking
             )
+            if segment_calibration is not None:
+                rink, rink_stats = segment_calibration
+            if segment_motion is not None:
+                estimator = None
+                motion, motion_stats = segment_motion
+            if segment_puck is not None:
+                trajectory, puck_tracking_stats = segment_puck
+            for frame in frames:
+                record_frame(*frame, trajectory.detected_at(frame[0]) if trajectory is not None else None)
+        else:
+            # Decode, inference and aggregation run as overlapping stages
+            pipeline = FramePipeline(infer, aggregate, batch_size=batch_size, queue_size=queue_size)
+            pipeline.run(instruments.time_iterator('decode', sample_frames(cap, fps, sampling)))
+            pipeline_stats = pipeline.stats()
+            sampling_stats = sampling.stats()
+            if calibrator is not None:
+                rink_stats = calibrator.stats()
+            if estimator is not None:
+                motion, motion_stats = estimator.motion, estimator.stats()
+            if puck_tracker is not None:
+                trajectory, puck_tracking_stats = puck_tracker.trajectory, puck_tracker.stats()
             
-            # Process detections
-            if detection_results[0].boxes is not None and len(detection_results[0].boxes) > 0:
-                boxes = detection_results[0].boxes
-                
-                for i, box in enumerate(boxes):
-                    # Get tracking ID
-                    track_id = int(box.id[0]) if box.id is not None else i
-                    
-                    # Get bounding box
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0])
-                    
-                    # Calculate center position
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
-                    
-                    # Store tracking data
-                    player_tracks[track_id]['frames'].append({
-                        'frameNumber': frame_number,
-                        'timestamp': timestamp,
-                        'bbox': {
-                            'x': float(x1),
-                            'y': float(y1),
-                            'width': float(x2 - x1),
-                            'height': float(y2 - y1)
-                        },
-                        'confidence': confidence,
-                        'position': {
-                            'x': float(center_x),
-                            'y': float(center_y)
-                        }
-                    })
-                    
-                    player_tracks[track_id]['positions'].append((center_x, center_y))
-                    player_tracks[track_id]['timestamps'].append(timestamp)
-            
-            # Run pose estimation every 5 frames (to save processing time)
-            if frame_number % 5 == 0:
-                pose_results = pose_model(frame, conf=0.3)
-                
-                if pose_results[0].keypoints is not None:
-                    for person_idx, keypoints in enumerate(pose_results[0].keypoints):
-                        # Try to match with tracked player
-                        track_id = person_idx  # Simplified matching
-                        
-                        # Get keypoints
-                        kp_data = keypoints.data[0].cpu().numpy()
-                        
-                        keypoint_list = []
-                        keypoint_names = [
-                            'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
-                            'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
-                            'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
-                            'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
-                        ]
-                        
-                        for kp_idx, kp in enumerate(kp_data):
-                            if kp_idx < len(keypoint_names):
-                                keypoint_list.append({
-                                    'name': keypoint_names[kp_idx],
-                                    'x': float(kp[0]),
-                                    'y': float(kp[1]),
-                                    'confidence': float(kp[2]) if len(kp) > 2 else 0.0
-                                })
-                        
-                        # Calculate skating angle (body lean)
-                        skating_angle = None
-                        if len(kp_data) > 12:  # Has hip keypoints
-                            left_hip = kp_data[11]
-                            right_hip = kp_data[12]
-                            left_shoulder = kp_data[5]
-                            right_shoulder = kp_data[6]
-                            
-                            if all(kp[2] > 0.3 for kp in [left_hip, right_hip, left_shoulder, right_shoulder]):
-                                hip_center_y = (left_hip[1] + right_hip[1]) / 2
-                                shoulder_center_y = (left_shoulder[1] + right_shoulder[1]) / 2
-                                hip_center_x = (left_hip[0] + right_hip[0]) / 2
-                                shoulder_center_x = (left_shoulder[0] + right_shoulder[0]) / 2
-                                
-                                # Calculate angle
-                                dy = shoulder_center_y - hip_center_y
-                                dx = shoulder_center_x - hip_center_x
-                                skating_angle = float(np.degrees(np.arctan2(dy, dx)))
-                        
-                        pose_data[track_id]['frames'].append({
-                            'frameNumber': frame_number,
-                            'timestamp': timestamp,
-                            'keypoints': keypoint_list,
-                            'posture': {
-                                'skatingAngle': skating_angle,
-                                'bodyBalance': 0.8  # Placeholder
-                            }
-                        })
-        
-        cap.release()
+            cap.release()
+        send_pipeline_stats(pipeline_stats)
         
         send_progress(90, total_frames, total_frames, "Calculating metrics...")
         
-        # Calculate metrics for each player
-        player_tracking_results = []
-        pose_analysis_results = []
-        
+        # Calculate metrics for the remaining players
         for track_id, data in player_tracks.items():
-            if len(data['positions']) < 10:  # Skip tracks with too few detections
-                continue
-            
-            # Calculate total distance
-            total_distance_pixels = 0
-            for i in range(1, len(data['positions'])):
-                dist = calculate_distance(data['positions'][i-1], data['positions'][i])
-                total_distance_pixels += dist
-            
-            total_distance_meters = pixels_to_meters(total_distance_pixels)
-            
-            # Calculate speeds
-            speeds = []
-            for i in range(1, len(data['positions'])):
-                dist = calculate_distance(data['positions'][i-1], data['positions'][i])
-                time_diff = data['timestamps'][i] - data['timestamps'][i-1]
-                if time_diff > 0:
-                    speed_mps = pixels_to_meters(dist) / time_diff
-                    speed_kmh = speed_mps * 3.6
-                    speeds.append(speed_kmh)
-            
-            avg_speed = np.mean(speeds) if speeds else 0
-            max_speed = np.max(speeds) if speeds else 0
-            time_on_ice = data['timestamps'][-1] - data['timestamps'][0] if data['timestamps'] else 0
-            
-            player_tracking_results.append({
-                'playerId': f'player_{track_id}',
-                'trackId': track_id,
-                'frames': data['frames'],
-                'metrics': {
-                    'totalDistance': round(total_distance_meters, 2),
-                    'averageSpeed': round(avg_speed, 2),
-                    'maxSpeed': round(max_speed, 2),
-                    'timeOnIce': round(time_on_ice, 2)
-                }
-            })
-        
-        # Compile pose analysis
-        for track_id, data in pose_data.items():
-            if len(data['frames']) > 0:
-                pose_analysis_results.append({
-                    'playerId': f'player_{track_id}',
-                    'trackId': track_id,
-                    'frames': data['frames']
-                })
-        
-        # Calculate summary statistics
-        total_players = len(player_tracking_results)
-        avg_speed_all = np.mean([p['metrics']['averageSpeed'] for p in player_tracking_results]) if player_tracking_results else 0
-        total_distance_all = sum([p['metrics']['totalDistance'] for p in player_tracking_results])
+            write_track(track_id, data)
+        write_poses()
+        if trajectory is not None:
+            with instruments.time('serialization'):
+                writer.write_puck(trajectory)
         
         send_progress(95, total_frames, total_frames, "Generating analysis report...")
         
-        # Compile final results
-        results = {
-            'videoId': video_id,
-            'totalFrames': total_frames,
-            'fps': fps,
-            'duration': duration,
-            'playerTracking': player_tracking_results,
-            'poseAnalysis': pose_analysis_results,
-            'events': events,
-            'summary': {
-                'totalPlayers': total_players,
-                'averageSpeed': round(avg_speed_all, 2),
-                'totalDistance': round(total_distance_all, 2)
-            }
-        }
-        
         # Save results
-        with open(output_path, 'w') as f:
-            json.dump(results, f, indent=2, cls=NumpyEncoder)
+        if detector is not None:
+            events = detector.finish()
+        performance = instruments.snapshot()
+        run_stats = {'pipeline': pipeline_stats, 'sampling': sampling_stats}
+        if rink is not None:
+            run_stats['rinkCalibration'] = rink_stats
+        if motion is not None:
+            run_stats['cameraMotion'] = motion_stats
+        if trajectory is not None:
+            run_stats['puckTracking'] = puck_tracking_stats
+        if detector is not None:
+            run_stats['eventCounts'] = detector.counts()
+        with instruments.time('serialization'):
+            writer.close(events, {
+                **summarize_metrics(written_metrics),
+                **run_stats,
+                'performance': performance
+            })
+        
+        if recorder:
+            recorder.close({**run_stats, 'performance': performance}, camera_motion=motion, puck=trajectory)
+        send_metrics(instruments)
+        
+        if cache is not None:
+            files = {'output': output_path}
+            if binary_output:
+                files['binary'] = binary_output
+            if inference_output:
+                files['inference'] = inference_output
+            try:
+                cache.put(cache_key, files)
+            except OSError as e:
+                print(f"WARNING: Could not cache results: {str(e)}", file=sys.stderr)
         
         send_progress(100, total_frames, total_frames, "Analysis complete!")
         
@@ -304,15 +744,191 @@ def analyze_video(video_path, video_id, output_path):
         print(f"ERROR: {str(e)}", file=sys.stderr)
         return 1
 
+# Job fields accepted by worker mode, mapped to analyze_video keyword arguments
+JOB_OPTIONS = {
+    'batchSize': 'batch_size',
+    'queueSize': 'queue_size',
+    'targetFps': 'target_fps',
+    'motionThreshold': 'motion_threshold',
+    'maxGap': 'max_gap_seconds',
+    'outputFormat': 'output_format',
+    'binaryOutput': 'binary_output',
+    'inferenceOutput': 'inference_output',
+    'workers': 'workers',
+    'segmentOverlap': 'segment_overlap',
+    'poseMode': 'pose_mode',
+    'profile': 'profile',
+    'rinkCalibration': 'rink_calibration',
+    'cameraId': 'camera_id',
+    'motionCompensation': 'motion_compensation',
+    'events': 'detect_events',
+    'puckTracking': 'puck_tracking'
+}
+
+def send_job_status(job_type, job_id, **fields):
+    """Send a worker job lifecycle message to Node.js via stdout"""
+    print(json.dumps({"type": job_type, "jobId": job_id, **fields}), flush=True)
+
+def load_warm_models(profile, runtime_options=None):
+    """Load a profile's models and push a blank frame through them"""
+    send_progress(5, 0, 0, "Loading AI models...")
+    models = load_models(profile, runtime_options)
+    warm_up_models(*models, profile=profile)
+    return models
+
+def serve(jobs=sys.stdin, cache=None, profile=DEFAULT_PROFILE, runtime_options=None,
+          calibration_dir=DEFAULT_CALIBRATION_DIR):
+    """
+    Worker mode: load and warm up the models once, then run jobs
+    back-to-back. Each input line is a JSON job:
+    {"jobId", "videoPath", "videoId", "outputPath", ...JOB_OPTIONS}
+    
+    Prints {"type": "ready"} once the models are warm. Each job is
+    bracketed by {"type": "jobStart", "jobId"} and
+    {"type": "jobComplete", "jobId", "status", "exitCode"} messages, with
+    the usual progress/pipeline messages in between. Exits at end of input.
+    Every job shares `cache` when one is given. The models of `profile`
+    are loaded up front; a job naming another profile loads its models
+    on first use, and they are kept for later jobs. Every model runs
+    with runtime_options (see load_models), and rink-calibrated jobs
+    share calibration_dir.
+    """
+    try:
+        loaded_models = {profile: load_warm_models(profile, runtime_options)}
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        return 1
+    print(json.dumps({"type": "ready"}), flush=True)
+    
+    for line in jobs:
+        if not line.strip():
+            continue
+        
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get('jobId')
+            options = {arg: job[key] for key, arg in JOB_OPTIONS.items() if job.get(key) is not None}
+            video_path, video_id, output_path = job['videoPath'], job['videoId'], job['outputPath']
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"ERROR: Invalid job: {str(e)}", file=sys.stderr)
+            send_job_status("jobComplete", job_id, status="failed", exitCode=2)
+            continue
+        
+        send_job_status("jobStart", job_id, videoId=video_id)
+        job_profile = options.setdefault('profile', profile)
+        try:
+            if job_profile not in loaded_models:
+                loaded_models[job_profile] = load_warm_models(job_profile, runtime_options)
+        except Exception as e:
+            print(f"ERROR: {str(e)}", file=sys.stderr)
+            send_job_status("jobComplete", job_id, videoId=video_id, status="failed", exitCode=1)
+            continue
+        exit_code = analyze_video(video_path, video_id, output_path, models=loaded_models[job_profile], cache=cache,
+                                  runtime_options=runtime_options, calibration_dir=calibration_dir, **options)
+        send_job_status(
+            "jobComplete",
+            job_id,
+            videoId=video_id,
+            status="completed" if exit_code == 0 else "failed",
+            exitCode=exit_code
+        )
+    
+    return 0
+
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: analyze_video.py <video_path> <video_id> <output_path>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Analyze a hockey video with YOLOv8")
+    parser.add_argument("video_path", nargs="?")
+    parser.add_argument("video_id", nargs="?")
+    parser.add_argument("output_path", nargs="?")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a persistent worker that reads JSON jobs from stdin, one per line")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Performance profile: model size, input resolution, precision and default analysis rate")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Inference backend, overriding the profile's; onnx and openvino export the models on first use")
+    parser.add_argument("--export-dir", default=DEFAULT_EXPORT_DIR,
+                        help="Directory for exported onnx/openvino models, reused across runs")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="Threads one model operation may use (default: the runtime's choice)")
+    parser.add_argument("--inter-op-threads", type=int, default=None,
+                        help="Independent model operations run at once (default: the runtime's choice)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Frames per inference batch (1 = per-frame tracking)")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Maximum decoded frames buffered ahead of inference")
+    parser.add_argument("--target-fps", type=float, default=None,
+                        help="Analyze at most this many frames per second (default: the profile's rate)")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="Skip frames whose mean difference from the last analyzed frame is below this fraction")
+    parser.add_argument("--max-gap", type=float, default=1.0,
+                        help="Seconds between forced analyses when motion gating skips frames")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Analyze this many time segments of the video in parallel processes")
+    parser.add_argument("--segment-overlap", type=float, default=DEFAULT_OVERLAP_SECONDS,
+                        help="Seconds each parallel segment overlaps the previous one, for stitching track IDs")
+    parser.add_argument("--pose-mode", choices=POSE_MODES, default="frame",
+                        help="Run pose on the full frame, or on batched crops of the tracked player boxes")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json",
+                        help="json writes one document at the end; ndjson streams records as tracks finish")
+    parser.add_argument("--binary-output", default=None,
+                        help="Also write detections, keypoints and metrics as a compressed .npz to this path")
+    parser.add_argument("--inference-output", default=None,
+                        help="Also save the raw per-frame detections and keypoints to this .npz for recompute_metrics.py")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory for cached analysis results")
+    parser.add_argument("--cache-max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Evict least recently used cached results beyond this many bytes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always run the models, without reading or writing the result cache")
+    parser.add_argument("--rink-calibration", action="store_true",
+                        help="Compute metrics in rink meters from a homography fitted to the rink markings")
+    parser.add_argument("--camera-id", default=None,
+                        help="Share rink calibrations between videos of this fixed camera (default: per video)")
+    parser.add_argument("--calibration-dir", default=DEFAULT_CALIBRATION_DIR,
+                        help="Directory rink calibrations are cached in")
+    parser.add_argument("--motion-compensation", action="store_true",
+                        help="Take the camera's pan, tilt and zoom out of player movement before computing metrics")
+    parser.add_argument("--no-events", dest="detect_events", action="store_false",
+                        help="Don't detect game events (sprints, hard stops, line changes, ...)")
+    parser.add_argument("--puck-tracking", action="store_true",
+                        help="Track the puck and output its trajectory as puckTracking")
+    parser.add_argument("--cprofile-output", default=None,
+                        help="Profile the run with cProfile (all pipeline threads) and write the stats to this .prof file")
+    args = parser.parse_args()
+    
+    runtime_options = {
+        'backend': args.backend,
+        'export_dir': args.export_dir,
+        'intra_op_threads': args.intra_op_threads,
+        'inter_op_threads': args.inter_op_threads
+    }
+    
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = ResultCache(args.cache_dir, args.cache_max_bytes)
+        except OSError as e:
+            print(f"WARNING: Result cache disabled: {str(e)}", file=sys.stderr)
     
-    video_path = sys.argv[1]
-    video_id = sys.argv[2]
-    output_path = sys.argv[3]
+    if args.serve:
+        sys.exit(serve(cache=cache, profile=args.profile, runtime_options=runtime_options,
+                       calibration_dir=args.calibration_dir))
+    if args.output_path is None:
+        parser.error("video_path, video_id and output_path are required unless --serve is given")
     
-    exit_code = analyze_video(video_path, video_id, output_path)
+    # Segment worker processes (--workers) aren't covered by --cprofile-output
+    with profiled(args.cprofile_output) if args.cprofile_output else nullcontext():
+        exit_code = analyze_video(args.video_path, args.video_id, args.output_path,
+                                  batch_size=args.batch_size, queue_size=args.queue_size,
+                                  target_fps=args.target_fps, motion_threshold=args.motion_threshold,
+                                  max_gap_seconds=args.max_gap, output_format=args.output_format,
+                                  binary_output=args.binary_output, inference_output=args.inference_output,
+                                  cache=cache, workers=args.workers, segment_overlap=args.segment_overlap,
+                                  pose_mode=args.pose_mode, profile=args.profile, runtime_options=runtime_options,
+                                  rink_calibration=args.rink_calibration, camera_id=args.camera_id,
+                                  calibration_dir=args.calibration_dir,
+                                  motion_compensation=args.motion_compensation,
+                                  detect_events=args.detect_events, puck_tracking=args.puck_tracking)
     sys.exit(exit_code)
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Box matching helpers
+Vectorized IoU and keypoint-in-box scoring used to tie pose estimates
+to the tracker's player boxes, so poseAnalysis entries share track IDs
+with playerTracking. Scores are dense (poses x tracks) matrices: with 20
+or 30 skaters in frame that is well under a thousand cells, cheaper than
+building a spatial index.
+"""
+
+import numpy as np
+
+# Pose/track pairs scoring below this are left unmatched
+MIN_POSE_MATCH_SCORE = 0.4
+
+# Keypoints below this confidence don't count toward keypoint-in-box
+KEYPOINT_MIN_CONFIDENCE = 0.3
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU of (n, 4) and (m, 4) x1/y1/x2/y2 boxes as an (n, m) array"""
+    a = np.asarray(boxes_a, dtype=np.float64)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float64)[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def keypoints_in_boxes(keypoints, boxes, min_confidence=KEYPOINT_MIN_CONFIDENCE):
+    """
+    Share of each pose's confident keypoints that fall inside each box:
+    (m, 17, 3) x/y/conf keypoints and (n, 4) boxes give an (m, n) array
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    boxes = np.asarray(boxes, dtype=np.float64)[None, :, None, :]
+    x = keypoints[:, None, :, 0]
+    y = keypoints[:, None, :, 1]
+    confident = keypoints[:, None, :, 2] > min_confidence
+    inside = (x >= boxes[..., 0]) & (x <= boxes[..., 2]) & (y >= boxes[..., 1]) & (y <= boxes[..., 3])
+    return (inside & confident).sum(axis=2) / np.maximum(confident.sum(axis=2), 1)
+
+
+def greedy_match(scores, min_score):
+    """One-to-one (row, col) pairs taken from the highest score down, stopping below min_score"""
+    pairs = []
+    used_rows = set()
+    used_cols = set()
+    for flat in np.argsort(scores, axis=None, kind='stable')[::-1]:
+        row, col = divmod(int(flat), scores.shape[1])
+        if scores[row, col] < min_score:
+            break
+        if row in used_rows or col in used_cols:
+            continue
+        pairs.append((row, col))
+        used_rows.add(row)
+        used_cols.add(col)
+        if len(used_rows) == scores.shape[0] or len(used_cols) == scores.shape[1]:
+            break
+    return pairs
+
+
+def pose_match_scores(keypoints, pose_boxes, track_boxes):
+    """
+    (m, n) scores of m poses against n track boxes: the mean of the pose
+    box's IoU with the track box and its keypoint-in-box share
+    """
+    return (box_iou(pose_boxes, track_boxes) + keypoints_in_boxes(keypoints, track_boxes)) / 2
+
+
+def associate_poses(keypoints, pose_boxes, track_ids, track_boxes, min_score=MIN_POSE_MATCH_SCORE):
+    """
+    Match one frame's pose estimates to its tracked player boxes.
+
+    Pairs are scored with pose_match_scores and matched one-to-one from
+    the best score down. Returns (track_ids, keypoints) for the matched
+    poses in pose order; poses that match no track are dropped.
+    """
+    keypoints = np.asarray(keypoints)
+    if len(keypoints) == 0 or len(track_ids) == 0:
+        return [], keypoints[:0]
+
+    scores = pose_match_scores(keypoints, pose_boxes, track_boxes)
+    pairs = sorted(greedy_match(scores, min_score))
+    return [track_ids[col] for _, col in pairs], keypoints[[row for row, _ in pairs]]
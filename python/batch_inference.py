@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Batched detection with in-order tracker replay
+Runs the detector over several frames in one call, then feeds each frame's
+detections through the tracker one at a time so track IDs match the
+per-frame `model.track(frame, persist=True)` path
+"""
+
+import torch
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+from ultralytics.trackers.track import TRACKER_MAP
+
+try:
+    from ultralytics.utils import YAML
+    _load_yaml = YAML.load
+except ImportError:  # older ultralytics releases
+    from ultralytics.utils import yaml_load as _load_yaml
+
+TRACKER_CONFIG = "bytetrack.yaml"
+TRACK_BUFFER = 30  # Tracker updates a lost track survives (bytetrack.yaml track_buffer)
+
+
+class ReplayTracker:
+    """
+    Applies a ByteTrack/BoT-SORT tracker to detection results produced by
+    a plain batched `model.predict` call, mirroring what ultralytics does
+    inside its `on_predict_postprocess_end` tracking callback
+    """
+
+    def __init__(self, tracker_config=TRACKER_CONFIG, frame_rate=30):
+        cfg = IterableSimpleNamespace(**_load_yaml(check_yaml(tracker_config)))
+        if cfg.tracker_type not in TRACKER_MAP:
+            raise ValueError(f"Unsupported tracker type: {cfg.tracker_type}")
+
+        tracker_cls = TRACKER_MAP[cfg.tracker_type]
+        try:
+            self.tracker = tracker_cls(args=cfg, frame_rate=frame_rate)
+        except TypeError:  # newer releases dropped the frame_rate argument
+            self.tracker = tracker_cls(args=cfg)
+
+    def update(self, result):
+        """Associate one frame's detections and return the tracked result"""
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img)
+
+        if len(tracks) == 0:
+            # Hide tentative tracks until they are confirmed, as ultralytics does
+            if any(not t.is_activated for t in self.tracker.tracked_stracks):
+                return result[:0]
+            return result
+
+        idx = tracks[:, -1].astype(int)
+        tracked = result[idx]
+        tracked.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+        return tracked
+
+
+def reset_tracking(model):
+    """
+    Clear the tracker state `model.track(..., persist=True)` keeps on the
+    model's predictor, so the next video starts with fresh track IDs
+    """
+    predictor = getattr(model, 'predictor', None)
+    for tracker in getattr(predictor, 'trackers', ()):
+        tracker.reset()
+
+
+def track_batch(model, tracker, frames, **predict_kwargs):
+    """
+    Detect on a list of frames in a single inference call and replay the
+    tracker over the results in frame order
+    """
+    results = model.predict(frames, verbose=False, **predict_kwargs)
+    return [tracker.update(result) for result in results]
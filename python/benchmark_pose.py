@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Pose mode benchmark
+Compares full-frame pose estimation with crop-based pose estimation
+(pose_crops) on frames sampled from a video: pose inference time per
+frame for each mode, and how closely the crop keypoints agree with the
+full-frame keypoints for the same players. Prints one JSON report.
+
+Agreement is measured per player detected in both modes, over keypoints
+both modes are confident about: the mean keypoint distance as a share
+of the player box height, and PCK, the share of keypoints within
+--pck-threshold of the box height.
+"""
+
+import sys
+import json
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from analyze_video import DETECTION_ARGS, POSE_CONF, detection_arrays, load_models, pose_arrays
+from association import KEYPOINT_MIN_CONFIDENCE, associate_poses
+from pose_crops import POSE_CROP_PADDING, POSE_CROP_SIZE, estimate_crop_poses
+from profiles import DEFAULT_PROFILE, PROFILES, get_profile, inference_args, precision_args
+
+
+def sample_video_frames(video_path, count, step):
+    """Up to `count` frames, one every `step` source frames"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    frames = []
+    frame_number = 0
+    try:
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_number % step == 0:
+                frames.append(frame)
+            frame_number += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def timed(function, *args, **kwargs):
+    """(result, elapsed seconds) of one call"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def keypoint_agreement(frame_keypoints, crop_keypoints, box_heights, pck_threshold):
+    """
+    (mean normalized distance, PCK, keypoints compared) between matched
+    (n, 17, 3) full-frame and crop poses of the same n players
+    """
+    both = (frame_keypoints[..., 2] > KEYPOINT_MIN_CONFIDENCE) & (crop_keypoints[..., 2] > KEYPOINT_MIN_CONFIDENCE)
+    distances = np.linalg.norm(frame_keypoints[..., :2] - crop_keypoints[..., :2], axis=-1)
+    normalized = (distances / np.maximum(box_heights, 1)[:, None])[both]
+    if normalized.size == 0:
+        return None, None, 0
+    return float(normalized.mean()), float((normalized <= pck_threshold).mean()), int(normalized.size)
+
+
+def benchmark(video_path, frames=50, step=10, padding=POSE_CROP_PADDING, crop_size=POSE_CROP_SIZE,
+              pck_threshold=0.1, profile=DEFAULT_PROFILE):
+    """Run both pose modes with a profile's models over sampled frames and return the report"""
+    detection_model, pose_model = load_models(profile)
+    model_args = inference_args(get_profile(profile))
+    images = sample_video_frames(video_path, frames, step)
+    if not images:
+        raise Exception(f"No frames decoded from {video_path}")
+
+    # Warm both paths up so model setup isn't timed
+    pose_model(images[0], conf=POSE_CONF, verbose=False, **model_args)
+    estimate_crop_poses(pose_model, images[:1], [np.array([[0, 0, 64, 128]])], padding, crop_size,
+                        conf=POSE_CONF, **precision_args(get_profile(profile)))
+
+    frame_seconds = []
+    crop_seconds = []
+    players = 0
+    coverage = {'frame': 0, 'crops': 0, 'both': 0}
+    frame_matched = []
+    crop_matched = []
+    heights = []
+    for image in images:
+        _, boxes, _ = detection_arrays(detection_model.predict(image, verbose=False, **DETECTION_ARGS, **model_args)[0])
+        ids = list(range(len(boxes)))
+        players += len(boxes)
+
+        result, seconds = timed(pose_model, image, conf=POSE_CONF, verbose=False, **model_args)
+        frame_seconds.append(seconds)
+        frame_ids, frame_keypoints = associate_poses(*pose_arrays(result[0]), ids, boxes)
+
+        (crop_poses,), seconds = timed(estimate_crop_poses, pose_model, [image], [boxes], padding, crop_size,
+                                       conf=POSE_CONF, **precision_args(get_profile(profile)))
+        crop_seconds.append(seconds)
+        crop_ids, crop_keypoints = associate_poses(*crop_poses, ids, boxes)
+
+        coverage['frame'] += len(frame_ids)
+        coverage['crops'] += len(crop_ids)
+        crop_rows = {player: row for row, player in enumerate(crop_ids)}
+        for row, player in enumerate(frame_ids):
+            if player in crop_rows:
+                coverage['both'] += 1
+                frame_matched.append(frame_keypoints[row])
+                crop_matched.append(crop_keypoints[crop_rows[player]])
+                heights.append(boxes[player, 3] - boxes[player, 1])
+
+    mean_error, pck, compared = keypoint_agreement(
+        np.array(frame_matched, dtype=np.float32).reshape(-1, 17, 3),
+        np.array(crop_matched, dtype=np.float32).reshape(-1, 17, 3),
+        np.array(heights, dtype=np.float32),
+        pck_threshold
+    )
+    frame_ms = 1000 * float(np.mean(frame_seconds))
+    crop_ms = 1000 * float(np.mean(crop_seconds))
+    return {
+        'profile': profile,
+        'frames': len(images),
+        'players': players,
+        'cropPadding': padding,
+        'cropSize': list(crop_size),
+        'frameMode': {'msPerFrame': round(frame_ms, 2), 'posesMatched': coverage['frame']},
+        'cropMode': {'msPerFrame': round(crop_ms, 2), 'posesMatched': coverage['crops']},
+        'speedup': round(frame_ms / crop_ms, 2) if crop_ms > 0 else None,
+        'agreement': {
+            'playersCompared': coverage['both'],
+            'keypointsCompared': compared,
+            'meanError': round(mean_error, 4) if mean_error is not None else None,
+            'pck': round(pck, 4) if pck is not None else None,
+            'pckThreshold': pck_threshold
+        }
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark crop-based against full-frame pose estimation")
+    parser.add_argument("video_path")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Performance profile whose models to use")
+    parser.add_argument("--frames", type=int, default=50, help="Frames to benchmark on")
+    parser.add_argument("--step", type=int, default=10, help="Source frames between benchmarked frames")
+    parser.add_argument("--padding", type=float, default=POSE_CROP_PADDING,
+                        help="Crop margin around each player box, as a fraction of its size")
+    parser.add_argument("--crop-size", type=int, nargs=2, default=list(POSE_CROP_SIZE), metavar=("HEIGHT", "WIDTH"),
+                        help="Pose model input size for crops")
+    parser.add_argument("--pck-threshold", type=float, default=0.1,
+                        help="Keypoint distance, as a share of box height, that counts as agreeing")
+    args = parser.parse_args()
+
+    try:
+        report = benchmark(args.video_path, frames=args.frames, step=args.step, padding=args.padding,
+                           crop_size=tuple(args.crop_size), pck_threshold=args.pck_threshold, profile=args.profile)
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Performance profile benchmark
+Runs each performance profile (see profiles.PROFILES) over seeded
+create_demo_hockey_video fixtures and reports, per profile:
+- fps: source video frames processed per wall-clock second, with the
+  profile's own frame sampling, decoding included
+- latency percentiles of detection (plus pose on pose frames) per
+  analyzed frame
+- detection agreement with a reference profile: precision, recall and
+  F1 of its person boxes against the reference's, matched one-to-one at
+  IoU >= --match-iou on the frames both analyzed
+Prints one JSON report (and optionally writes it to --output).
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from analyze_video import DETECTION_ARGS, POSE_CONF, POSE_INTERVAL, detection_arrays, load_models, warm_up_models
+from association import box_iou, greedy_match
+from create_demo_video import create_demo_hockey_video
+from profiles import DEFAULT_PROFILE, PROFILES, get_profile, inference_args
+from sampling import SamplingPolicy, sample_frames
+
+# Pairs of boxes at least this overlapping count as the same detection
+MATCH_IOU = 0.5
+
+
+def create_fixtures(directory, videos, duration_seconds, fps):
+    """Paths of `videos` demo videos, seeded 0..videos-1 so reruns get identical footage"""
+    paths = []
+    for seed in range(videos):
+        path = os.path.join(directory, f"demo_{seed}_{duration_seconds}s_{fps}fps.mp4")
+        if not os.path.exists(path):
+            # The generator reports on stdout, which carries the report
+            with contextlib.redirect_stdout(sys.stderr):
+                create_demo_hockey_video(path, duration_seconds=duration_seconds, fps=fps, seed=seed)
+        paths.append(path)
+    return paths
+
+
+def run_video(models, settings, video_path):
+    """
+    Detection (and pose every POSE_INTERVAL frames) over one video with
+    a profile's models and sampling. Returns ({frame_number: boxes},
+    per-frame latencies in seconds, source frames, wall seconds).
+    """
+    detection_model, pose_model = models
+    model_args = inference_args(settings)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    sampling = SamplingPolicy(fps, target_fps=settings['target_fps'], pose_interval=POSE_INTERVAL)
+
+    detections = {}
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for frame_number, _, frame, run_pose in sample_frames(cap, fps, sampling):
+            frame_started = time.perf_counter()
+            result = detection_model.predict(frame, verbose=False, **DETECTION_ARGS, **model_args)[0]
+            if run_pose:
+                pose_model(frame, conf=POSE_CONF, verbose=False, **model_args)
+            latencies.append(time.perf_counter() - frame_started)
+            detections[frame_number] = detection_arrays(result)[1]
+    finally:
+        cap.release()
+    return detections, latencies, total_frames, time.perf_counter() - started
+
+
+def run_profile(profile, videos):
+    """run_video results for each video, with the profile's models loaded and warmed up once"""
+    models = load_models(profile)
+    warm_up_models(*models, profile=profile)
+    return [run_video(models, get_profile(profile), video) for video in videos]
+
+
+def detection_agreement(detections, reference, match_iou=MATCH_IOU):
+    """Precision/recall/F1 of per-frame boxes against reference boxes on the frames both have"""
+    matched = predicted = expected = 0
+    for frame_number, boxes in detections.items():
+        if frame_number not in reference:
+            continue
+        reference_boxes = reference[frame_number]
+        predicted += len(boxes)
+        expected += len(reference_boxes)
+        if len(boxes) and len(reference_boxes):
+            matched += len(greedy_match(box_iou(boxes, reference_boxes), match_iou))
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+    return {'precision': round(precision, 4), 'recall': round(recall, 4), 'f1': round(f1, 4)}
+
+
+def benchmark(profiles, videos, reference=DEFAULT_PROFILE, match_iou=MATCH_IOU):
+    """Benchmark `profiles` on the video paths; the reference profile is always run"""
+    runs = {}
+    for profile in dict.fromkeys([reference, *profiles]):
+        runs[profile] = run_profile(profile, videos)
+
+    report = {'reference': reference, 'videos': len(videos), 'matchIou': match_iou, 'profiles': {}}
+    for profile in profiles:
+        latencies = np.concatenate([latency for _, latency, _, _ in runs[profile]])
+        frames = sum(total for _, _, total, _ in runs[profile])
+        seconds = sum(wall for _, _, _, wall in runs[profile])
+        merged = {}
+        merged_reference = {}
+        for index, ((detections, _, _, _), (reference_detections, _, _, _)) in enumerate(
+                zip(runs[profile], runs[reference])):
+            merged.update({(index, frame): boxes for frame, boxes in detections.items()})
+            merged_reference.update({(index, frame): boxes for frame, boxes in reference_detections.items()})
+        report['profiles'][profile] = {
+            'settings': get_profile(profile),
+            'framesAnalyzed': int(latencies.size),
+            'fps': round(frames / seconds, 2) if seconds > 0 else 0,
+            'latencyMs': {
+                f"p{q}": round(1000 * float(np.percentile(latencies, q)), 2) if latencies.size else None
+                for q in (50, 90, 99)
+            },
+            'agreement': detection_agreement(merged, merged_reference, match_iou)
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the performance profiles on demo videos")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--reference", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Profile whose detections the others are compared against")
+    parser.add_argument("--videos", type=int, default=2, help="Demo videos to generate, one per seed")
+    parser.add_argument("--duration", type=int, default=10, help="Seconds per demo video")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the demo videos")
+    parser.add_argument("--fixtures-dir", default=None,
+                        help="Keep generated videos here and reuse them across runs (default: a temp dir)")
+    parser.add_argument("--match-iou", type=float, default=MATCH_IOU,
+                        help="IoU at which a box agrees with a reference box")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this path")
+    args = parser.parse_args()
+
+    try:
+        with contextlib.ExitStack() as stack:
+            fixtures_dir = args.fixtures_dir or stack.enter_context(tempfile.TemporaryDirectory())
+            os.makedirs(fixtures_dir, exist_ok=True)
+            videos = create_fixtures(fixtures_dir, args.videos, args.duration, args.fps)
+            report = benchmark(args.profiles, videos, reference=args.reference, match_iou=args.match_iou)
+        report['fixtures'] = {'videos': args.videos, 'durationSeconds': args.duration, 'fps': args.fps}
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Puck tracking benchmark
+Generates seeded create_demo_hockey_video fixtures, whose puck position
+is known in every frame, and runs puck_tracking.PuckTracker over them at
+each --strides sampling step. Reports per scenario:
+- the tracker's milliseconds per analyzed frame, against searching every
+  analyzed frame in full with the same blob detector
+- recall: the share of frames with the puck visible in which the tracker
+  reported it within --match-radii puck radii
+- precision: the share of reported positions that were that close
+- the mean and 95th percentile position error of those matches
+Prints one JSON report. No models are needed.
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from create_demo_video import create_demo_hockey_video
+from puck_tracking import PUCK_RADIUS, REFERENCE_WIDTH, PuckTracker, detect_pucks
+
+# A reported position within this many puck radii of the true center is a match
+MATCH_RADII = 2.0
+
+# Every how many analyzed frames the full-frame search is timed
+FULL_FRAME_SAMPLE = 10
+
+
+def parse_resolution(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got {value}")
+    return width, height
+
+
+def latency_stats(seconds):
+    milliseconds = 1000 * np.asarray(seconds, dtype=np.float64)
+    if milliseconds.size == 0:
+        return {'meanMs': None, 'p95Ms': None, 'maxMs': None}
+    return {
+        'meanMs': round(float(milliseconds.mean()), 3),
+        'p95Ms': round(float(np.percentile(milliseconds, 95)), 3),
+        'maxMs': round(float(milliseconds.max()), 3)
+    }
+
+
+def run_scenario(video_path, truth, stride, match_radii=MATCH_RADII):
+    """Track the puck over every stride-th frame of the video and score it against `truth`"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    tracker = PuckTracker()
+    tracker_seconds, full_frame_seconds = [], []
+    errors = []
+    visible = found = reported = 0
+    frame_number = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_number % stride:
+                frame_number += 1
+                continue
+            start = time.perf_counter()
+            position = tracker.update(frame_number, frame_number / fps, frame)
+            tracker_seconds.append(time.perf_counter() - start)
+
+            if len(tracker_seconds) % FULL_FRAME_SAMPLE == 1:
+                start = time.perf_counter()
+                detect_pucks(frame, (0, 0, frame.shape[1], frame.shape[0]), tracker.radius)
+                full_frame_seconds.append(time.perf_counter() - start)
+
+            x, y, is_visible = truth[frame_number]
+            visible += is_visible
+            if position is not None:
+                reported += 1
+                error = np.hypot(position[0] - x, position[1] - y)
+                if error <= match_radii * tracker.radius:
+                    found += is_visible
+                    errors.append(error)
+            frame_number += 1
+    finally:
+        cap.release()
+
+    errors = np.asarray(errors)
+    return {
+        'analyzedFrames': len(tracker_seconds),
+        'visibleFrames': visible,
+        'tracker': latency_stats(tracker_seconds),
+        'fullFrameSearch': latency_stats(full_frame_seconds),
+        'recall': round(found / visible, 4) if visible else None,
+        'precision': round(len(errors) / reported, 4) if reported else None,
+        'meanErrorPixels': round(float(errors.mean()), 3) if len(errors) else None,
+        'p95ErrorPixels': round(float(np.percentile(errors, 95)), 3) if len(errors) else None,
+        'trackerStats': tracker.stats()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark puck tracking accuracy and cost on generated demo videos")
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(1280, 720), (1920, 1080)],
+                        metavar="WIDTHxHEIGHT")
+    parser.add_argument("--duration", type=int, default=10, help="Seconds per demo video")
+    parser.add_argument("--players", type=int, nargs="+", default=[5, 12], help="Players per demo video")
+    parser.add_argument("--strides", type=int, nargs="+", default=[1, 3],
+                        help="Analyze every n-th frame (3 is 10 analyzed frames per second at 30 FPS)")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the demo videos")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the demo videos' player movement")
+    parser.add_argument("--match-radii", type=float, default=MATCH_RADII,
+                        help="Distance in puck radii within which a reported position counts as correct")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this path")
+    args = parser.parse_args()
+
+    try:
+        report = {
+            'settings': {
+                'durationSeconds': args.duration,
+                'fps': args.fps,
+                'seed': args.seed,
+                'matchRadii': args.match_radii,
+                'puckRadius': PUCK_RADIUS,
+                'referenceWidth': REFERENCE_WIDTH
+            },
+            'scenarios': {}
+        }
+        with tempfile.TemporaryDirectory() as fixtures_dir:
+            for width, height in args.resolutions:
+                for players in args.players:
+                    video = os.path.join(fixtures_dir, f"demo_{width}x{height}_{players}p.mp4")
+                    # The generator reports on stdout, which carries the report
+                    with contextlib.redirect_stdout(sys.stderr):
+                        truth = create_demo_hockey_video(video, duration_seconds=args.duration, fps=args.fps,
+                                                         width=width, height=height, num_players=players,
+                                                         seed=args.seed)
+                    for stride in args.strides:
+                        name = f"{width}x{height}-{players}p-stride{stride}"
+                        print(f"Benchmarking {name}...", file=sys.stderr)
+                        report['scenarios'][name] = {
+                            'width': width,
+                            'height': height,
+                            'players': players,
+                            'stride': stride,
+                            **run_scenario(video, truth, stride, args.match_radii)
+                        }
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
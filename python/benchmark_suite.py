@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite
+Generates seeded create_demo_hockey_video fixtures for every combination
+of --resolutions, --durations and --players, and analyzes each one in a
+fresh process with a performance profile's models. Every stage of the
+analysis is timed separately:
+- decode: reading (and skipping, per the profile's sampling) frames
+- detection: detection and tracking of the analyzed frames
+- pose: pose estimation on pose frames, plus matching poses to tracks
+- motion: camera-motion estimation (as with --motion-compensation)
+- puck: puck detection and tracking (as with --puck-tracking)
+- metrics: track bookkeeping and the per-track movement metrics
+- serialization: writing the results as json, ndjson and npz
+along with model load time and the process's peak RSS. Prints one JSON
+report (and optionally writes it to --output); with --baseline it also
+compares against an earlier report and exits 1 on regressions.
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+import multiprocessing
+import platform
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+import ultralytics
+
+from analyze_video import (
+    DETECTION_ARGS, POSE_CONF, POSE_INTERVAL, TRACKER_CONFIG, detection_arrays, load_models, pose_arrays,
+    record_poses, warm_up_models
+)
+from camera_motion import CameraMotionEstimator
+from create_demo_video import create_demo_hockey_video
+from instrumentation import peak_rss_bytes
+from metrics import compute_track_metrics, summarize_metrics
+from profiles import PROFILES, get_profile, inference_args
+from puck_tracking import PuckTracker
+from result_writer import NpzResultWriter, open_result_writer
+from sampling import SamplingPolicy, sample_frames
+from track_store import PoseStore, TrackStore
+
+STAGES = ('decode', 'detection', 'pose', 'motion', 'puck', 'metrics', 'serialization')
+
+# A stage counts as regressed when it is this much slower than the baseline
+MAX_REGRESSION = 0.25
+
+
+def scenario_name(width, height, duration_seconds, players):
+    return f"{width}x{height}-{duration_seconds}s-{players}p"
+
+
+def create_fixture(directory, width, height, duration_seconds, players, fps, seed):
+    """Path of the demo video for one scenario, generated unless it already exists"""
+    path = os.path.join(directory, f"demo_{scenario_name(width, height, duration_seconds, players)}"
+                                   f"_{fps}fps_seed{seed}.mp4")
+    if not os.path.exists(path):
+        # The generator reports on stdout, which carries the report
+        with contextlib.redirect_stdout(sys.stderr):
+            create_demo_hockey_video(path, duration_seconds=duration_seconds, fps=fps, width=width,
+                                     height=height, num_players=players, seed=seed)
+    return path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    return round(peak_rss_bytes() / 1024 ** 2, 1)
+
+
+def stage_stats(seconds):
+    """Total seconds and per-call latency percentiles of one stage"""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    return {
+        'seconds': round(float(seconds.sum()), 4),
+        'calls': int(seconds.size),
+        'msP50': round(1000 * float(np.percentile(seconds, 50)), 3) if seconds.size else None,
+        'msP95': round(1000 * float(np.percentile(seconds, 95)), 3) if seconds.size else None
+    }
+
+
+def run_scenario(video_path, profile, output_dir):
+    """
+    Analyze one video stage by stage with the profile's models; runs in
+    its own process so peak RSS belongs to this scenario alone
+    """
+    started = time.perf_counter()
+    detection_model, pose_model = load_models(profile)
+    warm_up_models(detection_model, pose_model, profile=profile)
+    model_seconds = time.perf_counter() - started
+    model_rss = peak_rss_mb()
+
+    settings = get_profile(profile)
+    model_args = inference_args(settings)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video: {video_path}")
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    sampling = SamplingPolicy(fps, target_fps=settings['target_fps'], pose_interval=POSE_INTERVAL)
+
+    timings = {stage: [] for stage in STAGES}
+    player_tracks = TrackStore()
+    pose_data = PoseStore()
+    estimator = CameraMotionEstimator()
+    puck_tracker = PuckTracker()
+    frames = sample_frames(cap, fps, sampling)
+    try:
+        while True:
+            start = time.perf_counter()
+            item = next(frames, None)
+            timings['decode'].append(time.perf_counter() - start)
+            if item is None:
+                break
+            frame_number, timestamp, frame, run_pose = item
+
+            start = time.perf_counter()
+            result = detection_model.track(frame, persist=True, tracker=TRACKER_CONFIG, verbose=False,
+                                           **DETECTION_ARGS, **model_args)[0]
+            detections = detection_arrays(result)
+            timings['detection'].append(time.perf_counter() - start)
+
+            if run_pose:
+                start = time.perf_counter()
+                poses = pose_arrays(pose_model(frame, conf=POSE_CONF, verbose=False, **model_args)[0])
+                record_poses(pose_data, frame_number, timestamp, detections, poses)
+                timings['pose'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            estimator.update(frame_number, frame, detections[1])
+            timings['motion'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            puck_tracker.update(frame_number, timestamp, frame)
+            timings['puck'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            player_tracks.add_frame(frame_number, timestamp, *detections)
+            timings['metrics'].append(time.perf_counter() - start)
+    finally:
+        cap.release()
+
+    start = time.perf_counter()
+    tracks = [
+        (track_id, data, compute_track_metrics(data.positions, data.timestamps))
+        for track_id, data in player_tracks.items()
+        if len(data) >= sampling.min_track_detections
+    ]
+    summary = summarize_metrics([metrics for _, _, metrics in tracks])
+    timings['metrics'].append(time.perf_counter() - start)
+
+    header = {'videoId': 'benchmark', 'totalFrames': total_frames, 'fps': fps, 'duration': total_frames / fps}
+    serialization = {}
+    output_bytes = {}
+    for output_format in ('json', 'ndjson', 'npz'):
+        path = os.path.join(output_dir, f"results.{output_format}")
+        start = time.perf_counter()
+        if output_format == 'npz':
+            writer = NpzResultWriter(path, header)
+        else:
+            writer = open_result_writer(path, output_format, header)
+        for track_id, data, metrics in tracks:
+            writer.write_track(track_id, data, metrics)
+        for track_id, data in pose_data.items():
+            writer.write_pose(track_id, data)
+        writer.close([], summary)
+        seconds = time.perf_counter() - start
+        timings['serialization'].append(seconds)
+        serialization[output_format] = round(1000 * seconds, 3)
+        output_bytes[output_format] = os.path.getsize(path)
+
+    return {
+        'sourceFrames': total_frames,
+        'analyzedFrames': len(timings['detection']),
+        'poseFrames': len(timings['pose']),
+        'tracks': len(tracks),
+        'modelLoadSeconds': round(model_seconds, 3),
+        'modelRssMb': model_rss,
+        'peakRssMb': peak_rss_mb(),
+        'stages': {stage: stage_stats(seconds) for stage, seconds in timings.items()},
+        'serializationMs': serialization,
+        'outputBytes': output_bytes
+    }
+
+
+def run_isolated(video_path, profile):
+    """run_scenario in a fresh spawned process"""
+    with tempfile.TemporaryDirectory() as output_dir, ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_scenario, video_path, profile, output_dir).result()
+
+
+def environment():
+    """Software and hardware the report was measured on"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpuCount': os.cpu_count(),
+        'torch': torch.__version__,
+        'ultralytics': ultralytics.__version__,
+        'opencv': cv2.__version__,
+        'cuda': torch.cuda.is_available()
+    }
+
+
+def compare_reports(report, baseline, max_regression=MAX_REGRESSION):
+    """Stages of scenarios in both reports that got more than max_regression slower than the baseline"""
+    regressions = []
+    for name, scenario in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        for stage in STAGES:
+            seconds = scenario['stages'][stage]['seconds']
+            baseline_seconds = before['stages'].get(stage, {}).get('seconds')
+            if baseline_seconds and seconds > baseline_seconds * (1 + max_regression):
+                regressions.append({
+                    'scenario': name,
+                    'stage': stage,
+                    'seconds': seconds,
+                    'baselineSeconds': baseline_seconds,
+                    'change': round(seconds / baseline_seconds - 1, 3)
+                })
+    return regressions
+
+
+def parse_resolution(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got {value}")
+    return width, height
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every analysis stage on generated demo videos")
+    parser.add_argument("--profile", choices=PROFILES, default='fast', help="Performance profile to analyze with")
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(1280, 720), (1920, 1080)],
+                        metavar="WIDTHxHEIGHT")
+    parser.add_argument("--durations", type=int, nargs="+", default=[5], help="Seconds per demo video")
+    parser.add_argument("--players", type=int, nargs="+", default=[5, 12], help="Players per demo video")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate of the demo videos")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the demo videos' player movement")
+    parser.add_argument("--fixtures-dir", default=None,
+                        help="Keep generated videos here and reuse them across runs (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this path")
+    parser.add_argument("--baseline", default=None,
+                        help="Earlier report to compare against; regressed stages make the exit status 1")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION,
+                        help="Fraction a stage may be slower than the baseline before it counts as regressed")
+    args = parser.parse_args()
+
+    try:
+        report = {
+            'environment': environment(),
+            'settings': {
+                'profile': args.profile,
+                'fps': args.fps,
+                'seed': args.seed,
+                'profileSettings': get_profile(args.profile)
+            },
+            'scenarios': {}
+        }
+        with contextlib.ExitStack() as stack:
+            fixtures_dir = args.fixtures_dir or stack.enter_context(tempfile.TemporaryDirectory())
+            os.makedirs(fixtures_dir, exist_ok=True)
+            for width, height in args.resolutions:
+                for duration in args.durations:
+                    for players in args.players:
+                        name = scenario_name(width, height, duration, players)
+                        print(f"Benchmarking {name}...", file=sys.stderr)
+                        video = create_fixture(fixtures_dir, width, height, duration, players, args.fps, args.seed)
+                        report['scenarios'][name] = {
+                            'width': width,
+                            'height': height,
+                            'durationSeconds': duration,
+                            'players': players,
+                            **run_isolated(video, args.profile)
+                        }
+
+        regressions = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare_reports(report, json.load(f), args.max_regression)
+            report['regressions'] = regressions
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if regressions else 0)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
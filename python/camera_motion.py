@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Camera-motion compensation
+Estimates the camera's global motion between consecutive analyzed frames
+so a panning, tilting or zooming camera doesn't count as player
+movement. Corner features are tracked from frame to frame with
+pyramidal Lucas-Kanade optical flow on grayscale copies downscaled to
+MOTION_WIDTH pixels, leaving out features on the tracked players, and a
+similarity transform (translation, rotation, zoom) is fitted to them
+with RANSAC. That costs a few milliseconds per frame, well below
+detection.
+
+The frame-to-frame transforms are chained into one per analyzed frame
+that maps its pixels to the first analyzed frame's, the reference.
+CameraMotion maps whole position arrays to reference pixels in one
+batched matrix product.
+"""
+
+import bisect
+
+import cv2
+import numpy as np
+
+# Width of the grayscale frames motion is estimated on
+MOTION_WIDTH = 320
+
+# Corner features tracked; they are re-detected when fewer than MIN_FEATURES survive
+MAX_FEATURES = 200
+MIN_FEATURES = 60
+FEATURE_QUALITY = 0.01
+MIN_FEATURE_DISTANCE = 8
+
+# Optical flow window and pyramid levels (in downscaled pixels)
+FLOW_WINDOW = (21, 21)
+FLOW_LEVELS = 3
+
+# RANSAC inlier distance (downscaled pixels) and the inliers a transform needs;
+# with fewer (a cut, a featureless view) the frame counts as lost
+RANSAC_THRESHOLD = 1.0
+MIN_INLIERS = 12
+
+# Median feature movement (downscaled pixels) below which the camera is still;
+# the step is then exactly the identity so a fixed camera never drifts
+STILL_PIXELS = 0.1
+
+
+def _homogeneous(matrix):
+    return np.vstack((matrix, (0.0, 0.0, 1.0)))
+
+
+def _outside_boxes(points, bboxes):
+    """Mask of (n, 2) points outside every (m, 4) x1, y1, x2, y2 box"""
+    if bboxes is None or len(bboxes) == 0 or len(points) == 0:
+        return np.ones(len(points), dtype=bool)
+    x, y = points[:, None, 0], points[:, None, 1]
+    inside = (x >= bboxes[:, 0]) & (x <= bboxes[:, 2]) & (y >= bboxes[:, 1]) & (y <= bboxes[:, 3])
+    return ~inside.any(axis=1)
+
+
+class CameraMotion:
+    """Per analyzed frame, the 2x3 affine transform from its pixels to the reference frame's"""
+
+    def __init__(self, frame_numbers=(), transforms=()):
+        self.frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+        self.transforms = np.asarray(transforms, dtype=np.float64).reshape(-1, 2, 3)
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def transform_at(self, frame_number):
+        """3x3 transform of the last analyzed frame at or before frame_number (identity before the first)"""
+        index = np.searchsorted(self.frame_numbers, frame_number, side='right') - 1
+        if index < 0:
+            return np.eye(3)
+        return _homogeneous(self.transforms[index])
+
+    def compensate(self, frame_numbers, points):
+        """(n, 2) pixel points seen at frame_numbers, in reference frame pixels"""
+        points = np.asarray(points, dtype=np.float64)
+        if len(self.frame_numbers) == 0 or len(points) == 0:
+            return points
+        index = np.searchsorted(self.frame_numbers, frame_numbers, side='right') - 1
+        transforms = self.transforms[np.maximum(index, 0)]
+        return np.einsum('nij,nj->ni', transforms[:, :, :2], points) + transforms[:, :, 2]
+
+    def stats(self):
+        offsets = np.hypot(self.transforms[:, 0, 2], self.transforms[:, 1, 2]) if len(self) else np.zeros(1)
+        return {
+            'frames': len(self),
+            'maxOffsetPixels': round(float(offsets.max()), 1)
+        }
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        One CameraMotion from (first frame, CameraMotion) parts of
+        consecutive time segments. Each part's reference is its own first
+        analyzed frame, which lies in the previous part's overlap; it is
+        chained onto the previous part's transform there.
+        """
+        parts = sorted(parts, key=lambda part: part[0])
+        frame_numbers, transforms = [], []
+        previous = None
+        for i, (first_frame, part) in enumerate(parts):
+            if len(part) == 0:
+                continue
+            anchor = previous.transform_at(part.frame_numbers[0]) if previous is not None else np.eye(3)
+            chained = np.einsum('ij,njk->nik', anchor[:2], np.array([_homogeneous(m) for m in part.transforms]))
+            next_frame = parts[i + 1][0] if i + 1 < len(parts) else None
+            keep = part.frame_numbers >= first_frame
+            if next_frame is not None:
+                keep &= part.frame_numbers < next_frame
+            frame_numbers.append(part.frame_numbers[keep])
+            transforms.append(chained[keep])
+            previous = cls(part.frame_numbers, chained)
+        if not frame_numbers:
+            return cls()
+        return cls(np.concatenate(frame_numbers), np.concatenate(transforms))
+
+
+class CameraMotionEstimator:
+    """Incrementally estimates the camera motion of a video's analyzed frames, in order"""
+
+    def __init__(self):
+        self.previous = None
+        self.points = None
+        self.scale = None
+        self.cumulative = np.eye(3)
+        self.frame_numbers = []
+        self.transforms = []
+        self.lost_frames = 0
+        self._motion = None
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if self.scale is None:
+            self.scale = min(1.0, MOTION_WIDTH / width)
+        small = cv2.resize(frame, (round(width * self.scale), round(height * self.scale)),
+                           interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _detect(self, gray, bboxes):
+        mask = np.full(gray.shape, 255, dtype=np.uint8)
+        for x1, y1, x2, y2 in bboxes:
+            cv2.rectangle(mask, (int(x1), int(y1)), (int(x2), int(y2)), 0, -1)
+        points = cv2.goodFeaturesToTrack(gray, MAX_FEATURES, FEATURE_QUALITY, MIN_FEATURE_DISTANCE, mask=mask)
+        if points is None or len(points) < MIN_FEATURES:
+            # Players cover most of the view: RANSAC has to pick the background out
+            points = cv2.goodFeaturesToTrack(gray, MAX_FEATURES, FEATURE_QUALITY, MIN_FEATURE_DISTANCE)
+        return points.reshape(-1, 2) if points is not None else np.empty((0, 2), dtype=np.float32)
+
+    def _step(self, gray, bboxes):
+        """The similarity transform from the previous frame to this one (downscaled pixels), or None"""
+        if len(self.points) < MIN_INLIERS:
+            return None
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.previous, gray, self.points.reshape(-1, 1, 2), None,
+                                                    winSize=FLOW_WINDOW, maxLevel=FLOW_LEVELS)
+        moved = moved.reshape(-1, 2)
+        found = status.ravel() == 1
+        background = found & _outside_boxes(moved, bboxes)
+        if np.count_nonzero(background) >= MIN_INLIERS:
+            found = background
+        source, target = self.points[found], moved[found]
+        self.points = target
+        if len(source) < MIN_INLIERS:
+            return None
+        if np.median(np.hypot(*(target - source).T)) < STILL_PIXELS:
+            return np.eye(3)
+        matrix, inliers = cv2.estimateAffinePartial2D(source, target, method=cv2.RANSAC,
+                                                      ransacReprojThreshold=RANSAC_THRESHOLD)
+        if matrix is None or inliers.sum() < MIN_INLIERS:
+            return None
+        self.points = target[inliers.ravel() == 1]
+        return _homogeneous(matrix)
+
+    def update(self, frame_number, frame, bboxes=None):
+        """
+        Estimate the motion since the previous analyzed frame. `bboxes`
+        (n, 4) are the frame's tracked players, whose own movement is
+        left out.
+        """
+        gray = self._prepare(frame)
+        bboxes = np.asarray(bboxes if bboxes is not None else (), dtype=np.float64).reshape(-1, 4) * self.scale
+
+        if self.previous is not None:
+            step = self._step(gray, bboxes)
+            if step is None:
+                # Lost (a cut, say): positions continue from where the camera was
+                self.lost_frames += 1
+                step = np.eye(3)
+            # Back to full-resolution pixels, then frame -> reference through the previous frame
+            scale = np.diag((self.scale, self.scale, 1.0))
+            step = np.linalg.inv(scale) @ step @ scale
+            self.cumulative = self.cumulative @ np.linalg.inv(step)
+
+        if self.points is None or len(self.points) < MIN_FEATURES:
+            self.points = self._detect(gray, bboxes)
+        self.previous = gray
+        self.frame_numbers.append(frame_number)
+        self.transforms.append(self.cumulative[:2].copy())
+
+    def transform_at(self, frame_number):
+        """As CameraMotion.transform_at, for the frames estimated so far"""
+        index = bisect.bisect_right(self.frame_numbers, frame_number) - 1
+        if index < 0:
+            return np.eye(3)
+        return _homogeneous(self.transforms[index])
+
+    @property
+    def motion(self):
+        """CameraMotion of the frames so far"""
+        if self._motion is None or len(self._motion) != len(self.frame_numbers):
+            self._motion = CameraMotion(self.frame_numbers, self.transforms)
+        return self._motion
+
+    def stats(self):
+        return {**self.motion.stats(), 'lostFrames': self.lost_frames}
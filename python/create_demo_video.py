@@ -7,27 +7,32 @@ import cv2
 import numpy as np
 import sys
 
-def create_demo_hockey_video(output_path, duration_seconds=10, fps=30):
+def create_demo_hockey_video(output_path, duration_seconds=10, fps=30, width=1920, height=1080,
+                             num_players=5, seed=None):
     """
-    Create a realistic-looking hockey practice video with moving players
+    Create a realistic-looking hockey practice video with moving players.
+    A seed makes the player movement reproducible. Returns the puck's
+    ground truth, one (x, y, visible) per frame: its drawn center and
+    whether that is clear of the players drawn over it.
     """
-    width, height = 1920, 1080
+    # A local generator, so callers' global NumPy random state is left alone
+    rng = np.random.default_rng(seed)
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
     
     total_frames = duration_seconds * fps
     
-    # Create 5 players with different starting positions and velocities
+    # Create players with different starting positions and velocities
     players = []
-    for i in range(5):
-        angle = (i / 5) * 2 * np.pi
-        radius = 300
+    for i in range(num_players):
+        angle = (i / num_players) * 2 * np.pi
+        radius = min(300, min(width, height) // 3)
         players.append({
             'x': width//2 + radius * np.cos(angle),
             'y': height//2 + radius * np.sin(angle),
-            'vx': np.random.uniform(-3, 3),
-            'vy': np.random.uniform(-3, 3),
-            'color': (0, 0, 255) if i < 2 else (255, 0, 0),  # Red vs Blue teams
+            'vx': rng.uniform(-3, 3),
+            'vy': rng.uniform(-3, 3),
+            'color': (0, 0, 255) if i < num_players // 2 else (255, 0, 0),  # Red vs Blue teams
             'number': i + 1
         })
     
@@ -39,6 +44,8 @@ def create_demo_hockey_video(output_path, duration_seconds=10, fps=30):
         'vy': 3
     }
     
+    puck_track = []
+    
     for frame_num in range(total_frames):
         # Create ice rink background (white with blue tint)
         frame = np.ones((height, width, 3), dtype=np.uint8) * 230
@@ -87,15 +94,15 @@ def create_demo_hockey_video(output_path, duration_seconds=10, fps=30):
             margin = 100
             if player['x'] < margin or player['x'] > width - margin:
                 player['vx'] *= -1
-                player['vx'] += np.random.uniform(-0.5, 0.5)
+                player['vx'] += rng.uniform(-0.5, 0.5)
             if player['y'] < margin or player['y'] > height - margin:
                 player['vy'] *= -1
-                player['vy'] += np.random.uniform(-0.5, 0.5)
+                player['vy'] += rng.uniform(-0.5, 0.5)
             
             # Occasional direction changes (simulate skating maneuvers)
             if frame_num % 60 == 0:
-                player['vx'] += np.random.uniform(-1, 1)
-                player['vy'] += np.random.uniform(-1, 1)
+                player['vx'] += rng.uniform(-1, 1)
+                player['vy'] += rng.uniform(-1, 1)
                 # Limit speed
                 speed = np.sqrt(player['vx']**2 + player['vy']**2)
                 if speed > 5:
@@ -123,6 +130,15 @@ def create_demo_hockey_video(output_path, duration_seconds=10, fps=30):
             stick_end_y = py + int(60 * np.sin(stick_angle))
             cv2.line(frame, (px, py), (stick_end_x, stick_end_y), (139, 69, 19), 4)
         
+        # The puck is hidden where a player's body or head covers its center
+        puck_x, puck_y = int(puck['x']), int(puck['y'])
+        visible = all(
+            np.hypot(puck_x - int(player['x']), puck_y - int(player['y'])) > 35
+            and np.hypot(puck_x - int(player['x']), puck_y - int(player['y']) + 45) > 20
+            for player in players
+        )
+        puck_track.append((puck_x, puck_y, visible))
+        
         # Add frame counter and timestamp
         cv2.putText(frame, f"Frame: {frame_num}/{total_frames}", (20, 40),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
@@ -135,6 +151,7 @@ def create_demo_hockey_video(output_path, duration_seconds=10, fps=30):
     print(f"Demo video created: {output_path}")
     print(f"Duration: {duration_seconds}s, FPS: {fps}, Frames: {total_frames}")
     print(f"Resolution: {width}x{height}")
+    return puck_track
 
 if __name__ == "__main__":
     output_path = sys.argv[1] if len(sys.argv) > 1 else "/tmp/demo_hockey_practice.mp4"
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Streaming event detection
+Detects game events while frames are aggregated, from each track's most
+recent positions in meters:
+- sprint: smoothed speed above the sprint threshold long enough
+- hardStop: a fast skater slowing to a near standstill within a second
+- directionChange: a sharp turn at speed
+- playerEntered / playerLeft: tracks confirmed on the ice, and lost
+- lineChange: several players leaving and entering within a few seconds
+- possession: the player closest to the puck, once they keep it (only
+  when puck positions are given)
+
+Every track has a slot in fixed-size ring buffers of its recent
+positions, velocities and speeds. An analyzed frame updates the slots of
+the players in it with vectorized numpy operations over those windows,
+so the work per frame depends on the players on the ice, never on how
+much video came before. Tracks are expired in the order they were last
+seen, so the buffers' capacity doesn't add to it either.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from metrics import MIN_SPRINT_SECONDS, SPRINT_SPEED_KMH
+
+# Speeds are measured over this span, which also smooths box jitter
+SPEED_WINDOW_SECONDS = 0.5
+
+# A hard stop: from at least HARD_STOP_FROM_KMH to at most HARD_STOP_TO_KMH
+# within the last two speed windows
+HARD_STOP_FROM_KMH = 15.0
+HARD_STOP_TO_KMH = 5.0
+
+# A direction change: velocity turning at least this much over one speed
+# window, going at least TURN_MIN_SPEED_KMH before and after
+TURN_ANGLE_DEGREES = 60.0
+TURN_MIN_SPEED_KMH = 10.0
+
+# The same player event isn't reported again within this many seconds
+EVENT_COOLDOWN_SECONDS = 1.0
+
+# A track unseen this long has left the ice
+LEAVE_SECONDS = 3.0
+
+# A line change: at least this many players leaving and as many entering within this many seconds
+LINE_CHANGE_PLAYERS = 2
+LINE_CHANGE_SECONDS = 5.0
+
+# A possession candidate: the nearest player within this distance of the puck for this long
+POSSESSION_RADIUS = 1.5
+POSSESSION_SECONDS = 0.5
+
+# Player events with per-track cooldowns, by column
+COOLDOWN_EVENTS = ('hardStop', 'directionChange')
+
+INITIAL_SLOTS = 32
+
+
+def _confidence(value, threshold):
+    """0.5 at the threshold, growing to 1.0 at twice it"""
+    return round(float(min(1.0, 0.5 * value / threshold)), 2)
+
+
+class EventDetector:
+    """
+    Incremental event detection over the analyzed frames of one video,
+    in order. fps and stride give the analysis rate the windows are
+    sized for; tracks count once they have min_samples detections, like
+    the short-track filter of the results.
+    """
+
+    def __init__(self, fps, stride=1, min_samples=2, sprint_speed_kmh=SPRINT_SPEED_KMH,
+                 min_sprint_seconds=MIN_SPRINT_SECONDS):
+        rate = fps / stride if fps > 0 else 1.0
+        self.lag = max(1, int(round(SPEED_WINDOW_SECONDS * rate)))
+        self.window = 2 * self.lag + 1
+        self.min_samples = min_samples
+        self.sprint_speed = sprint_speed_kmh
+        self.min_sprint_seconds = min_sprint_seconds
+
+        self.slots = {}  # track id -> slot
+        self.free = []
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self._allocate(INITIAL_SLOTS)
+
+        self.events = []
+        self.sightings = deque()  # (timestamp, slots seen then), in frame order
+        self.recent_left = deque()
+        self.recent_entered = deque()
+        self.possession = {'candidate': None, 'since': None, 'holder': None}
+
+    def _allocate(self, size):
+        """Grow every per-slot array to `size` slots, keeping their contents"""
+        old = len(self.track_ids)
+        window = self.window
+        fields = {
+            # name: (shape per slot, fill, dtype)
+            'positions': ((window, 2), 0.0, np.float64),
+            'times': ((window,), 0.0, np.float64),
+            'velocities': ((window, 2), 0.0, np.float64),
+            'speeds': ((window,), np.nan, np.float64),
+            'count': ((), 0, np.int64),
+            'last_seen': ((), 0.0, np.float64),
+            'last_frame': ((), 0, np.int64),
+            'in_use': ((), False, bool),
+            'sprint_start': ((), np.nan, np.float64),
+            'sprint_frame': ((), 0, np.int64),
+            'sprint_last': ((), 0.0, np.float64),
+            'sprint_max': ((), 0.0, np.float64),
+            'cooldown': ((len(COOLDOWN_EVENTS),), -np.inf, np.float64),
+            'track_ids': ((), 0, np.int64)
+        }
+        for name, (shape, fill, dtype) in fields.items():
+            grown = np.full((size,) + shape, fill, dtype=dtype)
+            if old:
+                grown[:old] = getattr(self, name)
+            setattr(self, name, grown)
+        self.free.extend(range(size - 1, old - 1, -1))
+
+    def _slot(self, track_id):
+        slot = self.slots.get(track_id)
+        if slot is None:
+            if not self.free:
+                self._allocate(2 * len(self.track_ids))
+            slot = self.free.pop()
+            self.slots[track_id] = slot
+            self.track_ids[slot] = track_id
+            self.in_use[slot] = True
+            self.count[slot] = 0
+            self.speeds[slot] = np.nan
+            self.sprint_start[slot] = np.nan
+            self.cooldown[slot] = -np.inf
+        return slot
+
+    def _emit(self, event_type, frame_number, timestamp, confidence, description, track_id=None, **details):
+        event = {
+            'timestamp': float(timestamp),
+            'frameNumber': int(frame_number),
+            'type': event_type,
+            'confidence': confidence,
+            'description': description
+        }
+        if track_id is not None:
+            event['trackId'] = int(track_id)
+        event.update(details)
+        self.events.append(event)
+
+    def update(self, frame_number, timestamp, track_ids, positions, puck=None):
+        """
+        Add one analyzed frame: its tracked players' IDs and (n, 2)
+        positions in meters, and the puck's position in meters if known
+        """
+        self._expire(frame_number, timestamp)
+        if len(track_ids) == 0:
+            return
+        slots = np.fromiter((self._slot(track_id) for track_id in track_ids), dtype=np.intp, count=len(track_ids))
+        head = self.count[slots] % self.window
+        self.positions[slots, head] = positions
+        self.times[slots, head] = timestamp
+        self.count[slots] += 1
+        self.last_seen[slots] = timestamp
+        self.last_frame[slots] = frame_number
+        self.sightings.append((timestamp, slots))
+        count = self.count[slots]
+
+        for slot in slots[count == self.min_samples]:
+            self._entered(slot, frame_number, timestamp)
+
+        # Velocities over the last speed window, for tracks with enough samples
+        ready = count > self.lag
+        slots, head = slots[ready], head[ready]
+        if len(slots) == 0:
+            return
+        previous = (head - self.lag) % self.window
+        elapsed = self.times[slots, head] - self.times[slots, previous]
+        elapsed[elapsed <= 0] = np.nan
+        velocity = (self.positions[slots, head] - self.positions[slots, previous]) / elapsed[:, None]
+        speed = np.hypot(velocity[:, 0], velocity[:, 1]) * 3.6
+        self.velocities[slots, head] = velocity
+        self.speeds[slots, head] = speed
+
+        confirmed = self.count[slots] >= self.min_samples
+        self._sprints(slots[confirmed], speed[confirmed], frame_number, timestamp)
+        self._hard_stops(slots[confirmed], speed[confirmed], frame_number, timestamp)
+        self._direction_changes(slots[confirmed], head[confirmed], previous[confirmed], speed[confirmed],
+                                frame_number, timestamp)
+        if puck is not None:
+            self._possession(slots[confirmed], head[confirmed], puck, frame_number, timestamp)
+
+    def _sprints(self, slots, speed, frame_number, timestamp):
+        above = speed >= self.sprint_speed
+        sprinting = ~np.isnan(self.sprint_start[slots])
+
+        starting = slots[above & ~sprinting]
+        self.sprint_start[starting] = timestamp
+        self.sprint_frame[starting] = frame_number
+        self.sprint_max[starting] = 0.0
+        running = slots[above]
+        self.sprint_last[running] = timestamp
+        self.sprint_max[running] = np.maximum(self.sprint_max[running], speed[above])
+
+        for slot in slots[~above & sprinting]:
+            self._end_sprint(slot)
+
+    def _end_sprint(self, slot):
+        duration = self.sprint_last[slot] - self.sprint_start[slot]
+        if duration >= self.min_sprint_seconds:
+            max_speed = self.sprint_max[slot]
+            self._emit('sprint', self.sprint_frame[slot], self.sprint_start[slot],
+                       _confidence(duration, self.min_sprint_seconds),
+                       f"Player {self.track_ids[slot]} sprinted for {duration:.1f}s, up to {max_speed:.1f} km/h",
+                       self.track_ids[slot], durationSeconds=round(float(duration), 2),
+                       maxSpeed=round(float(max_speed), 2))
+        self.sprint_start[slot] = np.nan
+
+    def _hard_stops(self, slots, speed, frame_number, timestamp):
+        column = COOLDOWN_EVENTS.index('hardStop')
+        window_speeds = self.speeds[slots]
+        peak_index = np.argmax(np.where(np.isnan(window_speeds), -np.inf, window_speeds), axis=1)
+        peak = window_speeds[np.arange(len(slots)), peak_index]
+        stopped = ((peak >= HARD_STOP_FROM_KMH) & (speed <= HARD_STOP_TO_KMH)
+                   & (timestamp - self.cooldown[slots, column] >= EVENT_COOLDOWN_SECONDS))
+        for i in np.flatnonzero(stopped):
+            slot = slots[i]
+            elapsed = timestamp - self.times[slot, peak_index[i]]
+            deceleration = (peak[i] - speed[i]) / 3.6 / elapsed if elapsed > 0 else 0.0
+            self.cooldown[slot, column] = timestamp
+            self._emit('hardStop', frame_number, timestamp, _confidence(peak[i], HARD_STOP_FROM_KMH),
+                       f"Player {self.track_ids[slot]} stopped from {peak[i]:.1f} km/h",
+                       self.track_ids[slot], fromSpeed=round(float(peak[i]), 2),
+                       deceleration=round(float(deceleration), 2))
+
+    def _direction_changes(self, slots, head, previous, speed, frame_number, timestamp):
+        column = COOLDOWN_EVENTS.index('directionChange')
+        before = self.velocities[slots, previous]
+        before_speed = self.speeds[slots, previous]
+        after = self.velocities[slots, head]
+        fast = (speed >= TURN_MIN_SPEED_KMH) & (before_speed >= TURN_MIN_SPEED_KMH)
+        norms = np.hypot(before[:, 0], before[:, 1]) * np.hypot(after[:, 0], after[:, 1])
+        cosine = np.einsum('ij,ij->i', before, after) / np.where(norms > 0, norms, 1.0)
+        angle = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        turned = (fast & (angle >= TURN_ANGLE_DEGREES)
+                  & (timestamp - self.cooldown[slots, column] >= EVENT_COOLDOWN_SECONDS))
+        for i in np.flatnonzero(turned):
+            slot = slots[i]
+            self.cooldown[slot, column] = timestamp
+            self._emit('directionChange', frame_number, timestamp, _confidence(angle[i], TURN_ANGLE_DEGREES),
+                       f"Player {self.track_ids[slot]} turned {angle[i]:.0f} degrees at {speed[i]:.1f} km/h",
+                       self.track_ids[slot], angle=round(float(angle[i]), 1), speed=round(float(speed[i]), 2))
+
+    def _possession(self, slots, head, puck, frame_number, timestamp):
+        state = self.possession
+        if len(slots) == 0:
+            state['candidate'] = None
+            return
+        offsets = self.positions[slots, head] - np.asarray(puck, dtype=np.float64)
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        distances[np.isnan(distances)] = np.inf  # Positions seen uncalibrated
+        nearest = int(np.argmin(distances))
+        if distances[nearest] > POSSESSION_RADIUS:
+            state['candidate'] = None
+            return
+        track_id = int(self.track_ids[slots[nearest]])
+        if state['candidate'] != track_id:
+            state['candidate'], state['since'] = track_id, timestamp
+        elif timestamp - state['since'] >= POSSESSION_SECONDS and state['holder'] != track_id:
+            state['holder'] = track_id
+            self._emit('possession', frame_number, timestamp,
+                       _confidence(POSSESSION_RADIUS, max(distances[nearest], POSSESSION_RADIUS / 2)),
+                       f"Player {track_id} has the puck", track_id,
+                       distance=round(float(distances[nearest]), 2))
+
+    def _entered(self, slot, frame_number, timestamp):
+        track_id = self.track_ids[slot]
+        self._emit('playerEntered', frame_number, timestamp, 1.0, f"Player {track_id} came on the ice", track_id)
+        self.recent_entered.append(timestamp)
+        self._line_change(frame_number, timestamp)
+
+    def _expire(self, frame_number, timestamp):
+        """Free the slots of tracks unseen for LEAVE_SECONDS, reporting the confirmed ones as left"""
+        stale = []
+        while self.sightings and timestamp - self.sightings[0][0] > LEAVE_SECONDS:
+            seen_at, slots = self.sightings.popleft()
+            # Only a slot's latest sighting counts: it may have been seen since, or reused
+            stale.extend(slot for slot in slots if self.in_use[slot] and self.last_seen[slot] == seen_at)
+        for slot in stale:
+            track_id = self.track_ids[slot]
+            if self.count[slot] >= self.min_samples:
+                if not np.isnan(self.sprint_start[slot]):
+                    self._end_sprint(slot)
+                self._emit('playerLeft', self.last_frame[slot], self.last_seen[slot], 1.0,
+                           f"Player {track_id} left the ice", track_id)
+                self.recent_left.append(self.last_seen[slot])
+            self.in_use[slot] = False
+            del self.slots[int(track_id)]
+            self.free.append(slot)
+        if stale:
+            self._line_change(frame_number, timestamp)
+
+    def _line_change(self, frame_number, timestamp):
+        # Tracks leave at their last sighting, noticed LEAVE_SECONDS later: compare the times themselves
+        latest = max((recent[-1] for recent in (self.recent_left, self.recent_entered) if recent), default=timestamp)
+        for recent in (self.recent_left, self.recent_entered):
+            while recent and latest - recent[0] > LINE_CHANGE_SECONDS:
+                recent.popleft()
+        players = min(len(self.recent_left), len(self.recent_entered))
+        if players >= LINE_CHANGE_PLAYERS:
+            self._emit('lineChange', frame_number, timestamp, _confidence(players, LINE_CHANGE_PLAYERS),
+                       f"Line change: {len(self.recent_left)} players off, {len(self.recent_entered)} on",
+                       playersOff=len(self.recent_left), playersOn=len(self.recent_entered))
+            self.recent_left.clear()
+            self.recent_entered.clear()
+
+    def finish(self):
+        """Close sprints still running at the end of the video; all events in time order"""
+        for slot in np.flatnonzero(self.in_use & ~np.isnan(self.sprint_start)):
+            self._end_sprint(slot)
+        return sorted(self.events, key=lambda event: (event['timestamp'], event['frameNumber']))
+
+    def rebase(self):
+        """
+        Forget the buffered positions and speeds after positions switch
+        coordinate frames (rink calibration first succeeding), so no
+        velocity spans the switch. Running sprints end; tracks keep
+        their slots.
+        """
+        for slot in np.flatnonzero(self.in_use & ~np.isnan(self.sprint_start)):
+            self._end_sprint(slot)
+        self.positions[:] = np.nan
+        self.velocities[:] = np.nan
+        self.speeds[:] = np.nan
+
+    def counts(self):
+        """Events detected so far per type"""
+        counts = {}
+        for event in self.events:
+            counts[event['type']] = counts.get(event['type'], 0) + 1
+        return counts
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+CPU inference backends
+Loads the YOLO models on PyTorch, ONNX Runtime or OpenVINO. Exported
+models are built once per weights file, input size and precision, kept
+in an export directory and reused by every later run and process.
+Intra-op threads (parallelism inside one layer) and inter-op threads
+(independent layers at once) can be capped per process, which matters
+when several workers share one machine.
+"""
+
+import fcntl
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import torch
+from ultralytics import YOLO
+from ultralytics.cfg import DEFAULT_CFG_DICT
+
+DEFAULT_EXPORT_DIR = os.path.join(Path.home(), '.cache', 'hockey-dev-tracker', 'models')
+
+# Backend name -> ultralytics export format
+EXPORT_FORMATS = {
+    'onnx': 'onnx',
+    'openvino': 'openvino'
+}
+BACKENDS = ('pytorch', *EXPORT_FORMATS)
+
+# Newer ultralytics releases replaced the half argument with quantize
+HALF_PRECISION_ARGS = {'quantize': 16} if 'quantize' in DEFAULT_CFG_DICT else {'half': True}
+
+# Threads of one process share exports; other processes are held off by a lock file
+_export_lock = threading.Lock()
+
+
+def exported_model_path(weights, backend, imgsz, half, export_dir=DEFAULT_EXPORT_DIR):
+    """Where the export of `weights` for `backend` at this input size and precision is cached"""
+    name = f"{Path(weights).stem}-{imgsz}-{'fp16' if half else 'fp32'}"
+    if backend == 'openvino':
+        return os.path.join(export_dir, f"{name}_openvino_model")
+    return os.path.join(export_dir, f"{name}.{backend}")
+
+
+def export_model(weights, backend, imgsz, half=False, export_dir=DEFAULT_EXPORT_DIR):
+    """
+    Path of `weights` exported for `backend`, exporting it on first use.
+    Exports have dynamic input shapes, so batched calls and pose crops
+    of any size run on them. Half precision only exports on a GPU, so on
+    CPU the export is FP32, like PyTorch inference on CPU.
+    """
+    half = half and torch.cuda.is_available()
+    path = exported_model_path(weights, backend, imgsz, half, export_dir)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(export_dir, exist_ok=True)
+    with _export_lock, open(os.path.join(export_dir, '.export.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.exists(path):  # Exported by another process meanwhile
+            return path
+        precision = HALF_PRECISION_ARGS if half else {}
+        exported = YOLO(weights).export(format=EXPORT_FORMATS[backend], imgsz=imgsz, dynamic=True, **precision)
+        # ultralytics writes the export next to the weights; move it in under its cache name
+        staging = f"{path}.partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.move(str(exported), staging)
+        os.replace(staging, path)
+    return path
+
+
+def set_runtime_threads(model, backend, path, intra_op_threads=None, inter_op_threads=None):
+    """
+    Cap the thread pools of the exported model at `path` loaded as
+    `model`. ultralytics creates the runtime session when the model first
+    predicts, so the session is rebuilt with these settings from a
+    predict-start callback. OpenVINO only has an intra-op setting.
+    """
+    def on_predict_start(predictor):
+        runtime = getattr(predictor.model, 'backend', predictor.model)  # Newer releases wrap the runtime
+        if getattr(runtime, 'threads_configured', False):
+            return
+        if backend == 'onnx':
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            if intra_op_threads:
+                options.intra_op_num_threads = intra_op_threads
+            if inter_op_threads:
+                options.inter_op_num_threads = inter_op_threads
+            runtime.session = onnxruntime.InferenceSession(path, options, providers=runtime.session.get_providers())
+        elif backend == 'openvino' and intra_op_threads:
+            import openvino
+            runtime.ov_compiled_model = openvino.Core().compile_model(
+                str(next(Path(path).glob('*.xml'))),
+                'CPU',
+                {'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': intra_op_threads}
+            )
+        runtime.threads_configured = True
+
+    model.add_callback('on_predict_start', on_predict_start)
+
+
+def load_model(weights, backend='pytorch', imgsz=640, half=False, export_dir=DEFAULT_EXPORT_DIR,
+               intra_op_threads=None, inter_op_threads=None):
+    """A YOLO model for `weights` running on `backend`, with capped thread pools if given"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+    if backend == 'pytorch':
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError:
+                pass  # Only settable before the first parallel operation of the process
+        return YOLO(weights)
+
+    path = export_model(weights, backend, imgsz, half, export_dir)
+    model = YOLO(path)
+    if intra_op_threads or inter_op_threads:
+        set_runtime_threads(model, backend, path, intra_op_threads, inter_op_threads)
+    return model
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Raw inference store
+Records what the models produced for every analyzed frame (tracked
+person boxes and pose keypoints) before any track filtering or metric
+calculation, in one compressed `.npz`. recompute_metrics.py rebuilds
+playerTracking, poseAnalysis and summary from it with different metric
+parameters in seconds, without running the models again.
+
+Archive layout:
+- frames.frameNumber / frames.timestamp: one row per analyzed frame
+- frames.detectionStart / frames.poseStart: offsets of each frame's
+  first detection / pose row, with a final end offset (n + 1 entries),
+  so frame i's rows are start[i]:start[i + 1]
+- frames.poseRan: whether pose estimation ran on the frame
+- detections.trackId / .bbox (x1/y1/x2/y2) / .confidence
+- poses.keypoints (x/y/conf, n x 17 x 3) / .bbox (person box)
+- cameraMotion.frameNumber / .transform: with camera-motion
+  compensation, each analyzed frame's 2x3 transform to the reference
+  frame's pixels (see camera_motion)
+- puck.frameNumber / .timestamp / .position (x/y) / .detected: with puck
+  tracking, the puck trajectory (see puck_tracking)
+- metadata: JSON string with the video header and the sampling and
+  pipeline stats of the run
+"""
+
+import json
+
+import numpy as np
+
+from track_store import KEYPOINT_NAMES
+
+
+class InferenceRecorder:
+    """Collects per-frame model outputs and writes them to `path` on close"""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.frame_numbers = []
+        self.timestamps = []
+        self.pose_ran = []
+        self.detection_counts = []
+        self.pose_counts = []
+        self.detections = {'trackId': [], 'bbox': [], 'confidence': []}
+        self.poses = {'keypoints': [], 'bbox': []}
+
+    def add_frame(self, frame_number, timestamp, track_ids, bboxes, confidences,
+                  keypoints=None, pose_bboxes=None):
+        """
+        Record one analyzed frame: `track_ids` (n,), `bboxes` (n, 4) and
+        `confidences` (n,) of its tracked people and, if pose ran on it,
+        `keypoints` (m, 17, 3) with the matching person `pose_bboxes` (m, 4)
+        """
+        self.frame_numbers.append(frame_number)
+        self.timestamps.append(timestamp)
+        self.detection_counts.append(len(track_ids))
+        self.detections['trackId'].append(np.asarray(track_ids, dtype=np.int32))
+        self.detections['bbox'].append(np.asarray(bboxes, dtype=np.float32).reshape(-1, 4))
+        self.detections['confidence'].append(np.asarray(confidences, dtype=np.float32))
+
+        self.pose_ran.append(keypoints is not None)
+        if keypoints is None:
+            self.pose_counts.append(0)
+            return
+        self.pose_counts.append(len(keypoints))
+        self.poses['keypoints'].append(
+            np.asarray(keypoints, dtype=np.float32).reshape(-1, len(KEYPOINT_NAMES), 3))
+        self.poses['bbox'].append(np.asarray(pose_bboxes, dtype=np.float32).reshape(-1, 4))
+
+    def close(self, metadata=None, camera_motion=None, puck=None):
+        """
+        Write the archive; `metadata` is merged into the stored header,
+        and `camera_motion` (a camera_motion.CameraMotion) and `puck` (a
+        puck_tracking.PuckTrajectory) stored if given
+        """
+        tables = {
+            'frames.frameNumber': np.asarray(self.frame_numbers, dtype=np.int32),
+            'frames.timestamp': np.asarray(self.timestamps, dtype=np.float64),
+            'frames.poseRan': np.asarray(self.pose_ran, dtype=bool),
+            'frames.detectionStart': _offsets(self.detection_counts),
+            'frames.poseStart': _offsets(self.pose_counts),
+            'detections.trackId': _concat(self.detections['trackId'], np.int32, ()),
+            'detections.bbox': _concat(self.detections['bbox'], np.float32, (4,)),
+            'detections.confidence': _concat(self.detections['confidence'], np.float32, ()),
+            'poses.keypoints': _concat(self.poses['keypoints'], np.float32, (len(KEYPOINT_NAMES), 3)),
+            'poses.bbox': _concat(self.poses['bbox'], np.float32, (4,)),
+            'metadata': np.array(json.dumps({**self.header, **(metadata or {})}))
+        }
+        if camera_motion is not None:
+            tables['cameraMotion.frameNumber'] = camera_motion.frame_numbers.astype(np.int32)
+            tables['cameraMotion.transform'] = camera_motion.transforms
+        if puck is not None:
+            tables.update(puck.as_tables('puck'))
+        with open(self.path, 'wb') as f:
+            np.savez_compressed(f, **tables)
+
+
+def _offsets(counts):
+    return np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+
+
+def _concat(parts, dtype, row_shape):
+    if not parts:
+        return np.empty((0,) + row_shape, dtype=dtype)
+    return np.concatenate(parts).astype(dtype, copy=False)
+
+
+class InferenceData:
+    """A loaded inference archive; see the module docstring for the layout"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.metadata = json.loads(tables['metadata'].item())
+
+    def __len__(self):
+        return len(self.tables['frames.frameNumber'])
+
+    def frames(self):
+        """
+        Yield (frame_number, timestamp, (track_ids, bboxes, confidences),
+        (keypoints, pose_bboxes)) per analyzed frame, the pose arrays being
+        None on frames pose estimation didn't run on
+        """
+        t = self.tables
+        detection_start = t['frames.detectionStart']
+        pose_start = t['frames.poseStart']
+        for i, (frame_number, timestamp, pose_ran) in enumerate(zip(t['frames.frameNumber'].tolist(),
+                                                                     t['frames.timestamp'].tolist(),
+                                                                     t['frames.poseRan'].tolist())):
+            rows = slice(detection_start[i], detection_start[i + 1])
+            detections = (t['detections.trackId'][rows].tolist(), t['detections.bbox'][rows],
+                          t['detections.confidence'][rows])
+            poses = (None, None)
+            if pose_ran:
+                rows = slice(pose_start[i], pose_start[i + 1])
+                poses = (t['poses.keypoints'][rows], t['poses.bbox'][rows])
+            yield frame_number, timestamp, detections, poses
+
+
+def load_inference(path):
+    """Load an archive written by InferenceRecorder"""
+    with np.load(path) as archive:
+        return InferenceData({key: archive[key] for key in archive.files})
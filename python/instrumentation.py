@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Analysis instrumentation
+Per-stage latency histograms, analyzed frame counts and memory samples
+for one analysis run (or a whole service process), cheap enough to stay
+on all the time. Snapshots are plain dicts for the `metrics` progress
+lines and the results summary; prometheus_text renders the same data
+in the Prometheus text exposition format.
+
+profiled() is the opt-in deep dive: it runs cProfile on the calling
+thread and the pipeline threads it starts (decode and inference, see
+profile_thread) and writes one combined .prof file for pstats or
+snakeviz. Other threads are left alone, so concurrent service jobs can
+each be profiled into their own file. For sampling profilers such as py-spy nothing needs enabling;
+the pipeline threads are named after their stage.
+"""
+
+import bisect
+import cProfile
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Histogram bucket upper bounds in seconds (an implicit +Inf bucket follows)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def current_rss_bytes():
+    """Resident set size of this process now, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Histogram:
+    """Counts of observed durations per latency bucket, plus their sum and maximum"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """
+        Estimated q-quantile in seconds, interpolating within the bucket it
+        falls in like Prometheus' histogram_quantile (capped at the maximum)
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+    def cumulative_counts(self):
+        """(upper bound, observations at or below it) per bucket, ending with +Inf"""
+        bounds = [*self.buckets, float('inf')]
+        totals = []
+        running = 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return list(zip(bounds, totals))
+
+    def as_dict(self):
+        def ms(seconds):
+            return round(1000 * seconds, 3) if seconds is not None else None
+
+        return {
+            'count': self.count,
+            'totalSeconds': round(self.sum, 4),
+            'meanMs': ms(self.sum / self.count) if self.count else None,
+            'p50Ms': ms(self.quantile(0.5)),
+            'p95Ms': ms(self.quantile(0.95)),
+            'maxMs': ms(self.max),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): total
+                for bound, total in self.cumulative_counts()
+            }
+        }
+
+
+class Instrumentation:
+    """
+    Stage timings, analyzed frames and memory samples of one run. Safe to
+    use from several threads. Observations are also passed on to
+    `parent` when given, so a service can keep process-wide totals while
+    each job keeps its own.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self.frames = 0
+        self.max_rss = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Segment workers send their instrumentation back to the parent process
+        state = dict(self.__dict__)
+        del state['_lock']
+        state['parent'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+        if self.parent:
+            self.parent.observe(stage, seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Time the enclosed block as one call of `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def time_iterator(self, stage, items):
+        """Yield from `items`, timing each item's production as one call of `stage`"""
+        items = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def add_frames(self, count=1):
+        with self._lock:
+            self.frames += count
+        if self.parent:
+            self.parent.add_frames(count)
+
+    def sample_memory(self):
+        """Current RSS in bytes, also kept as the run's maximum sample"""
+        rss = current_rss_bytes()
+        if rss is not None:
+            with self._lock:
+                self.max_rss = max(self.max_rss, rss)
+        return rss
+
+    def merge(self, other):
+        """Add another run's observations (e.g. a segment worker's) to this one"""
+        with self._lock:
+            for stage, histogram in other.stages.items():
+                if stage not in self.stages:
+                    self.stages[stage] = Histogram(histogram.buckets)
+                self.stages[stage].merge(histogram)
+            self.frames += other.frames
+            self.max_rss = max(self.max_rss, other.max_rss)
+
+    def snapshot(self):
+        """Stage histograms, frames per second and memory so far, as a JSON-ready dict"""
+        rss = self.sample_memory()
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            stages = {stage: histogram.as_dict() for stage, histogram in self.stages.items()}
+            frames = self.frames
+            max_rss = self.max_rss
+        return {
+            'elapsedSeconds': round(elapsed, 3),
+            'frames': frames,
+            'fps': round(frames / elapsed, 2) if elapsed > 0 else 0,
+            'stages': stages,
+            'memory': {
+                'rssBytes': rss,
+                'maxSampledRssBytes': max_rss or None,
+                'peakRssBytes': peak_rss_bytes()
+            }
+        }
+
+
+def stage_timer(instruments, stage):
+    """instruments.time(stage), or a no-op when there is no instrumentation"""
+    return instruments.time(stage) if instruments is not None else nullcontext()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def prometheus_text(instruments, prefix='hockey_analysis', extra=()):
+    """
+    Prometheus text exposition of the stage histograms, analyzed frames
+    and process memory, followed by `extra` metrics: (name, type, help,
+    [(labels dict, value), ...]) tuples
+    """
+    lines = [
+        f"# HELP {prefix}_stage_seconds Duration of one call of an analysis stage",
+        f"# TYPE {prefix}_stage_seconds histogram"
+    ]
+    with instruments._lock:
+        histograms = sorted(instruments.stages.items())
+        frames = instruments.frames
+        for stage, histogram in histograms:
+            for bound, total in histogram.cumulative_counts():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {total}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+    lines += [
+        f"# HELP {prefix}_frames_total Video frames analyzed",
+        f"# TYPE {prefix}_frames_total counter",
+        f"{prefix}_frames_total {frames}"
+    ]
+    rss = current_rss_bytes()
+    if rss is not None:
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {rss}"
+        ]
+    lines += [
+        "# HELP process_peak_resident_memory_bytes Peak resident memory size in bytes",
+        "# TYPE process_peak_resident_memory_bytes gauge",
+        f"process_peak_resident_memory_bytes {peak_rss_bytes()}"
+    ]
+    for name, metric_type, help_text, samples in extra:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+
+# The profiled() block each thread is in, if any
+_profiling = threading.local()
+
+
+@contextmanager
+def profiled(path):
+    """
+    cProfile the calling thread inside the block, plus the threads whose
+    targets it wraps with profile_thread, writing the combined stats to
+    `path` on exit
+    """
+    profiler = cProfile.Profile()
+    session = {'profilers': [profiler], 'lock': threading.Lock()}
+    previous = getattr(_profiling, 'session', None)
+    _profiling.session = session
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiling.session = previous
+        with session['lock']:
+            stats = pstats.Stats(*session['profilers'])
+        stats.dump_stats(path)
+
+
+def profile_thread(target):
+    """
+    `target` for a new thread, profiled into the calling thread's
+    profiled() block if there is one. Each thread enables and disables
+    its own profiler; stats of threads still running when the block ends
+    are left out.
+    """
+    session = getattr(_profiling, 'session', None)
+    if session is None:
+        return target
+
+    def run(*args, **kwargs):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return target(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with session['lock']:
+                session['profilers'].append(profiler)
+    return run
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Per-track movement metrics
+Vectorized distance, speed, acceleration and sprint calculations over a
+track's position and timestamp arrays, shared by the analysis CLI and
+the microservice, plus posture angles from pose keypoints
+"""
+
+import numpy as np
+
+# Rough pixel scale until positions are calibrated to the rink
+PIXELS_PER_METER = 50
+
+# Smoothed speed a skater must hold for a stretch to count as a sprint
+SPRINT_SPEED_KMH = 20.0
+MIN_SPRINT_SECONDS = 1.0
+
+# Window for the moving-average speed profile
+SMOOTHING_SECONDS = 0.5
+
+# Spacing of the exported speed profile
+PROFILE_INTERVAL_SECONDS = 1.0
+
+# Confidence the shoulder and hip keypoints need for a skating angle
+SKATING_ANGLE_MIN_CONFIDENCE = 0.3
+
+# COCO keypoint indices
+LEFT_SHOULDER, RIGHT_SHOULDER = 5, 6
+LEFT_HIP, RIGHT_HIP = 11, 12
+
+
+def pixels_to_meters(pixels, reference_pixels_per_meter=PIXELS_PER_METER):
+    """Convert pixels to meters (rough estimation)"""
+    # This is a rough estimation - in production, use perspective transformation
+    # based on rink dimensions
+    return pixels / reference_pixels_per_meter
+
+
+def track_positions(track, rink=None, motion=None, pixels_per_meter=PIXELS_PER_METER):
+    """
+    (positions, pixels_per_meter) to compute a track's metrics from: its
+    box centers in pixels, moved into the camera's reference frame with
+    `motion` (camera_motion.CameraMotion), or mapped to rink meters from
+    where the skates touch the ice with `rink` (rink_calibration.RinkMapping)
+    """
+    if rink is None:
+        positions = track.positions
+        if motion is not None:
+            positions = motion.compensate(track.frames, positions)
+        return positions, pixels_per_meter
+    points = track.ground_positions
+    if motion is not None:
+        points = motion.compensate(track.frames, points)
+    return rink.to_rink(track.frames, points, pixels_per_meter, motion), 1.0
+
+
+def frame_points(frame_number, points, rink=None, motion=None, pixels_per_meter=PIXELS_PER_METER):
+    """
+    (n, 2) pixel points seen at frame_number in meters, on the same basis
+    as track_positions: `motion` and `rink` may also be estimated live
+    (anything with transform_at, such as a CameraMotionEstimator)
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if motion is not None:
+        transform = motion.transform_at(frame_number)
+        points = points @ transform[:2, :2].T + transform[:2, 2]
+    if rink is None:
+        return points / pixels_per_meter
+    return rink.to_rink(np.full(len(points), frame_number), points, pixels_per_meter, motion)
+
+
+def frame_positions(frame_number, bboxes, rink=None, motion=None, pixels_per_meter=PIXELS_PER_METER):
+    """Positions in meters of one frame's (n, 4) boxes, as frame_points"""
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    bottom = bboxes[:, 3] if rink is not None else (bboxes[:, 1] + bboxes[:, 3]) / 2
+    points = np.column_stack(((bboxes[:, 0] + bboxes[:, 2]) / 2, bottom))
+    return frame_points(frame_number, points, rink, motion, pixels_per_meter)
+
+
+def smooth(values, window):
+    """Centered moving average with a window of `window` samples"""
+    if window <= 1 or len(values) < 2:
+        return values
+    window = min(window, len(values))
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    half = window // 2
+    # Clamp window edges so the ends average over the samples available
+    lo = np.clip(np.arange(len(values)) - half, 0, len(values))
+    hi = np.clip(np.arange(len(values)) - half + window, 0, len(values))
+    return (cumsum[hi] - cumsum[lo]) / (hi - lo)
+
+
+def count_runs(mask, durations, min_duration):
+    """Count runs of True in `mask` whose summed `durations` reach `min_duration`"""
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    elapsed = np.concatenate(([0.0], np.cumsum(durations)))
+    return int(np.count_nonzero(elapsed[ends] - elapsed[starts] >= min_duration))
+
+
+def compute_track_metrics(positions, timestamps, pixels_per_meter=PIXELS_PER_METER,
+                          sprint_speed_kmh=SPRINT_SPEED_KMH, min_sprint_seconds=MIN_SPRINT_SECONDS,
+                          smoothing_seconds=SMOOTHING_SECONDS, profile_interval=PROFILE_INTERVAL_SECONDS):
+    """
+    Movement metrics for one track.
+
+    positions is an (n, 2) array of pixel coordinates and timestamps the
+    matching (n,) array of seconds. Samples may be unevenly spaced (track
+    gaps, sampled frames); each speed spans the real time between samples.
+    NaN positions (seen while rink calibration had failed) are skipped
+    along with the steps to and from them.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+
+    metrics = {
+        'totalDistance': 0.0,
+        'averageSpeed': 0.0,
+        'maxSpeed': 0.0,
+        'timeOnIce': 0.0,
+        'maxAcceleration': 0.0,
+        'maxDeceleration': 0.0,
+        'sprintCount': 0,
+        'speedProfile': {
+            'startTime': float(timestamps[0]) if len(timestamps) else 0.0,
+            'interval': profile_interval,
+            'speeds': []
+        }
+    }
+    if len(positions) < 2:
+        return metrics
+
+    steps = np.diff(positions, axis=0)
+    distances = pixels_to_meters(np.hypot(steps[:, 0], steps[:, 1]), pixels_per_meter)
+    time_diffs = np.diff(timestamps)
+
+    metrics['totalDistance'] = round(float(np.nansum(distances)), 2)
+    metrics['timeOnIce'] = round(float(timestamps[-1] - timestamps[0]), 2)
+
+    moving = (time_diffs > 0) & ~np.isnan(distances)
+    if not moving.any():
+        return metrics
+
+    distances = distances[moving]
+    time_diffs = time_diffs[moving]
+    speed_times = timestamps[1:][moving]
+    speeds = distances / time_diffs * 3.6  # km/h
+
+    # Mean of the per-step speeds, as before sampling; steps are not time-weighted
+    metrics['averageSpeed'] = round(float(speeds.mean()), 2)
+    metrics['maxSpeed'] = round(float(speeds.max()), 2)
+
+    # Smooth detection jitter before differentiating
+    window = int(round(smoothing_seconds / np.median(time_diffs)))
+    smoothed = smooth(speeds, window)
+
+    if len(smoothed) > 1:
+        accelerations = np.diff(smoothed / 3.6) / np.diff(speed_times)  # m/s^2
+        metrics['maxAcceleration'] = round(float(max(accelerations.max(), 0.0)), 2)
+        metrics['maxDeceleration'] = round(float(max(-accelerations.min(), 0.0)), 2)
+
+    metrics['sprintCount'] = count_runs(smoothed >= sprint_speed_kmh, time_diffs, min_sprint_seconds)
+
+    profile_times = np.arange(timestamps[0], speed_times[-1] + 1e-9, profile_interval)
+    metrics['speedProfile']['speeds'] = np.round(np.interp(profile_times, speed_times, smoothed), 2).tolist()
+
+    return metrics
+
+
+def skating_angles(keypoints, min_confidence=SKATING_ANGLE_MIN_CONFIDENCE):
+    """
+    Body lean in degrees for each pose in `keypoints`, an (n, 17, 3)
+    x/y/conf array: the angle of the hip-center to shoulder-center
+    vector. NaN where a shoulder or hip is below `min_confidence`.
+    """
+    keypoints = np.asarray(keypoints)
+    torso = keypoints[:, [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]]
+    visible = (torso[:, :, 2] > min_confidence).all(axis=1)
+
+    shoulder_center = (torso[:, 0, :2] + torso[:, 1, :2]) / 2
+    hip_center = (torso[:, 2, :2] + torso[:, 3, :2]) / 2
+    dx, dy = (shoulder_center - hip_center).T
+    angles = np.degrees(np.arctan2(dy, dx)).astype(np.float64)
+    angles[~visible] = np.nan
+    return angles
+
+
+def summarize_metrics(track_metrics):
+    """Video-level totals over the reported tracks' metrics"""
+    return {
+        'totalPlayers': len(track_metrics),
+        'averageSpeed': round(np.mean([m['averageSpeed'] for m in track_metrics]) if track_metrics else 0, 2),
+        'totalDistance': round(sum([m['totalDistance'] for m in track_metrics]), 2)
+    }
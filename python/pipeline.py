@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Threaded frame-processing pipeline
+Decoding, model inference and result aggregation run as separate stages
+joined by bounded queues, so decoding frame N+1 overlaps inference on
+frame N while the number of frames held in memory stays capped
+"""
+
+import queue
+import threading
+import time
+
+from instrumentation import profile_thread
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class StageStats:
+    """Work counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self, elapsed):
+        return {
+            'items': self.items,
+            'busySeconds': round(self.busy_seconds, 3),
+            # Rate the stage could sustain on its own vs. what it achieved
+            'itemsPerSecond': round(self.items / self.busy_seconds, 2) if self.busy_seconds > 0 else 0,
+            'effectiveItemsPerSecond': round(self.items / elapsed, 2) if elapsed > 0 else 0,
+            'utilization': round(self.busy_seconds / elapsed, 3) if elapsed > 0 else 0
+        }
+
+
+class QueueStats:
+    """Depth samples for one bounded queue, taken whenever it is consumed"""
+
+    def __init__(self, name, q):
+        self.name = name
+        self.queue = q
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self):
+        depth = self.queue.qsize()
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self):
+        return {
+            'capacity': self.queue.maxsize,
+            'depth': self.queue.qsize(),
+            'maxDepth': self.max_depth,
+            'meanDepth': round(self.total_depth / self.samples, 2) if self.samples else 0
+        }
+
+
+class FramePipeline:
+    """
+    Three-stage producer/consumer pipeline.
+
+    - decode: a background thread pulls items from the `frames` iterator
+    - inference: a background thread groups decoded items into batches of
+      `batch_size` and calls `infer(batch)`
+    - aggregation: the calling thread runs `aggregate(batch, output)` in
+      frame order
+
+    Exceptions raised in any stage stop the pipeline and are re-raised
+    from `run()`.
+    """
+
+    def __init__(self, infer, aggregate, batch_size=1, queue_size=8):
+        self.infer = infer
+        self.aggregate = aggregate
+        self.batch_size = max(1, batch_size)
+
+        self.decoded = queue.Queue(maxsize=max(1, queue_size))
+        # Inferred batches are bigger, so keep fewer of them in flight
+        self.inferred = queue.Queue(maxsize=max(1, queue_size // self.batch_size))
+
+        self.stages = {
+            'decode': StageStats('decode'),
+            'inference': StageStats('inference'),
+            'aggregation': StageStats('aggregation')
+        }
+        self.queues = {
+            'decoded': QueueStats('decoded', self.decoded),
+            'inferred': QueueStats('inferred', self.inferred)
+        }
+
+        self._stop = threading.Event()
+        self._error = None
+        self._started_at = None
+        self._finished_at = None
+
+    def run(self, frames):
+        """Process every item from `frames` and block until done"""
+        self._started_at = time.perf_counter()
+        threads = [
+            threading.Thread(target=profile_thread(self._decode), args=(iter(frames),), name='pipeline-decode',
+                             daemon=True),
+            threading.Thread(target=profile_thread(self._inference), name='pipeline-inference', daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._aggregation()
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._finished_at = time.perf_counter()
+
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        """Per-stage throughput and queue depths, safe to call mid-run"""
+        end = self._finished_at or time.perf_counter()
+        elapsed = end - self._started_at if self._started_at else 0
+        return {
+            'elapsedSeconds': round(elapsed, 3),
+            'batchSize': self.batch_size,
+            'stages': {name: stage.as_dict(elapsed) for name, stage in self.stages.items()},
+            'queues': {name: q.as_dict() for name, q in self.queues.items()},
+            'bottleneck': max(self.stages, key=lambda name: self.stages[name].busy_seconds)
+        }
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _put(self, q, item):
+        # Poll so a failed downstream stage can't leave producers blocked
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _decode(self, frames):
+        stats = self.stages['decode']
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(frames)
+                except StopIteration:
+                    break
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+                if not self._put(self.decoded, item):
+                    return
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.decoded, _DONE)
+
+    def _inference(self):
+        stats = self.stages['inference']
+        batch = []
+        try:
+            while True:
+                self.queues['decoded'].sample()
+                item = self._get(self.decoded)
+                if self._stop.is_set():
+                    break
+                if item is not _DONE:
+                    batch.append(item)
+                if batch and (item is _DONE or len(batch) >= self.batch_size):
+                    start = time.perf_counter()
+                    output = self.infer(batch)
+                    stats.busy_seconds += time.perf_counter() - start
+                    stats.items += len(batch)
+                    if not self._put(self.inferred, (batch, output)):
+                        return
+                    batch = []
+                if item is _DONE:
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self.inferred, _DONE)
+
+    def _aggregation(self):
+        stats = self.stages['aggregation']
+        while True:
+            self.queues['inferred'].sample()
+            item = self._get(self.inferred)
+            if item is _DONE:
+                break
+            batch, output = item
+            start = time.perf_counter()
+            self.aggregate(batch, output)
+            stats.busy_seconds += time.perf_counter() - start
+            stats.items += len(batch)
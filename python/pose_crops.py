@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Crop-based pose estimation
+Runs the pose model on padded crops of the tracked player boxes instead
+of on the whole frame. The detector has already found every player, so
+each crop is letterboxed to a small fixed input and all of a batch's
+crops go through the pose model together; keypoints are shifted back to
+frame coordinates, keeping at most one pose per player box.
+"""
+
+import numpy as np
+
+from association import MIN_POSE_MATCH_SCORE, pose_match_scores
+from track_store import KEYPOINT_NAMES
+
+# Margin added around each player box, as a fraction of its width/height
+POSE_CROP_PADDING = 0.15
+
+# Pose model input (height, width) every crop is letterboxed to
+POSE_CROP_SIZE = (192, 128)
+
+# Most crops sent to the pose model in one call
+POSE_CROP_BATCH = 64
+
+
+def crop_regions(boxes, frame_shape, padding=POSE_CROP_PADDING):
+    """
+    Integer x1/y1/x2/y2 crop regions for (n, 4) boxes: each box grown by
+    `padding` of its size on every side and clipped to the frame
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    margin = np.tile(boxes[:, 2:] - boxes[:, :2], 2) * padding
+    grown = boxes + margin * [-1, -1, 1, 1]
+    height, width = frame_shape[:2]
+    regions = np.concatenate([np.floor(grown[:, :2]), np.ceil(grown[:, 2:])], axis=1)
+    return np.clip(regions, 0, [width, height, width, height]).astype(int)
+
+
+def estimate_crop_poses(pose_model, frames, boxes, padding=POSE_CROP_PADDING, crop_size=POSE_CROP_SIZE,
+                        max_batch=POSE_CROP_BATCH, **predict_kwargs):
+    """
+    Pose estimates for the player boxes of several frames, from crops.
+
+    frames is a list of images and boxes the matching list of (n, 4)
+    x1/y1/x2/y2 player boxes. Returns one (keypoints (k, 17, 3), pose
+    boxes (k, 4)) pair per frame in frame coordinates, the same arrays
+    a full-frame pose pass gives, with k <= n: a crop that also shows a
+    neighbour keeps only the pose matching its own player.
+    """
+    crops = []
+    owners = []  # (frame index, crop origin, player box in crop coordinates) per crop
+    for index, (frame, frame_boxes) in enumerate(zip(frames, boxes)):
+        frame_boxes = np.asarray(frame_boxes, dtype=np.float32).reshape(-1, 4)
+        for box, (x1, y1, x2, y2) in zip(frame_boxes, crop_regions(frame_boxes, frame.shape, padding)):
+            if x2 <= x1 or y2 <= y1:
+                continue
+            crops.append(frame[y1:y2, x1:x2])
+            origin = np.array([x1, y1], dtype=np.float32)
+            owners.append((index, origin, box - np.tile(origin, 2)))
+
+    keypoints = [[] for _ in frames]
+    pose_boxes = [[] for _ in frames]
+    for start in range(0, len(crops), max_batch):
+        results = pose_model(crops[start:start + max_batch], imgsz=list(crop_size), verbose=False, **predict_kwargs)
+        for result, (index, origin, box) in zip(results, owners[start:start + max_batch]):
+            if result.keypoints is None:
+                continue
+            crop_keypoints = result.keypoints.data.cpu().numpy()[:, :len(KEYPOINT_NAMES)]
+            if len(crop_keypoints) == 0:
+                continue
+            crop_boxes = result.boxes.xyxy.cpu().numpy()
+            scores = pose_match_scores(crop_keypoints, crop_boxes, box[None])[:, 0]
+            best = int(np.argmax(scores))
+            if scores[best] < MIN_POSE_MATCH_SCORE:
+                continue
+            pose = crop_keypoints[best].copy()
+            pose[:, :2] += origin
+            keypoints[index].append(pose)
+            pose_boxes[index].append(crop_boxes[best] + np.tile(origin, 2))
+
+    return [
+        (np.array(frame_keypoints, dtype=np.float32).reshape(-1, len(KEYPOINT_NAMES), 3),
+         np.array(frame_boxes, dtype=np.float32).reshape(-1, 4))
+        for frame_keypoints, frame_boxes in zip(keypoints, pose_boxes)
+    ]
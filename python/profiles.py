@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Performance profiles
+Named presets that trade accuracy for speed, shared by analyze_video.py
+and the analysis microservice. A profile picks the detection and pose
+weights, the model input size, half precision (only applied on GPU),
+the inference backend and the analysis frame rate used when a request
+doesn't set one.
+"""
+
+from inference_backends import BACKENDS, DEFAULT_EXPORT_DIR, HALF_PRECISION_ARGS, load_model
+
+PROFILES = {
+    # The microservice's setup before profiles existed, and still its default
+    'nano': {
+        'detection_weights': 'yolov8n.pt',
+        'pose_weights': 'yolov8n-pose.pt',
+        'imgsz': 640,
+        'half': False,
+        'backend': 'pytorch',
+        'target_fps': None
+    },
+    'fast': {
+        'detection_weights': 'yolov8n.pt',
+        'pose_weights': 'yolov8n-pose.pt',
+        'imgsz': 480,
+        'half': True,
+        'backend': 'pytorch',
+        'target_fps': 10
+    },
+    'balanced': {
+        'detection_weights': 'yolov8s.pt',
+        'pose_weights': 'yolov8s-pose.pt',
+        'imgsz': 640,
+        'half': True,
+        'backend': 'pytorch',
+        'target_fps': 15
+    },
+    'accurate': {
+        'detection_weights': 'yolov8x.pt',
+        'pose_weights': 'yolov8x-pose.pt',
+        'imgsz': 640,
+        'half': False,
+        'backend': 'pytorch',
+        'target_fps': None  # Every frame
+    }
+}
+
+DEFAULT_PROFILE = 'accurate'
+
+
+def get_profile(name, backend=None):
+    """Settings of the named profile, on `backend` instead of its own if given"""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile: {name} (expected one of {', '.join(PROFILES)})")
+    if backend is None:
+        return PROFILES[name]
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    return {**PROFILES[name], 'backend': backend}
+
+
+def precision_args(profile):
+    """Keyword arguments selecting a profile's inference precision"""
+    return dict(HALF_PRECISION_ARGS) if profile['half'] else {}
+
+
+def inference_args(profile):
+    """Keyword arguments a profile adds to every predict/track call"""
+    return {'imgsz': profile['imgsz'], **precision_args(profile)}
+
+
+def load_profile_models(profile, export_dir=DEFAULT_EXPORT_DIR, intra_op_threads=None, inter_op_threads=None):
+    """
+    (detection_model, pose_model) with a profile's weights on its backend
+    (see inference_backends), exporting them on first use
+    """
+    options = {
+        'backend': profile['backend'],
+        'imgsz': profile['imgsz'],
+        'half': profile['half'],
+        'export_dir': export_dir,
+        'intra_op_threads': intra_op_threads,
+        'inter_op_threads': inter_op_threads
+    }
+    return load_model(profile['detection_weights'], **options), load_model(profile['pose_weights'], **options)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Puck tracking
+The player detector only looks for people, and a puck is a few pixels
+across, far below what it resolves at its input size. The puck is found
+with a cheap classical detector instead: dark, compact, roughly round
+blobs of about the expected puck size (motion blur may stretch them).
+
+Only small regions of each frame are searched:
+- while the puck is tracked, a window around the position a constant-
+  velocity Kalman filter predicts, sized by the filter's uncertainty
+- otherwise, the tiles of a coarse grid in which dark pixels moved since
+  the previous analyzed frame, from a downscaled frame difference
+
+A track starts on a candidate that moved since the previous search, and
+has to be found CONFIRM_HITS times in a row before it counts as the
+puck. An occluded puck is carried on the prediction for up
+to COAST_SECONDS. Those predicted positions are kept (flagged as not
+detected) only when the puck is found again.
+"""
+
+import cv2
+import numpy as np
+
+# Expected puck radius in pixels, for 1920-pixel-wide frames; scaled with the frame width
+PUCK_RADIUS = 8.0
+REFERENCE_WIDTH = 1920
+
+# Puck pixels: no channel brighter than this (black rubber, unlike dark team colors)
+PUCK_MAX_VALUE = 70
+
+# Candidate blobs: area within these multiples of the expected puck area, at
+# least this share of their bounding box filled (a disc fills 0.785), and no
+# more elongated than MAX_ASPECT
+MIN_AREA_RATIO = 0.25
+MAX_AREA_RATIO = 4.0
+MIN_FILL = 0.55
+MAX_ASPECT = 3.0
+
+# Acquisition: frames are compared at 1 / MOTION_SCALE size; tiles of TILE_SIZE
+# pixels in which dark pixels changed by more than MOTION_THRESHOLD are searched
+MOTION_SCALE = 4
+MOTION_THRESHOLD = 25
+TILE_SIZE = 128
+
+# Above this share of active tiles (a camera pan), the whole frame is searched at once
+MAX_TILE_FRACTION = 0.5
+
+# A new track starts on a candidate whose nearest candidate in the previous
+# search moved at least this many puck radii (static dark marks, and overlay
+# text changing in place, don't), and is only confirmed once it moved as far
+MIN_MOVE_RADII = 0.5
+
+# Kalman filter noise, in reference pixels: the puck's acceleration (passes,
+# bounces) and the detector's position error; new tracks' speed is unknown
+ACCELERATION_NOISE = 3000.0
+MEASUREMENT_NOISE = 1.0
+INITIAL_SPEED = 300.0
+
+# Candidates further than this many standard deviations (Mahalanobis distance)
+# from the predicted position aren't the puck; the search window covers them,
+# plus two puck radii, clamped in puck radii
+GATE_SIGMAS = 4.0
+MAX_WINDOW_RADII = 24
+
+# Detections a new track needs, and how long a track carries on without any
+CONFIRM_HITS = 3
+COAST_SECONDS = 0.5
+
+
+def detect_pucks(frame, region, radius):
+    """
+    Puck candidates in `region` (x1, y1, x2, y2) of a BGR frame, as an
+    (n, 3) array of x, y in frame pixels and a 0-1 roundness score
+    """
+    x1, y1, x2, y2 = region
+    mask = cv2.inRange(frame[y1:y2, x1:x2], (0, 0, 0), (PUCK_MAX_VALUE,) * 3)
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    stats, centroids = stats[1:], centroids[1:]
+    if len(stats) == 0:
+        return np.empty((0, 3))
+
+    area = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+    width = stats[:, cv2.CC_STAT_WIDTH].astype(np.float64)
+    height = stats[:, cv2.CC_STAT_HEIGHT].astype(np.float64)
+    expected = np.pi * radius ** 2
+    fill = area / (width * height)
+    aspect = np.minimum(width, height) / np.maximum(width, height)
+    keep = ((area >= MIN_AREA_RATIO * expected) & (area <= MAX_AREA_RATIO * expected)
+            & (fill >= MIN_FILL) & (aspect >= 1 / MAX_ASPECT))
+    score = np.minimum(1.0, fill / (np.pi / 4)) * aspect
+    return np.column_stack((centroids[keep] + (x1, y1), score[keep]))
+
+
+class PuckTrajectory:
+    """Per analyzed frame with a tracked puck: its position in pixels and whether it was detected there"""
+
+    def __init__(self, frame_numbers=(), timestamps=(), positions=(), detected=()):
+        self.frame_numbers = list(frame_numbers)
+        self.timestamps = list(timestamps)
+        self.positions = [tuple(position) for position in positions]
+        self.detected = list(detected)
+        self._index = {frame_number: i for i, frame_number in enumerate(self.frame_numbers)}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def add(self, frame_number, timestamp, position, detected):
+        self._index[frame_number] = len(self.frame_numbers)
+        self.frame_numbers.append(frame_number)
+        self.timestamps.append(timestamp)
+        self.positions.append((float(position[0]), float(position[1])))
+        self.detected.append(bool(detected))
+
+    def detected_at(self, frame_number):
+        """Puck position detected at frame_number, or None"""
+        i = self._index.get(frame_number)
+        if i is None or not self.detected[i]:
+            return None
+        return self.positions[i]
+
+    def to_frames(self):
+        """JSON-ready `puckTracking` entries"""
+        return [
+            {'frameNumber': frame_number, 'timestamp': timestamp, 'x': x, 'y': y, 'detected': detected}
+            for frame_number, timestamp, (x, y), detected in zip(
+                self.frame_numbers, self.timestamps, self.positions, self.detected
+            )
+        ]
+
+    def as_tables(self, prefix='puck'):
+        """Columns for an .npz archive"""
+        return {
+            f'{prefix}.frameNumber': np.asarray(self.frame_numbers, dtype=np.int32),
+            f'{prefix}.timestamp': np.asarray(self.timestamps, dtype=np.float64),
+            f'{prefix}.position': np.asarray(self.positions, dtype=np.float64).reshape(-1, 2),
+            f'{prefix}.detected': np.asarray(self.detected, dtype=bool)
+        }
+
+    @classmethod
+    def from_tables(cls, tables, prefix='puck'):
+        return cls(tables[f'{prefix}.frameNumber'].tolist(), tables[f'{prefix}.timestamp'].tolist(),
+                   tables[f'{prefix}.position'].tolist(), tables[f'{prefix}.detected'].tolist())
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        One trajectory from (first frame, PuckTrajectory) parts of
+        consecutive time segments, each kept from its first frame up to
+        the next part's
+        """
+        parts = sorted(parts, key=lambda part: part[0])
+        combined = cls()
+        for i, (first_frame, part) in enumerate(parts):
+            next_frame = parts[i + 1][0] if i + 1 < len(parts) else None
+            for frame_number, timestamp, position, detected in zip(
+                part.frame_numbers, part.timestamps, part.positions, part.detected
+            ):
+                if frame_number >= first_frame and (next_frame is None or frame_number < next_frame):
+                    combined.add(frame_number, timestamp, position, detected)
+        return combined
+
+    def stats(self):
+        detected = sum(self.detected)
+        return {
+            'frames': len(self),
+            'framesDetected': detected,
+            'framesPredicted': len(self) - detected
+        }
+
+
+class PuckTracker:
+    """Incrementally tracks the puck over a video's analyzed frames, in order"""
+
+    def __init__(self, radius=None):
+        self.radius = radius
+        self.scale = None
+        self.trajectory = PuckTrajectory()
+        self.state = None  # x, y, vx, vy
+        self.covariance = None
+        self.last_timestamp = None
+        self.last_detected = None
+        self.hits = 0
+        self.coasted = []  # predictions since the last detection
+        self.previous_small = None
+        self.previous_candidates = None
+        self.start_position = None
+        self.tracks = 0
+        self.window_searches = 0
+        self.tile_searches = 0
+        self.tiles_searched = 0
+
+    def _predict(self, dt):
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        q = (ACCELERATION_NOISE * self.scale) ** 2
+        # Piecewise white acceleration, per axis
+        noise = np.zeros((4, 4))
+        noise[[0, 1], [0, 1]] = dt ** 4 / 4 * q
+        noise[[0, 1, 2, 3], [2, 3, 0, 1]] = dt ** 3 / 2 * q
+        noise[[2, 3], [2, 3]] = dt ** 2 * q
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + noise
+
+    def _correct(self, position):
+        innovation = self.covariance[:2, :2] + np.eye(2) * (MEASUREMENT_NOISE * self.scale) ** 2
+        gain = self.covariance[:, :2] @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ (np.asarray(position) - self.state[:2])
+        self.covariance = self.covariance - gain @ self.covariance[:2]
+
+    def _start(self, position, velocity):
+        self.state = np.array([position[0], position[1], velocity[0], velocity[1]])
+        self.start_position = self.state[:2].copy()
+        position_variance = (MEASUREMENT_NOISE * self.scale) ** 2
+        speed_variance = (INITIAL_SPEED * self.scale) ** 2
+        self.covariance = np.diag((position_variance, position_variance, speed_variance, speed_variance))
+        self.hits = 1
+
+    def _drop(self):
+        self.state = None
+        self.hits = 0
+        self.coasted = []
+        # Tile search starts over from the next frame
+        self.previous_small = None
+        self.previous_candidates = None
+
+    def _window(self, frame):
+        """Search region around the predicted position"""
+        height, width = frame.shape[:2]
+        sigma = np.sqrt(max(self.covariance[0, 0], self.covariance[1, 1]))
+        half = min(GATE_SIGMAS * sigma + 2 * self.radius, MAX_WINDOW_RADII * self.radius)
+        x, y = self.state[:2]
+        return (int(min(max(x - half, 0), width)), int(min(max(y - half, 0), height)),
+                int(min(max(x + half + 1, 0), width)), int(min(max(y + half + 1, 0), height)))
+
+    def _moving_tiles(self, frame):
+        """Regions of the frame in which dark pixels moved since the previous call"""
+        height, width = frame.shape[:2]
+        blue, green, red = cv2.split(cv2.resize(frame, (width // MOTION_SCALE, height // MOTION_SCALE),
+                                                interpolation=cv2.INTER_LINEAR))
+        small = cv2.max(cv2.max(blue, green), red)
+        previous, self.previous_small = self.previous_small, small
+        if previous is None:
+            return []
+        moved = (cv2.absdiff(small, previous) > MOTION_THRESHOLD) & (np.minimum(small, previous) <= PUCK_MAX_VALUE)
+        tile = TILE_SIZE // MOTION_SCALE
+        rows, columns = -(-moved.shape[0] // tile), -(-moved.shape[1] // tile)
+        padded = np.zeros((rows * tile, columns * tile), dtype=bool)
+        padded[:moved.shape[0], :moved.shape[1]] = moved
+        active = np.argwhere(padded.reshape(rows, tile, columns, tile).any(axis=(1, 3)))
+        if len(active) > MAX_TILE_FRACTION * rows * columns:
+            return [(0, 0, width, height)]
+        # Tiles overlap by a puck diameter so a puck on a tile edge is whole in one of them
+        pad = int(np.ceil(2 * self.radius))
+        return [
+            (max(0, column * TILE_SIZE - pad), max(0, row * TILE_SIZE - pad),
+             min(width, (column + 1) * TILE_SIZE + pad), min(height, (row + 1) * TILE_SIZE + pad))
+            for row, column in active
+        ]
+
+    def _acquire(self, timestamp, frame):
+        """Start a track on the best moving candidate in the moving tiles, if any"""
+        regions = self._moving_tiles(frame)
+        candidates = np.empty((0, 3))
+        if regions:
+            self.tile_searches += 1
+            self.tiles_searched += len(regions)
+            candidates = np.concatenate([detect_pucks(frame, region, self.radius) for region in regions])
+        previous, self.previous_candidates = self.previous_candidates, (timestamp, candidates)
+        if previous is None or len(candidates) == 0 or len(previous[1]) == 0 or timestamp <= previous[0]:
+            return
+        offsets = candidates[:, None, :2] - previous[1][None, :, :2]
+        distances = np.hypot(offsets[..., 0], offsets[..., 1])
+        nearest = np.argmin(distances, axis=1)
+        moved = distances[np.arange(len(candidates)), nearest]
+        plausible = (moved >= MIN_MOVE_RADII * self.radius) & (moved <= MAX_WINDOW_RADII * self.radius)
+        if not plausible.any():
+            return
+        best = np.argmax(np.where(plausible, candidates[:, 2], -1.0))
+        self._start(candidates[best, :2], offsets[best, nearest[best]] / (timestamp - previous[0]))
+
+    def update(self, frame_number, timestamp, frame):
+        """
+        Look for the puck in the next analyzed frame. Its position once
+        detected on a confirmed track, or None.
+        """
+        if self.scale is None:
+            self.scale = frame.shape[1] / REFERENCE_WIDTH
+            if self.radius is None:
+                self.radius = PUCK_RADIUS * self.scale
+
+        if self.state is None:
+            self._acquire(timestamp, frame)
+            self.last_timestamp = self.last_detected = timestamp
+            return None
+
+        self._predict(timestamp - self.last_timestamp)
+        self.last_timestamp = timestamp
+        self.window_searches += 1
+        candidates = detect_pucks(frame, self._window(frame), self.radius)
+        if len(candidates):
+            # The candidate nearest the prediction, if within the gate
+            innovation = self.covariance[:2, :2] + np.eye(2) * (MEASUREMENT_NOISE * self.scale) ** 2
+            offsets = candidates[:, :2] - self.state[:2]
+            distances = np.einsum('ni,ij,nj->n', offsets, np.linalg.inv(innovation), offsets)
+            candidates = candidates[distances <= GATE_SIGMAS ** 2]
+            distances = distances[distances <= GATE_SIGMAS ** 2]
+        if len(candidates) == 0:
+            if self.hits < CONFIRM_HITS or timestamp - self.last_detected > COAST_SECONDS:
+                self._drop()
+            else:
+                self.coasted.append((frame_number, timestamp, tuple(self.state[:2])))
+            return None
+
+        self._correct(candidates[np.argmin(distances), :2])
+        self.hits += 1
+        self.last_detected = timestamp
+        if self.hits < CONFIRM_HITS:
+            return None
+        if self.hits == CONFIRM_HITS:
+            if np.hypot(*(self.state[:2] - self.start_position)) < MIN_MOVE_RADII * self.radius:
+                self._drop()
+                return None
+            self.tracks += 1
+        # The puck was hidden in between: keep the predictions that bridged the gap
+        for frame_number_coasted, timestamp_coasted, position in self.coasted:
+            self.trajectory.add(frame_number_coasted, timestamp_coasted, position, False)
+        self.coasted = []
+        position = (float(self.state[0]), float(self.state[1]))
+        self.trajectory.add(frame_number, timestamp, position, True)
+        return position
+
+    def stats(self):
+        return puck_stats([self], self.trajectory)
+
+
+def puck_stats(trackers, trajectory):
+    """Summary stats of the PuckTrackers whose trajectories make up `trajectory`"""
+    tile_searches = sum(tracker.tile_searches for tracker in trackers)
+    tiles_searched = sum(tracker.tiles_searched for tracker in trackers)
+    return {
+        **trajectory.stats(),
+        'tracks': sum(tracker.tracks for tracker in trackers),
+        'windowSearches': sum(tracker.window_searches for tracker in trackers),
+        'tileSearches': tile_searches,
+        'meanTilesPerSearch': round(tiles_searched / tile_searches, 1) if tile_searches else 0
+    }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Recompute analysis results from saved inference
+Rebuilds playerTracking, poseAnalysis and summary from the raw
+detections and keypoints analyze_video.py saved with --inference-output,
+so metric parameters (pixel scale, short-track filter, skating-angle
+confidence, sprint thresholds) can be changed without running YOLO again.
+Events are detected again when the original run detected them, and a
+tracked puck's trajectory is carried over
+"""
+
+import sys
+import json
+import argparse
+import time
+
+from association import associate_poses
+from inference_store import load_inference
+from camera_motion import CameraMotion
+from event_detection import EventDetector
+from metrics import (
+    MIN_SPRINT_SECONDS, PIXELS_PER_METER, SKATING_ANGLE_MIN_CONFIDENCE, SMOOTHING_SECONDS,
+    SPRINT_SPEED_KMH, compute_track_metrics, frame_points, frame_positions, skating_angles, summarize_metrics,
+    track_positions
+)
+from puck_tracking import PuckTrajectory
+from result_writer import OUTPUT_FORMATS, open_result_writer
+from rink_calibration import RinkMapping
+from sampling import MIN_TRACK_FRAMES, min_track_detections
+from track_store import PoseStore, TrackStore
+
+
+def recompute_results(inference_path, video_id, output_path, output_format='json', binary_output=None,
+                      pixels_per_meter=PIXELS_PER_METER, min_track_frames=MIN_TRACK_FRAMES,
+                      keypoint_confidence=SKATING_ANGLE_MIN_CONFIDENCE, sprint_speed_kmh=SPRINT_SPEED_KMH,
+                      min_sprint_seconds=MIN_SPRINT_SECONDS, smoothing_seconds=SMOOTHING_SECONDS):
+    """
+    Write results for `video_id` to output_path (and binary_output) from
+    the inference archive at inference_path. With the default parameters
+    the output matches what analyze_video.py wrote for the same run.
+    Runs analyzed with camera-motion compensation or rink calibration
+    reuse their transforms; with rink calibration pixels_per_meter only
+    applies to frames it couldn't calibrate.
+    """
+    data = load_inference(inference_path)
+    metadata = data.metadata
+
+    rink = None
+    if 'rinkCalibration' in metadata:
+        rink = RinkMapping.from_list(metadata['rinkCalibration']['transforms'])
+    motion = None
+    if 'cameraMotion.transform' in data.tables:
+        motion = CameraMotion(data.tables['cameraMotion.frameNumber'], data.tables['cameraMotion.transform'])
+    trajectory = None
+    if 'puck.frameNumber' in data.tables:
+        trajectory = PuckTrajectory.from_tables(data.tables, 'puck')
+
+    min_detections = min_track_detections(metadata['sampling']['stride'], min_track_frames)
+    detector = None
+    if 'eventCounts' in metadata:
+        detector = EventDetector(metadata['fps'], metadata['sampling']['stride'], min_detections,
+                                 sprint_speed_kmh=sprint_speed_kmh, min_sprint_seconds=min_sprint_seconds)
+
+    player_tracks = TrackStore()
+    pose_data = PoseStore()
+    for frame_number, timestamp, detections, (keypoints, pose_boxes) in data.frames():
+        player_tracks.add_frame(frame_number, timestamp, *detections)
+        if detector is not None:
+            positions = frame_positions(frame_number, detections[1], rink, motion, pixels_per_meter)
+            puck = trajectory.detected_at(frame_number) if trajectory is not None else None
+            if puck is not None:
+                puck = frame_points(frame_number, [puck], rink, motion, pixels_per_meter)[0]
+            detector.update(frame_number, timestamp, detections[0], positions, puck)
+        if keypoints is None:
+            continue
+        # Poses go to the tracked player boxes they match, as in analyze_video.py
+        track_ids, keypoints = associate_poses(keypoints, pose_boxes, detections[0], detections[1])
+        pose_data.add_frame(frame_number, timestamp, track_ids, keypoints,
+                            skating_angles(keypoints, keypoint_confidence))
+
+    writer = open_result_writer(output_path, output_format, {
+        'videoId': video_id,
+        'totalFrames': metadata['totalFrames'],
+        'fps': metadata['fps'],
+        'duration': metadata['duration']
+    }, binary_path=binary_output)
+
+    written_metrics = []
+    for track_id, track in player_tracks.items():
+        if len(track) < min_detections:
+            continue
+        positions, scale = track_positions(track, rink, motion, pixels_per_meter)
+        metrics = compute_track_metrics(
+            positions,
+            track.timestamps,
+            pixels_per_meter=scale,
+            sprint_speed_kmh=sprint_speed_kmh,
+            min_sprint_seconds=min_sprint_seconds,
+            smoothing_seconds=smoothing_seconds
+        )
+        written_metrics.append(metrics)
+        writer.write_track(track_id, track, metrics)
+
+    for track_id, poses in pose_data.items():
+        writer.write_pose(track_id, poses)
+    if trajectory is not None:
+        writer.write_puck(trajectory)
+
+    events = detector.finish() if detector is not None else []
+    writer.close(events, {
+        **summarize_metrics(written_metrics),
+        'pipeline': metadata['pipeline'],
+        'sampling': metadata['sampling'],
+        **{key: metadata[key] for key in ('cameraMotion', 'rinkCalibration', 'puckTracking') if key in metadata},
+        **({'eventCounts': detector.counts()} if detector is not None else {}),
+        # Timings of the original run; files saved before they were recorded have none
+        **({'performance': metadata['performance']} if 'performance' in metadata else {})
+    })
+    return len(written_metrics)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute analysis results from saved inference")
+    parser.add_argument("inference_path", help="Archive written by analyze_video.py --inference-output")
+    parser.add_argument("video_id")
+    parser.add_argument("output_path")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="json")
+    parser.add_argument("--binary-output", default=None,
+                        help="Also write the results as a compressed .npz to this path")
+    parser.add_argument("--pixels-per-meter", type=float, default=PIXELS_PER_METER,
+                        help="Pixel scale used to convert movement to meters")
+    parser.add_argument("--min-track-frames", type=int, default=MIN_TRACK_FRAMES,
+                        help="Drop tracks spanning fewer source frames than this")
+    parser.add_argument("--keypoint-conf", type=float, default=SKATING_ANGLE_MIN_CONFIDENCE,
+                        help="Shoulder and hip keypoint confidence required for a skating angle")
+    parser.add_argument("--sprint-speed", type=float, default=SPRINT_SPEED_KMH,
+                        help="Smoothed speed in km/h that counts as sprinting")
+    parser.add_argument("--min-sprint-seconds", type=float, default=MIN_SPRINT_SECONDS,
+                        help="How long a sprint must last")
+    parser.add_argument("--smoothing-seconds", type=float, default=SMOOTHING_SECONDS,
+                        help="Moving-average window for speeds")
+    args = parser.parse_args()
+
+    try:
+        start = time.perf_counter()
+        total_players = recompute_results(
+            args.inference_path, args.video_id, args.output_path,
+            output_format=args.output_format, binary_output=args.binary_output,
+            pixels_per_meter=args.pixels_per_meter, min_track_frames=args.min_track_frames,
+            keypoint_confidence=args.keypoint_conf, sprint_speed_kmh=args.sprint_speed,
+            min_sprint_seconds=args.min_sprint_seconds, smoothing_seconds=args.smoothing_seconds
+        )
+        print(json.dumps({
+            "type": "progress",
+            "progress": 100,
+            "message": f"Recomputed metrics for {total_players} players in {time.perf_counter() - start:.2f}s"
+        }), flush=True)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
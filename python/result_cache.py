@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+On-disk analysis result cache
+Entries are keyed by a hash of the video's content plus every setting
+that affects the output (models, thresholds, sampling, output format and
+the analysis code itself), so re-uploads and re-runs of the same clip
+are served without running the models again. Each entry is a directory
+of result files; the least recently used entries are evicted once the
+cache grows past its byte budget.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.path.join(Path.home(), '.cache', 'hockey-dev-tracker', 'results')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(paths):
+    """Hash of the given source files, so cached results expire when the analysis code changes"""
+    digest = hashlib.sha256()
+    for path in sorted(str(p) for p in paths):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """LRU cache of result files under `directory`, capped at `max_bytes`"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(content_hash, **params):
+        """Cache key for a video's content hash and the settings used to analyze it"""
+        blob = json.dumps({'content': content_hash, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        {name: path} of the cached files for `key`, or None on a miss.
+        Counts the lookup and marks the entry as recently used.
+        """
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                os.utime(path)  # LRU order is directory mtime
+                names = os.listdir(path)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {name: os.path.join(path, name) for name in names}
+
+    def put(self, key, files):
+        """
+        Store copies of `files` ({name: source path}) under `key`, then
+        evict least recently used entries until the cache fits its budget.
+        An entry larger than the whole budget is not stored, since it
+        would be evicted right after copying.
+        """
+        if sum(os.path.getsize(source) for source in files.values()) > self.max_bytes:
+            return
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.directory)
+        try:
+            for name, source in files.items():
+                shutil.copyfile(source, os.path.join(staging, name))
+            with self._lock:
+                target = self._entry_path(key)
+                if os.path.isdir(target):
+                    return  # Another run stored the same result first
+                os.rename(staging, target)
+                staging = None
+                self._evict()
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _entries(self):
+        """(mtime, bytes, path) for every complete entry"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append((entry.stat().st_mtime, size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            entries = self._entries()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'maxBytes': self.max_bytes
+            }
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Analysis result writers
+`json` buffers everything and writes the classic single-document layout
+when analysis finishes. `ndjson` streams one JSON record per line and
+flushes as tracks are finalized, so memory stays flat and consumers can
+start ingesting before analysis completes.
+
+NDJSON record types, in order of appearance:
+- {"type": "header", "videoId", "totalFrames", "fps", "duration"}
+- {"type": "track", "playerId", "trackId", "frames", "metrics"}
+- {"type": "pose", "playerId", "trackId", "frames"} (a chunk; frames for
+  the same trackId may arrive in several records)
+- {"type": "puck", "frames"} (with puck tracking)
+- {"type": "events", "events"}
+- {"type": "summary", "summary"} (always last)
+
+Either format can be paired with a compressed `.npz` artifact holding
+the same results as flat columnar tables (see NpzResultWriter), which
+loads in milliseconds for dashboards and re-analysis.
+"""
+
+import json
+import shutil
+from collections import defaultdict
+
+import numpy as np
+
+from track_store import KEYPOINT_NAMES
+
+OUTPUT_FORMATS = ('json', 'ndjson')
+
+# Scalar per-track metrics exported as columns of the binary metrics table
+METRIC_COLUMNS = (
+    'totalDistance', 'averageSpeed', 'maxSpeed', 'timeOnIce',
+    'maxAcceleration', 'maxDeceleration', 'sprintCount'
+)
+
+# Binary table schemas: column -> (dtype, shape of one row)
+DETECTION_SCHEMA = {
+    'trackId': (np.int32, ()),
+    'frameNumber': (np.int32, ()),
+    'timestamp': (np.float64, ()),
+    'x1': (np.float32, ()),
+    'y1': (np.float32, ()),
+    'x2': (np.float32, ()),
+    'y2': (np.float32, ()),
+    'confidence': (np.float32, ())
+}
+PUCK_SCHEMA = {
+    'frameNumber': (np.int32, ()),
+    'timestamp': (np.float64, ()),
+    'x': (np.float64, ()),
+    'y': (np.float64, ()),
+    'detected': (bool, ())
+}
+KEYPOINT_SCHEMA = {
+    'trackId': (np.int32, ()),
+    'frameNumber': (np.int32, ()),
+    'timestamp': (np.float64, ()),
+    'skatingAngle': (np.float64, ()),
+    'x': (np.float32, (len(KEYPOINT_NAMES),)),
+    'y': (np.float32, (len(KEYPOINT_NAMES),)),
+    'confidence': (np.float32, (len(KEYPOINT_NAMES),))
+}
+
+
+# Custom JSON encoder to handle numpy types
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (np.integer, np.int32, np.int64)):
+            return int(obj)
+        elif isinstance(obj, (np.floating, np.float32, np.float64)):
+            return float(obj)
+        elif isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return super().default(obj)
+
+
+def track_record(track_id, track, metrics):
+    """JSON-shaped playerTracking entry for a TrackColumns"""
+    return {
+        'playerId': f'player_{track_id}',
+        'trackId': track_id,
+        'frames': track.to_frames(),
+        'metrics': metrics
+    }
+
+
+class JsonResultWriter:
+    """Collects results in memory and writes one pretty-printed document"""
+
+    streaming = False
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.tracks = []
+        self.poses = defaultdict(list)
+        self.puck = None
+
+    def write_track(self, track_id, track, metrics):
+        self.tracks.append(track_record(track_id, track, metrics))
+
+    def write_puck(self, trajectory):
+        self.puck = trajectory.to_frames()
+
+    def write_pose(self, track_id, poses):
+        self.poses[track_id].extend(poses.to_frames())
+
+    def close(self, events, summary):
+        results = {
+            **self.header,
+            'playerTracking': self.tracks,
+            **({'puckTracking': self.puck} if self.puck is not None else {}),
+            'poseAnalysis': [
+                {'playerId': f'player_{track_id}', 'trackId': track_id, 'frames': frames}
+                for track_id, frames in self.poses.items()
+            ],
+            'events': events,
+            'summary': summary
+        }
+        with open(self.path, 'w') as f:
+            json.dump(results, f, indent=2, cls=NumpyEncoder)
+
+
+class NdjsonResultWriter:
+    """Writes each record as a compact JSON line as soon as it is ready"""
+
+    streaming = True
+
+    def __init__(self, path, header):
+        self.path = path
+        self.file = open(path, 'w')
+        self._write({'type': 'header', **header})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':'), cls=NumpyEncoder))
+        self.file.write('\n')
+        self.file.flush()
+
+    def write_track(self, track_id, track, metrics):
+        self._write({'type': 'track', **track_record(track_id, track, metrics)})
+
+    def write_pose(self, track_id, poses):
+        self._write({'type': 'pose', 'playerId': f'player_{track_id}', 'trackId': track_id, 'frames': poses.to_frames()})
+
+    def write_puck(self, trajectory):
+        self._write({'type': 'puck', 'frames': trajectory.to_frames()})
+
+    def close(self, events, summary):
+        try:
+            self._write({'type': 'events', 'events': events})
+            self._write({'type': 'summary', 'summary': summary})
+        finally:
+            self.file.close()
+
+
+class NpzResultWriter:
+    """
+    Writes results as one compressed NumPy archive of flat tables.
+
+    Keys are `<table>.<column>`; every column in a table has the same
+    length, so `pandas.DataFrame({...})` over a table's columns works
+    directly:
+    - detections: trackId, frameNumber, timestamp, x1, y1, x2, y2,
+      confidence (one row per tracked box)
+    - keypoints: trackId, frameNumber, timestamp, skatingAngle (NaN when
+      unknown), and x, y, confidence as (rows, 17) arrays in
+      `keypointNames` order
+    - metrics: trackId plus one column per METRIC_COLUMNS entry
+    - puck: frameNumber, timestamp, x, y, detected (with puck tracking)
+    - summary: the header, events and summary as a JSON string
+
+    Columns are collected as per-track chunks and concatenated once on
+    close.
+    """
+
+    streaming = False
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.detections = defaultdict(list)
+        self.keypoints = defaultdict(list)
+        self.metrics = defaultdict(list)
+        self.puck = None
+
+    def write_track(self, track_id, track, metrics):
+        bbox = track.bboxes
+        columns = {
+            'trackId': np.full(len(track), track_id, dtype=np.int32),
+            'frameNumber': track.frames,
+            'timestamp': track.timestamps,
+            'x1': bbox[:, 0],
+            'y1': bbox[:, 1],
+            'x2': bbox[:, 2],
+            'y2': bbox[:, 3],
+            'confidence': track.confidences
+        }
+        for name, values in columns.items():
+            # Copy so the chunk doesn't pin the track's spare capacity
+            self.detections[name].append(np.array(values))
+
+        self.metrics['trackId'].append(track_id)
+        for name in METRIC_COLUMNS:
+            self.metrics[name].append(metrics[name])
+
+    def write_pose(self, track_id, poses):
+        keypoints = poses.keypoints
+        columns = {
+            'trackId': np.full(len(poses), track_id, dtype=np.int32),
+            'frameNumber': poses.frames,
+            'timestamp': poses.timestamps,
+            'skatingAngle': poses.skating_angles,
+            'x': keypoints[:, :, 0],
+            'y': keypoints[:, :, 1],
+            'confidence': keypoints[:, :, 2]
+        }
+        for name, values in columns.items():
+            self.keypoints[name].append(np.array(values))
+
+    def write_puck(self, trajectory):
+        positions = np.asarray(trajectory.positions, dtype=np.float64).reshape(-1, 2)
+        columns = {
+            'frameNumber': trajectory.frame_numbers,
+            'timestamp': trajectory.timestamps,
+            'x': positions[:, 0],
+            'y': positions[:, 1],
+            'detected': trajectory.detected
+        }
+        self.puck = {name: np.asarray(columns[name], dtype=dtype) for name, (dtype, _) in PUCK_SCHEMA.items()}
+
+    def close(self, events, summary):
+        tables = {'keypointNames': np.array(KEYPOINT_NAMES)}
+        for table, schema, chunks in (
+            ('detections', DETECTION_SCHEMA, self.detections),
+            ('keypoints', KEYPOINT_SCHEMA, self.keypoints)
+        ):
+            for name, (dtype, row_shape) in schema.items():
+                tables[f'{table}.{name}'] = (
+                    np.concatenate(chunks[name]).astype(dtype, copy=False) if chunks[name]
+                    else np.empty((0,) + row_shape, dtype=dtype)
+                )
+
+        tables['metrics.trackId'] = np.array(self.metrics['trackId'], dtype=np.int32)
+        for name in METRIC_COLUMNS:
+            dtype = np.int32 if name == 'sprintCount' else np.float64
+            tables[f'metrics.{name}'] = np.array(self.metrics[name], dtype=dtype)
+        if self.puck is not None:
+            for name, values in self.puck.items():
+                tables[f'puck.{name}'] = values
+
+        tables['summary'] = np.array(json.dumps(
+            {**self.header, 'events': events, 'summary': summary},
+            cls=NumpyEncoder
+        ))
+
+        # Write through a file object so numpy doesn't append a second suffix
+        with open(self.path, 'wb') as f:
+            np.savez_compressed(f, **tables)
+
+
+class TeeResultWriter:
+    """Forwards every record to several writers"""
+
+    def __init__(self, *writers):
+        self.writers = writers
+        self.streaming = any(writer.streaming for writer in writers)
+
+    def write_track(self, track_id, track, metrics):
+        for writer in self.writers:
+            writer.write_track(track_id, track, metrics)
+
+    def write_pose(self, track_id, poses):
+        for writer in self.writers:
+            writer.write_pose(track_id, poses)
+
+    def write_puck(self, trajectory):
+        for writer in self.writers:
+            writer.write_puck(trajectory)
+
+    def close(self, events, summary):
+        for writer in self.writers:
+            writer.close(events, summary)
+
+
+def load_npz_results(path):
+    """
+    Load an artifact written by NpzResultWriter as
+    {'detections': {column: array}, 'keypoints': {...}, 'metrics': {...},
+     'keypointNames': [...], 'summary': {...}}, plus 'puck': {...} with
+    puck tracking
+    """
+    results = {'detections': {}, 'keypoints': {}, 'metrics': {}}
+    with np.load(path) as archive:
+        for key in archive.files:
+            table, _, column = key.partition('.')
+            if column:
+                results.setdefault(table, {})[column] = archive[key]
+        results['keypointNames'] = archive['keypointNames'].tolist()
+        results['summary'] = json.loads(archive['summary'].item())
+    return results
+
+
+def copy_result(source, destination, output_format, video_id, indent=2):
+    """
+    Copy a result file written in `output_format` ('json', 'ndjson' or
+    'npz'), relabeling it with `video_id`, e.g. when serving a cached
+    result for a re-uploaded video. JSON is rewritten with `indent`.
+    """
+    if output_format == 'json':
+        with open(source) as f:
+            results = json.load(f)
+        results['videoId'] = video_id
+        with open(destination, 'w') as f:
+            json.dump(results, f, indent=indent, cls=NumpyEncoder)
+    elif output_format == 'ndjson':
+        with open(source) as src, open(destination, 'w') as dst:
+            header = json.loads(src.readline())
+            header['videoId'] = video_id
+            dst.write(json.dumps(header, separators=(',', ':'), cls=NumpyEncoder))
+            dst.write('\n')
+            shutil.copyfileobj(src, dst)
+    elif output_format == 'npz':
+        with np.load(source) as archive:
+            tables = {key: archive[key] for key in archive.files}
+        summary = json.loads(tables['summary'].item())
+        summary['videoId'] = video_id
+        tables['summary'] = np.array(json.dumps(summary, cls=NumpyEncoder))
+        with open(destination, 'wb') as f:
+            np.savez_compressed(f, **tables)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+
+def open_result_writer(path, output_format, header, binary_path=None):
+    """
+    Writer for `output_format` at `path`, also writing an .npz artifact to
+    `binary_path` when given
+    """
+    if output_format == 'ndjson':
+        writer = NdjsonResultWriter(path, header)
+    elif output_format == 'json':
+        writer = JsonResultWriter(path, header)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    if binary_path:
+        writer = TeeResultWriter(writer, NpzResultWriter(binary_path, header))
+    return writer
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Rink calibration
+Estimates the homography from image pixels to rink coordinates in
+meters from markings every rink has: the center line, the two blue lines
+and the center faceoff circle. Rink coordinates have their origin at
+center ice, x along the rink (towards the right-hand blue line in the
+image) and y across it (towards the bottom of the image).
+
+An estimate runs a Hough transform over the frame, so RinkCalibrator
+only re-estimates when the scene changes (a cut or a camera move, judged
+on a tiny grayscale thumbnail) and keeps the last transform otherwise.
+Transforms are also cached on disk per camera or video, so a fixed
+camera is calibrated once. RinkMapping records which transform was in
+effect from which frame and maps whole position arrays with one
+cv2.perspectiveTransform call per transform.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from metrics import PIXELS_PER_METER
+from result_cache import hash_file
+
+DEFAULT_CALIBRATION_DIR = os.path.join(Path.home(), '.cache', 'hockey-dev-tracker', 'calibration')
+
+# NHL markings in meters: the center circle's radius (15 ft) and the
+# distance from the center line to each blue line (25 ft)
+CENTER_CIRCLE_RADIUS = 4.57
+BLUE_LINE_OFFSET = 7.62
+
+# Painted markings stand out from the ice by their saturation
+MARKING_MIN_SATURATION = 100
+MARKING_MIN_VALUE = 60
+
+# Lines must cross at least this fraction of the frame height, steeper than 45 degrees
+MIN_LINE_FRACTION = 1 / 3
+# Hough segments closer than this fraction of the frame width belong to one line
+LINE_CLUSTER_FRACTION = 0.02
+
+# Circle arcs are thin: their pixels fill at most this fraction of their bounding box
+MAX_ARC_FILL = 0.3
+MIN_ARC_PIXELS = 50
+
+# The fitted circle's center must map this close to center ice (meters)
+MAX_CENTER_ERROR = 1.0
+
+# Scene thumbnails are this small, and differ by this mean gray level after a cut or camera move
+THUMBNAIL_SIZE = (64, 36)
+SCENE_CHANGE_THRESHOLD = 8.0
+
+# How often the scene is compared against the one the transform was estimated on
+CHECK_INTERVAL_SECONDS = 0.5
+
+
+def marking_mask(frame):
+    """Binary mask of painted-marking pixels: saturated colors, not the white ice or black outlines"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, (0, MARKING_MIN_SATURATION, MARKING_MIN_VALUE), (180, 255, 255))
+
+
+def detect_lines(mask):
+    """
+    Lines crossing the rink (center and blue lines) as (point, unit
+    direction pointing down the image) pairs, sorted left to right
+    """
+    height, width = mask.shape
+    segments = cv2.HoughLinesP(mask, 1, np.pi / 180, threshold=100,
+                               minLineLength=int(height * MIN_LINE_FRACTION), maxLineGap=height // 10)
+    if segments is None:
+        return []
+    segments = segments.reshape(-1, 4).astype(np.float64)
+    dx = segments[:, 2] - segments[:, 0]
+    dy = segments[:, 3] - segments[:, 1]
+    segments = segments[np.abs(dy) > np.abs(dx)]
+    if len(segments) == 0:
+        return []
+
+    # Where each segment crosses the middle row, to group the many segments of one thick line
+    x1, y1, x2, y2 = segments.T
+    middle = x1 + (x2 - x1) * (height / 2 - y1) / (y2 - y1)
+    order = np.argsort(middle)
+    breaks = np.flatnonzero(np.diff(middle[order]) > width * LINE_CLUSTER_FRACTION) + 1
+
+    lines = []
+    for cluster in np.split(order, breaks):
+        points = segments[cluster].reshape(-1, 2).astype(np.float32)
+        length = np.hypot(x2[cluster] - x1[cluster], y2[cluster] - y1[cluster]).sum()
+        vx, vy, x0, y0 = cv2.fitLine(points, cv2.DIST_L2, 0, 0.01, 0.01).ravel()
+        direction = np.array([vx, vy]) if vy > 0 else -np.array([vx, vy])
+        lines.append((length, np.array([x0, y0]), direction))
+
+    # The three longest are the center and blue lines
+    lines = sorted(lines, key=lambda line: line[0], reverse=True)[:3]
+    return sorted(((point, direction) for _, point, direction in lines),
+                  key=lambda line: line[0][0] + line[1][0] * (height / 2 - line[0][1]) / line[1][1])
+
+
+def distance_to_line(points, line):
+    """Perpendicular pixel distance of (n, 2) points from a (point, unit direction) line"""
+    point, direction = line
+    offset = points - point
+    return np.abs(offset[:, 0] * direction[1] - offset[:, 1] * direction[0])
+
+
+def detect_center_circle(mask, lines, band):
+    """
+    Ellipse (cv2.fitEllipse format) of the center circle: the thin arcs
+    left once the lines are erased that end at the center line
+    """
+    arcs = mask.copy()
+    for point, direction in lines:
+        reach = 2 * max(mask.shape)
+        cv2.line(arcs, tuple(int(v) for v in point - reach * direction),
+                 tuple(int(v) for v in point + reach * direction), 0, band)
+
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(arcs, connectivity=8)
+    center_line = lines[1]
+    arc_points = []
+    for label in range(1, count):
+        left, top, box_width, box_height, area = stats[label]
+        if area < MIN_ARC_PIXELS or area > MAX_ARC_FILL * box_width * box_height:
+            continue
+        ys, xs = np.nonzero(labels[top:top + box_height, left:left + box_width] == label)
+        points = np.column_stack((xs + left, ys + top)).astype(np.float32)
+        # Both ends of a center circle arc touch the erased center line
+        if distance_to_line(points, center_line).min() > band:
+            continue
+        arc_points.append(points)
+
+    if not arc_points:
+        return None
+    points = np.concatenate(arc_points)
+    if len(points) < 5:
+        return None
+    return cv2.fitEllipse(points)
+
+
+def intersect_ellipse(ellipse, point, direction):
+    """The two points where a line crosses an ellipse, in the order of `direction`, or None"""
+    (cx, cy), (width, height), angle = ellipse
+    theta = np.deg2rad(angle)
+    rotation = np.array([[np.cos(theta), np.sin(theta)], [-np.sin(theta), np.cos(theta)]])
+    # In the ellipse's own frame: (x / a)^2 + (y / b)^2 = 1
+    p = rotation @ (point - (cx, cy)) / (width / 2, height / 2)
+    d = rotation @ direction / (width / 2, height / 2)
+    a, b, c = d @ d, 2 * p @ d, p @ p - 1
+    discriminant = b * b - 4 * a * c
+    if discriminant <= 0:
+        return None
+    roots = sorted(((-b - np.sqrt(discriminant)) / (2 * a), (-b + np.sqrt(discriminant)) / (2 * a)))
+    return [point + root * direction for root in roots]
+
+
+def intersect_lines(point, direction, line):
+    """Where the line through `point` along `direction` crosses `line`"""
+    other_point, other_direction = line
+    matrix = np.column_stack((direction, -other_direction))
+    along, _ = np.linalg.solve(matrix, other_point - point)
+    return point + along * direction
+
+
+def estimate_homography(frame):
+    """
+    Homography from frame pixels to rink meters, or None when the
+    center line, both blue lines and the center circle aren't all found.
+    Along the rink the scale comes from the blue lines, across it from
+    where the center circle crosses the center line.
+    """
+    mask = marking_mask(frame)
+    lines = detect_lines(mask)
+    if len(lines) < 3:
+        return None
+    band = max(9, int(frame.shape[1] * 0.01))
+    ellipse = detect_center_circle(mask, lines, band)
+    if ellipse is None:
+        return None
+
+    center_point, center_direction = lines[1]
+    across = intersect_ellipse(ellipse, center_point, center_direction)
+    if across is None:
+        return None
+    # The image of the rink's long axis: through the middle of the circle's
+    # chord on the center line, perpendicular to the center line
+    middle = (across[0] + across[1]) / 2
+    along_direction = np.array([center_direction[1], -center_direction[0]])
+    try:
+        left_blue = intersect_lines(middle, along_direction, lines[0])
+        right_blue = intersect_lines(middle, along_direction, lines[2])
+    except np.linalg.LinAlgError:
+        return None
+
+    image_points = np.array([across[0], across[1], left_blue, right_blue], dtype=np.float32)
+    rink_points = np.array([
+        [0, -CENTER_CIRCLE_RADIUS],
+        [0, CENTER_CIRCLE_RADIUS],
+        [-BLUE_LINE_OFFSET, 0],
+        [BLUE_LINE_OFFSET, 0]
+    ], dtype=np.float32)
+    homography = cv2.getPerspectiveTransform(image_points, rink_points)
+    if not np.all(np.isfinite(homography)):
+        return None
+    center = np.array(ellipse[0], dtype=np.float64)
+    mapped_center = cv2.perspectiveTransform(center.reshape(1, 1, 2), homography).ravel()
+    if not np.all(np.isfinite(mapped_center)) or np.hypot(*mapped_center) > MAX_CENTER_ERROR:
+        return None
+    return homography
+
+
+def scene_thumbnail(frame):
+    """Tiny grayscale version of a frame for cheap scene comparisons"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def scene_changed(thumbnail, reference, threshold=SCENE_CHANGE_THRESHOLD):
+    return reference is None or float(np.mean(np.abs(thumbnail - reference))) > threshold
+
+
+def calibration_key(video_path, camera_id=None):
+    """Transforms are cached per camera when its ID is known, else per video file (None: not cached)"""
+    if camera_id:
+        return f"camera:{camera_id}"
+    if os.path.isfile(video_path):
+        return f"video:{hash_file(video_path)}"
+    return None
+
+
+class CalibrationCache:
+    """Last transform and its scene thumbnail per camera or video, one .npz per key"""
+
+    def __init__(self, directory=DEFAULT_CALIBRATION_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.npz")
+
+    def get(self, key):
+        """(homography, thumbnail) cached for `key`, or None"""
+        try:
+            with np.load(self._path(key)) as data:
+                return data['homography'], data['thumbnail']
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, key, homography, thumbnail):
+        path = self._path(key)
+        staging = f"{path}.partial.npz"
+        np.savez(staging, homography=homography, thumbnail=thumbnail)
+        os.replace(staging, path)
+
+
+class RinkMapping:
+    """The transform in effect from each frame on; None where calibration failed"""
+
+    def __init__(self, transforms=()):
+        self.transforms = list(transforms)  # (start frame, homography or None), by start frame
+
+    def add(self, start_frame, homography):
+        self.transforms.append((start_frame, homography))
+
+    @property
+    def calibrated(self):
+        """Whether any transform was estimated, so positions are in rink meters"""
+        return any(homography is not None for _, homography in self.transforms)
+
+    def transform_at(self, frame_number):
+        current = None
+        for start, homography in self.transforms:
+            if start > frame_number:
+                break
+            current = homography
+        return current
+
+    def to_rink(self, frame_numbers, points, pixels_per_meter=PIXELS_PER_METER, motion=None):
+        """
+        Rink coordinates in meters of (n, 2) pixel points seen at
+        frame_numbers. Points seen without a transform fall back to the
+        rough pixel scale while the mapping has no calibrated transform
+        at all; once it has one they are NaN, since pixel-scaled points
+        aren't comparable with rink meters. With `motion` (a
+        camera_motion.CameraMotion) the points are in its reference
+        frame's pixels instead, and each transform is moved there from
+        the frame it was estimated on.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if not self.calibrated or len(points) == 0:
+            return points / pixels_per_meter
+        rink = np.full_like(points, np.nan)
+        starts = np.array([start for start, _ in self.transforms])
+        index = np.searchsorted(starts, frame_numbers, side='right') - 1
+        for i in np.unique(index):
+            homography = self.transforms[i][1] if i >= 0 else None
+            if homography is None:
+                continue
+            if motion is not None:
+                homography = homography @ np.linalg.inv(motion.transform_at(self.transforms[i][0]))
+            selected = index == i
+            rink[selected] = cv2.perspectiveTransform(points[selected].reshape(-1, 1, 2), homography).reshape(-1, 2)
+        return rink
+
+    def as_list(self):
+        """JSON-ready transforms, for the summary and inference metadata"""
+        return [
+            {'startFrame': int(start), 'homography': homography.tolist() if homography is not None else None}
+            for start, homography in self.transforms
+        ]
+
+    @classmethod
+    def from_list(cls, transforms):
+        return cls(
+            (item['startFrame'], np.array(item['homography']) if item['homography'] is not None else None)
+            for item in transforms
+        )
+
+    @classmethod
+    def concatenate(cls, parts):
+        """
+        One mapping from (first frame, mapping) parts, e.g. of time
+        segments; each part's transforms apply from its first frame
+        until the next part's
+        """
+        mapping = cls()
+        parts = sorted(parts, key=lambda part: part[0])
+        for i, (first_frame, part) in enumerate(parts):
+            next_frame = parts[i + 1][0] if i + 1 < len(parts) else None
+            mapping.add(first_frame, part.transform_at(first_frame))
+            for start, homography in part.transforms:
+                if start > first_frame and (next_frame is None or start < next_frame):
+                    mapping.add(start, homography)
+        return mapping
+
+
+class RinkCalibrator:
+    """
+    Keeps a RinkMapping current over a video's frames: estimates a
+    transform on the first frame (or reuses the cached one for
+    `cache_key` if the scene still looks the same) and again whenever
+    the scene changes, checking every `check_interval` source frames.
+    Failed estimates are retried at every check.
+    """
+
+    def __init__(self, check_interval, cache=None, cache_key=None, threshold=SCENE_CHANGE_THRESHOLD):
+        self.check_interval = max(1, check_interval)
+        self.cache = cache if cache_key is not None else None
+        self.cache_key = cache_key
+        self.threshold = threshold
+        self.mapping = RinkMapping()
+        self.homography = None
+        self.reference = None
+        self.last_check = None
+        self.estimates = 0
+        self.failures = 0
+        self.scene_changes = 0
+        self.cache_hit = False
+
+    def update(self, frame_number, frame):
+        """Look at an analyzed frame, re-estimating the transform if the scene changed"""
+        if self.last_check is not None and frame_number - self.last_check < self.check_interval:
+            return
+        self.last_check = frame_number
+        thumbnail = scene_thumbnail(frame)
+
+        if self.reference is None and self.cache is not None:
+            cached = self.cache.get(self.cache_key)
+            if cached is not None and not scene_changed(thumbnail, cached[1], self.threshold):
+                self.cache_hit = True
+                self._use(frame_number, cached[0], cached[1])
+                return
+
+        if self.homography is not None:
+            if not scene_changed(thumbnail, self.reference, self.threshold):
+                return
+            self.scene_changes += 1
+
+        homography = estimate_homography(frame)
+        self.estimates += 1
+        if homography is None:
+            self.failures += 1
+            if self.homography is not None or not self.mapping.transforms:
+                self._use(frame_number, None, thumbnail)
+            return
+        self._use(frame_number, homography, thumbnail)
+        if self.cache is not None:
+            try:
+                self.cache.put(self.cache_key, homography, thumbnail)
+            except OSError:
+                pass  # Calibrating again next time is all that's lost
+
+    def _use(self, frame_number, homography, thumbnail):
+        self.homography = homography
+        self.reference = thumbnail
+        self.mapping.add(frame_number, homography)
+
+    def stats(self):
+        return calibration_stats([self], self.mapping)
+
+
+def calibration_stats(calibrators, mapping):
+    """Estimate counts of one or more calibrators and the transforms of their combined mapping"""
+    return {
+        'estimates': sum(calibrator.estimates for calibrator in calibrators),
+        'failures': sum(calibrator.failures for calibrator in calibrators),
+        'sceneChanges': sum(calibrator.scene_changes for calibrator in calibrators),
+        'cacheHit': any(calibrator.cache_hit for calibrator in calibrators),
+        'transforms': mapping.as_list()
+    }
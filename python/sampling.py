@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Frame sampling policies
+Decide which decoded frames get detection and pose inference: every
+frame (the default), a fixed target analysis fps, and/or motion gating
+that skips near-identical frames. Frames that fall between sampled
+frames are skipped with `cap.grab()` so they are never fully decoded.
+"""
+
+import cv2
+import numpy as np
+
+# Width frames are downscaled to before measuring motion
+MOTION_SAMPLE_WIDTH = 160
+
+# Source frames a track must span to be reported
+MIN_TRACK_FRAMES = 10
+
+
+def min_track_detections(stride, min_track_frames=MIN_TRACK_FRAMES):
+    """Detections a track needs to cover `min_track_frames` source frames at `stride`"""
+    return max(2, int(np.ceil(min_track_frames / stride)))
+
+
+class SamplingPolicy:
+    """
+    target_fps: analyze at most this many frames per second of video
+        (None analyzes every frame)
+    motion_threshold: skip a sampled frame when the mean absolute
+        difference from the last analyzed frame, as a fraction of full
+        intensity, is below this value (None disables motion gating)
+    max_gap_seconds: always analyze at least one frame this often, even
+        with no motion, so tracks aren't dropped
+    pose_interval: run pose estimation once per this many source frames
+    """
+
+    def __init__(self, fps, target_fps=None, motion_threshold=None, max_gap_seconds=1.0, pose_interval=5):
+        self.fps = fps
+        self.stride = max(1, int(round(fps / target_fps))) if target_fps and fps > 0 else 1
+        self.motion_threshold = motion_threshold
+        self.max_gap_frames = max(self.stride, int(round(max_gap_seconds * fps)))
+        self.pose_interval = pose_interval
+
+        self.last_analyzed_frame = 0
+        self.last_pose_frame = 0
+        self._last_small = None
+
+        self.frames_decoded = 0
+        self.frames_grabbed = 0
+        self.frames_motion_skipped = 0
+        self.frames_analyzed = 0
+
+    @property
+    def min_track_detections(self):
+        """Detections a track needs to cover MIN_TRACK_FRAMES source frames at this stride"""
+        return min_track_detections(self.stride)
+
+    @property
+    def max_frame_step(self):
+        """Largest gap in source frames between two analyzed frames"""
+        return self.max_gap_frames if self.motion_threshold is not None else self.stride
+
+    def is_candidate(self, frame_number):
+        """Whether the frame falls on the fixed-stride schedule"""
+        return (frame_number - 1) % self.stride == 0
+
+    def should_analyze(self, frame_number, frame):
+        """Motion gate for a decoded candidate frame"""
+        if self.motion_threshold is None:
+            return True
+
+        height, width = frame.shape[:2]
+        scale = MOTION_SAMPLE_WIDTH / width
+        small = cv2.cvtColor(
+            cv2.resize(frame, (MOTION_SAMPLE_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY
+        )
+
+        if self._last_small is not None and frame_number - self.last_analyzed_frame < self.max_gap_frames:
+            energy = cv2.absdiff(small, self._last_small).mean() / 255.0
+            if energy < self.motion_threshold:
+                return False
+
+        self._last_small = small
+        return True
+
+    def wants_pose(self, frame_number):
+        """Run pose on the first analyzed frame of each pose interval"""
+        if frame_number // self.pose_interval > self.last_pose_frame // self.pose_interval:
+            self.last_pose_frame = frame_number
+            return True
+        return False
+
+    def stats(self):
+        return {
+            'stride': self.stride,
+            'motionThreshold': self.motion_threshold,
+            'framesDecoded': self.frames_decoded,
+            'framesGrabbed': self.frames_grabbed,
+            'framesMotionSkipped': self.frames_motion_skipped,
+            'framesAnalyzed': self.frames_analyzed
+        }
+
+
+def sample_frames(cap, fps, policy, start_frame=1, end_frame=None):
+    """
+    Decode frames according to `policy`, yielding
+    (frame_number, timestamp, frame, run_pose) tuples for frames that
+    should be analyzed. To analyze part of a video, position `cap` at
+    `start_frame` and pass the last frame to analyze as `end_frame`.
+    """
+    frame_number = start_frame - 1
+    # Keep the pose schedule aligned with the whole video's
+    policy.last_pose_frame = frame_number
+    while end_frame is None or frame_number < end_frame:
+        frame_number += 1
+
+        if not policy.is_candidate(frame_number):
+            # Advance the stream without decoding the skipped frame
+            if not cap.grab():
+                break
+            policy.frames_grabbed += 1
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        policy.frames_decoded += 1
+
+        if not policy.should_analyze(frame_number, frame):
+            policy.frames_motion_skipped += 1
+            continue
+
+        policy.last_analyzed_frame = frame_number
+        policy.frames_analyzed += 1
+        timestamp = frame_number / fps if fps > 0 else 0
+        yield frame_number, timestamp, frame, policy.wants_pose(frame_number)
+
+
+def merge_sampling_stats(stats):
+    """Combine SamplingPolicy.stats() of policies that each sampled part of one video"""
+    merged = dict(stats[0])
+    for key in ('framesDecoded', 'framesGrabbed', 'framesMotionSkipped', 'framesAnalyzed'):
+        merged[key] = sum(s[key] for s in stats)
+    return merged
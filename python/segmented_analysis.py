@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Segmented analysis helpers
+Split a video into contiguous time segments that separate processes
+analyze in parallel, then stitch the per-segment tracker IDs back into
+one ID space. Every segment after the first starts decoding `overlap`
+frames before its own range, so its tracker is warmed up at the
+boundary. The tracks it sees in those overlap frames are matched to the
+previous segment's tracks on the same frames by box IoU, and a matched
+player keeps one track ID across segments.
+"""
+
+import numpy as np
+
+from association import box_iou
+
+# Overlap analyzed by both neighbouring segments, for ID matching
+DEFAULT_OVERLAP_SECONDS = 2.0
+
+# Segments shorter than this many overlaps aren't worth a process
+MIN_SEGMENT_OVERLAPS = 4
+
+# Mean IoU over the overlap two tracks need to be the same player
+MIN_MATCH_IOU = 0.5
+
+
+def plan_segments(total_frames, segments, overlap_frames):
+    """
+    Split source frames 1..total_frames into up to `segments` ranges.
+    Returns (decode_start, start, end) tuples, 1-based and inclusive:
+    the segment owns frames start..end and is decoded from decode_start
+    (start - overlap_frames, except for the first segment).
+    """
+    min_length = max(1, MIN_SEGMENT_OVERLAPS * overlap_frames)
+    count = max(1, min(segments, total_frames // min_length))
+    bounds = np.linspace(0, total_frames, count + 1).round().astype(int)
+    return [
+        (max(1, start + 1 - overlap_frames) if i > 0 else 1, start + 1, end)
+        for i, (start, end) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+    ]
+
+
+def match_tracks(previous, overlap, min_iou=MIN_MATCH_IOU):
+    """
+    {overlap track id: previous track id} for the same players.
+
+    previous and overlap map frame numbers to (track_ids, bboxes) as
+    seen by the two segments. Each pair of tracks is scored by its IoU
+    summed over the shared frames, divided by the frames either track
+    appears in, and pairs are matched greedily from the best score.
+    """
+    scores = {}
+    appearances = {}
+    for frame_number, (overlap_ids, overlap_boxes) in overlap.items():
+        for track_id in overlap_ids:
+            appearances[('overlap', track_id)] = appearances.get(('overlap', track_id), 0) + 1
+        if frame_number not in previous:
+            continue
+        previous_ids, previous_boxes = previous[frame_number]
+        if len(overlap_ids) == 0 or len(previous_ids) == 0:
+            continue
+        ious = box_iou(overlap_boxes, previous_boxes)
+        for i, j in zip(*np.nonzero(ious)):
+            pair = (overlap_ids[i], previous_ids[j])
+            scores[pair] = scores.get(pair, 0.0) + ious[i, j]
+    for previous_ids, _ in previous.values():
+        for track_id in previous_ids:
+            appearances[('previous', track_id)] = appearances.get(('previous', track_id), 0) + 1
+
+    ranked = sorted(
+        (
+            (total / max(appearances[('overlap', overlap_id)], appearances[('previous', previous_id)]),
+             overlap_id, previous_id)
+            for (overlap_id, previous_id), total in scores.items()
+        ),
+        reverse=True
+    )
+    matches = {}
+    taken = set()
+    for score, overlap_id, previous_id in ranked:
+        if score < min_iou:
+            break
+        if overlap_id in matches or previous_id in taken:
+            continue
+        matches[overlap_id] = previous_id
+        taken.add(previous_id)
+    return matches
+
+
+def stitch_segments(segment_frames, plan, min_iou=MIN_MATCH_IOU):
+    """
+    Merge per-segment frame lists into one list in frame order with
+    globally unique track IDs.
+
+    segment_frames[i] holds segment plan[i]'s analyzed frames as
+    (frame_number, timestamp, (track_ids, bboxes, confidences), poses)
+    tuples. Overlap frames before a segment's start are only used for
+    matching; the previous segment's results are kept for them.
+    """
+    stitched = []
+    next_id = 1
+    tail = {}  # Previous segment's overlap-range detections, in global IDs
+
+    for frames, (_, start, _), next_plan in zip(segment_frames, plan, plan[1:] + [None]):
+        overlap = {
+            frame_number: (track_ids, bboxes)
+            for frame_number, _, (track_ids, bboxes, _), _ in frames
+            if frame_number < start
+        }
+        id_map = match_tracks(tail, overlap, min_iou)
+
+        tail = {}
+        for frame_number, timestamp, (track_ids, bboxes, confidences), poses in frames:
+            if frame_number < start:
+                continue
+            global_ids = []
+            for track_id in track_ids:
+                if track_id not in id_map:
+                    id_map[track_id] = next_id
+                    next_id += 1
+                global_ids.append(id_map[track_id])
+            stitched.append((frame_number, timestamp, (global_ids, bboxes, confidences), poses))
+            if next_plan is not None and frame_number >= next_plan[0]:
+                tail[frame_number] = (global_ids, bboxes)
+
+    return stitched
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Columnar player track storage
+Keeps each track's detections and pose estimates in growable,
+preallocated NumPy arrays instead of one dict per detection, so long
+videos with many tracks stay small in memory. The JSON-shaped `frames`
+lists are only built on export.
+"""
+
+import numpy as np
+
+INITIAL_CAPACITY = 64
+
+KEYPOINT_NAMES = [
+    'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
+    'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
+]
+
+
+def _grow_columns(columns, names, size):
+    """Double the capacity of each named array attribute, keeping the first `size` rows"""
+    for name in names:
+        old = getattr(columns, name)
+        new = np.empty((len(old) * 2,) + old.shape[1:], dtype=old.dtype)
+        new[:size] = old[:size]
+        setattr(columns, name, new)
+
+
+class TrackColumns:
+    """
+    Detections for one track, one array per column:
+    frame (int32), timestamp (float64), bbox x1/y1/x2/y2 (float32, n x 4)
+    and conf (float32). Only the first `size` rows are valid.
+    """
+
+    __slots__ = ('size', '_frame', '_timestamp', '_bbox', '_conf')
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self._frame = np.empty(capacity, dtype=np.int32)
+        self._timestamp = np.empty(capacity, dtype=np.float64)
+        self._bbox = np.empty((capacity, 4), dtype=np.float32)
+        self._conf = np.empty(capacity, dtype=np.float32)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, frame_number, timestamp, bbox, conf):
+        if self.size == len(self._frame):
+            _grow_columns(self, ('_frame', '_timestamp', '_bbox', '_conf'), self.size)
+        i = self.size
+        self._frame[i] = frame_number
+        self._timestamp[i] = timestamp
+        self._bbox[i] = bbox
+        self._conf[i] = conf
+        self.size += 1
+
+    @property
+    def last_frame(self):
+        return int(self._frame[self.size - 1])
+
+    @property
+    def frames(self):
+        return self._frame[:self.size]
+
+    @property
+    def timestamps(self):
+        return self._timestamp[:self.size]
+
+    @property
+    def bboxes(self):
+        return self._bbox[:self.size]
+
+    @property
+    def confidences(self):
+        return self._conf[:self.size]
+
+    @property
+    def positions(self):
+        """Bounding-box centers as an (n, 2) array"""
+        bbox = self.bboxes
+        return (bbox[:, :2] + bbox[:, 2:]) / 2
+
+    @property
+    def ground_positions(self):
+        """Bottom centers of the bounding boxes, where the skates touch the ice, as an (n, 2) array"""
+        bbox = self.bboxes
+        return np.column_stack(((bbox[:, 0] + bbox[:, 2]) / 2, bbox[:, 3]))
+
+    def to_frames(self):
+        """Build the JSON-shaped per-detection `frames` list"""
+        bbox = self.bboxes
+        positions = self.positions
+        sizes = bbox[:, 2:] - bbox[:, :2]
+        return [
+            {
+                'frameNumber': frame_number,
+                'timestamp': timestamp,
+                'bbox': {
+                    'x': x1,
+                    'y': y1,
+                    'width': width,
+                    'height': height
+                },
+                'confidence': conf,
+                'position': {
+                    'x': center_x,
+                    'y': center_y
+                }
+            }
+            for frame_number, timestamp, (x1, y1, _, _), (width, height), conf, (center_x, center_y) in zip(
+                self.frames.tolist(),
+                self.timestamps.tolist(),
+                bbox.tolist(),
+                sizes.tolist(),
+                self.confidences.tolist(),
+                positions.tolist()
+            )
+        ]
+
+
+class TrackStore:
+    """Struct-of-arrays track storage keyed by track id"""
+
+    def __init__(self):
+        self._tracks = {}
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __getitem__(self, track_id):
+        return self._tracks[track_id]
+
+    def items(self):
+        return self._tracks.items()
+
+    def add_frame(self, frame_number, timestamp, track_ids, bboxes, confidences):
+        """
+        Record one frame's detections: `track_ids` (n,), `bboxes` (n, 4)
+        in x1/y1/x2/y2 pixels and `confidences` (n,)
+        """
+        for track_id, bbox, conf in zip(track_ids, bboxes, confidences):
+            track = self._tracks.get(track_id)
+            if track is None:
+                track = self._tracks[track_id] = TrackColumns()
+            track.append(frame_number, timestamp, bbox, conf)
+
+    def pop_stale(self, current_frame, max_age):
+        """Remove and return (track_id, track) pairs unseen for more than `max_age` frames"""
+        stale = [
+            track_id for track_id, track in self._tracks.items()
+            if current_frame - track.last_frame > max_age
+        ]
+        return [(track_id, self._tracks.pop(track_id)) for track_id in stale]
+
+    def nbytes(self):
+        """Memory held by the track arrays, including spare capacity"""
+        return sum(
+            track._frame.nbytes + track._timestamp.nbytes + track._bbox.nbytes + track._conf.nbytes
+            for track in self._tracks.values()
+        )
+
+
+class PoseColumns:
+    """
+    Pose estimates for one track, one array per column: frame (int32),
+    timestamp (float64), keypoints x/y/conf (float32, n x 17 x 3) and
+    skating angle in degrees (float64, NaN when not measurable)
+    """
+
+    __slots__ = ('size', '_frame', '_timestamp', '_keypoints', '_skating_angle')
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self._frame = np.empty(capacity, dtype=np.int32)
+        self._timestamp = np.empty(capacity, dtype=np.float64)
+        self._keypoints = np.empty((capacity, len(KEYPOINT_NAMES), 3), dtype=np.float32)
+        self._skating_angle = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, frame_number, timestamp, keypoints, skating_angle):
+        if self.size == len(self._frame):
+            _grow_columns(self, ('_frame', '_timestamp', '_keypoints', '_skating_angle'), self.size)
+        i = self.size
+        self._frame[i] = frame_number
+        self._timestamp[i] = timestamp
+        self._keypoints[i] = keypoints
+        self._skating_angle[i] = np.nan if skating_angle is None else skating_angle
+        self.size += 1
+
+    @property
+    def frames(self):
+        return self._frame[:self.size]
+
+    @property
+    def timestamps(self):
+        return self._timestamp[:self.size]
+
+    @property
+    def keypoints(self):
+        return self._keypoints[:self.size]
+
+    @property
+    def skating_angles(self):
+        return self._skating_angle[:self.size]
+
+    def to_frames(self):
+        """Build the JSON-shaped per-estimate `frames` list"""
+        return [
+            {
+                'frameNumber': frame_number,
+                'timestamp': timestamp,
+                'keypoints': [
+                    {'name': name, 'x': x, 'y': y, 'confidence': conf}
+                    for name, (x, y, conf) in zip(KEYPOINT_NAMES, keypoints)
+                ],
+                'posture': {
+                    'skatingAngle': None if np.isnan(skating_angle) else skating_angle,
+                    'bodyBalance': 0.8  # Placeholder
+                }
+            }
+            for frame_number, timestamp, keypoints, skating_angle in zip(
+                self.frames.tolist(),
+                self.timestamps.tolist(),
+                self.keypoints.tolist(),
+                self.skating_angles.tolist()
+            )
+        ]
+
+
+class PoseStore:
+    """Struct-of-arrays pose storage keyed by track id"""
+
+    def __init__(self):
+        self._tracks = {}
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def items(self):
+        return self._tracks.items()
+
+    def clear(self):
+        self._tracks.clear()
+
+    def add(self, track_id, frame_number, timestamp, keypoints, skating_angle):
+        """Record one pose estimate; `keypoints` is a (17, 3) x/y/conf array"""
+        poses = self._tracks.get(track_id)
+        if poses is None:
+            poses = self._tracks[track_id] = PoseColumns()
+        poses.append(frame_number, timestamp, keypoints, skating_angle)
+
+    def add_frame(self, frame_number, timestamp, track_ids, keypoints, skating_angles):
+        """
+        Record one frame's pose estimates: `track_ids` (n,), `keypoints`
+        (n, 17, 3) and `skating_angles` (n,)
+        """
+        for track_id, person_keypoints, skating_angle in zip(track_ids, keypoints, skating_angles):
+            self.add(track_id, frame_number, timestamp, person_keypoints, skating_angle)
@@ -524,6 +524,27 @@ const videoAnalysisRouter = router({
       };
     }),
 
+  // Tracks finished so far while a local analysis is still running. The
+  // script streams NDJSON, so finished tracks can be read before it exits.
+  getPartialResults: protectedProcedure
+    .input(z.object({ videoId: z.string() }))
+    .query(async ({ input }) => {
+      const { getPartialAnalysisResults } = await import("./videoAnalysisService");
+      const partial = await getPartialAnalysisResults(input.videoId);
+      if (!partial) {
+        return null;
+      }
+
+      // Per-frame positions are left out to keep the polled payload small
+      return {
+        playerTracking: partial.playerTracking.map(({ playerId, trackId, metrics }) => ({
+          playerId,
+          trackId,
+          metrics,
+        })),
+      };
+    }),
+
   getResults: protectedProcedure
     .input(z.object({ videoId: z.string() }))
     .query(async ({ input }) => {
@@ -1,4 +1,4 @@
-import { spawn, execSync } from "child_process";
+import { spawn, execSync, ChildProcess } from "child_process";
 import path from "path";
 import fs from "fs";
 import { fileURLToPath } from "url";
@@ -36,6 +36,14 @@ export interface PlayerTracking {
     averageSpeed: number; // km/h
     maxSpeed: number; // km/h
     timeOnIce: number; // seconds
+    maxAcceleration?: number; // m/s^2
+    maxDeceleration?: number; // m/s^2
+    sprintCount?: number;
+    speedProfile?: {
+      startTime: number; // seconds
+      interval: number; // seconds between samples
+      speeds: number[]; // smoothed km/h
+    };
   };
 }
 
@@ -59,19 +67,30 @@ export interface PoseAnalysis {
   }>;
 }
 
+export interface PuckFrame {
+  frameNumber: number;
+  timestamp: number;
+  x: number;
+  y: number;
+  detected: boolean; // false where the tracker coasted through a short occlusion
+}
+
 export interface VideoAnalysisResult {
   videoId: string;
   totalFrames: number;
   fps: number;
   duration: number; // seconds
   playerTracking: PlayerTracking[];
+  puckTracking?: PuckFrame[]; // only when analyzed with puck tracking
   poseAnalysis: PoseAnalysis[];
   events: Array<{
     timestamp: number;
     frameNumber: number;
-    type: string; // shot, pass, etc.
+    type: string; // sprint, hardStop, directionChange, playerEntered, playerLeft, lineChange, possession
     confidence: number;
     description: string;
+    trackId?: number; // the player, for player events
+    [detail: string]: unknown; // per-type values, e.g. maxSpeed of a sprint
   }>;
   summary: {
     totalPlayers: number;
@@ -83,6 +102,185 @@ export interface VideoAnalysisResult {
 // In-memory progress tracking (in production, use Redis or database)
 const analysisProgress = new Map<string, VideoAnalysisProgress>();
 
+const resultsDir = path.join(__dirname, "../analysis_results");
+
+/**
+ * Assemble results from the analysis script's NDJSON output. Works on a
+ * file that is still being written: a trailing partial line is ignored
+ * and missing records are left empty.
+ */
+export function parseNdjsonResults(data: string): VideoAnalysisResult {
+  const result: VideoAnalysisResult = {
+    videoId: "",
+    totalFrames: 0,
+    fps: 0,
+    duration: 0,
+    playerTracking: [],
+    poseAnalysis: [],
+    events: [],
+    summary: { totalPlayers: 0, averageSpeed: 0, totalDistance: 0 },
+  };
+  const poses = new Map<number, PoseAnalysis>();
+
+  for (const line of data.split("\n")) {
+    let record: any;
+    try {
+      record = JSON.parse(line);
+    } catch (e) {
+      continue; // Blank or partially written line
+    }
+    const { type, ...rest } = record;
+    if (type === "header") {
+      Object.assign(result, rest);
+    } else if (type === "track") {
+      result.playerTracking.push(rest as PlayerTracking);
+    } else if (type === "pose") {
+      // Pose frames for one track may be split across several records
+      const existing = poses.get(rest.trackId);
+      if (existing) {
+        existing.frames.push(...rest.frames);
+      } else {
+        poses.set(rest.trackId, rest as PoseAnalysis);
+      }
+    } else if (type === "puck") {
+      result.puckTracking = rest.frames;
+    } else if (type === "events") {
+      result.events = rest.events;
+    } else if (type === "summary") {
+      result.summary = rest.summary;
+    }
+  }
+
+  result.poseAnalysis = Array.from(poses.values());
+  return result;
+}
+
+/**
+ * Read a results file written in either the streaming (.ndjson) or the
+ * single-document (.json) format
+ */
+function readResultsFile(videoId: string): VideoAnalysisResult | null {
+  const ndjsonPath = path.join(resultsDir, `${videoId}.ndjson`);
+  if (fs.existsSync(ndjsonPath)) {
+    return parseNdjsonResults(fs.readFileSync(ndjsonPath, "utf-8"));
+  }
+
+  const jsonPath = path.join(resultsDir, `${videoId}.json`);
+  if (fs.existsSync(jsonPath)) {
+    return JSON.parse(fs.readFileSync(jsonPath, "utf-8")) as VideoAnalysisResult;
+  }
+
+  return null;
+}
+
+interface WorkerJob {
+  videoId: string;
+  onMessage: (message: any) => void;
+  onComplete: (exitCode: number) => void;
+}
+
+// Long-lived `analyze_video.py --serve` process. Models are loaded once
+// and jobs run back-to-back, so only the first video pays model startup.
+let analysisWorker: ChildProcess | null = null;
+let workerOutput = "";
+let activeJobId: string | null = null;
+let nextJobId = 1;
+const workerJobs = new Map<string, WorkerJob>();
+
+function handleWorkerLine(line: string): void {
+  let message: any = null;
+  try {
+    message = JSON.parse(line);
+  } catch (e) {
+    // Not JSON, just log message
+  }
+
+  if (message?.type === "jobStart") {
+    activeJobId = message.jobId;
+  }
+
+  const job = activeJobId ? workerJobs.get(activeJobId) : undefined;
+  console.log(`[Video Analysis ${job ? job.videoId : "worker"}] ${line}`);
+
+  if (message?.type === "jobComplete") {
+    const completed = workerJobs.get(message.jobId);
+    workerJobs.delete(message.jobId);
+    activeJobId = null;
+    completed?.onComplete(message.exitCode);
+  } else if (message && job) {
+    job.onMessage(message);
+  }
+}
+
+function getAnalysisWorker(scriptPath: string): ChildProcess {
+  if (analysisWorker) {
+    return analysisWorker;
+  }
+
+  const worker = spawn("python3", [scriptPath, "--serve"]);
+
+  worker.stdout!.on("data", (data) => {
+    // Messages are newline-delimited; keep any partial line for the next chunk
+    workerOutput += data.toString();
+    const lines = workerOutput.split("\n");
+    workerOutput = lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) {
+        handleWorkerLine(line);
+      }
+    }
+  });
+
+  worker.stderr!.on("data", (data) => {
+    const job = activeJobId ? workerJobs.get(activeJobId) : undefined;
+    console.error(`[Video Analysis ${job ? job.videoId : "worker"}] Error: ${data}`);
+  });
+
+  worker.stdin!.on("error", (error) => {
+    // The close handler below fails the pending jobs
+    console.error(`[Video Analysis] Worker stdin error: ${error.message}`);
+  });
+
+  worker.on("close", (code) => {
+    console.error(`[Video Analysis] Worker exited with code ${code}`);
+    analysisWorker = null;
+    workerOutput = "";
+    activeJobId = null;
+
+    // Fail every job still waiting on the dead worker; the next job respawns it
+    const pending = Array.from(workerJobs.values());
+    workerJobs.clear();
+    for (const job of pending) {
+      job.onComplete(code || 1);
+    }
+  });
+
+  analysisWorker = worker;
+  return worker;
+}
+
+/**
+ * Queue a video on the analysis worker. `onMessage` receives the job's
+ * progress/pipeline messages (and its jobStart) and `onComplete` its exit code.
+ */
+function runWorkerJob(
+  scriptPath: string,
+  job: {
+    videoPath: string;
+    videoId: string;
+    outputPath: string;
+    outputFormat: string;
+    inferenceOutput?: string;
+  },
+  onMessage: (message: any) => void,
+  onComplete: (exitCode: number) => void
+): void {
+  const worker = getAnalysisWorker(scriptPath);
+  const jobId = String(nextJobId++);
+  workerJobs.set(jobId, { videoId: job.videoId, onMessage, onComplete });
+  worker.stdin!.write(JSON.stringify({ jobId, ...job }) + "\n");
+}
+
 /**
  * Start video analysis in background
  */
@@ -117,7 +315,10 @@ export async function startVideoAnalysis(
 
     // Run Python analysis script in background
     const scriptPath = path.join(__dirname, "../python/analyze_video.py");
-    const outputPath = path.join(__dirname, "../analysis_results", `${videoId}.json`);
+    // Streamed so finished tracks can be read before analysis completes
+    const outputPath = path.join(resultsDir, `${videoId}.ndjson`);
+    // Raw detections and keypoints, so metrics can be recomputed without the models
+    const inferenceOutput = path.join(resultsDir, `${videoId}.inference.npz`);
 
     console.log(`[Video Analysis] Script path: ${scriptPath}`);
     console.log(`[Video Analysis] Output path: ${outputPath}`);
@@ -168,58 +369,8 @@ export async function startVideoAnalysis(
     return;
   }
 
-  // Spawn Python process
-  const pythonProcess = spawn("python3", [scriptPath, videoPath, videoId, outputPath]);
-
-  // Update progress to processing
-  analysisProgress.set(videoId, {
-    videoId,
-    status: "processing",
-    progress: 5,
-    startedAt: new Date(),
-    message: "Initializing video analysis...",
-  });
-
-  // Update database status to processing
-  const db = await getDb();
-  if (db) {
-    await db
-      .update(videoAnalysisResults)
-      .set({ status: "processing", progress: 5 })
-      .where(eq(videoAnalysisResults.videoId, videoId));
-  }
-
-  // Handle stdout (progress updates)
-  pythonProcess.stdout.on("data", (data) => {
-    const output = data.toString().trim();
-    console.log(`[Video Analysis ${videoId}] ${output}`);
-
-    // Parse progress updates from Python script
-    try {
-      const progressData = JSON.parse(output);
-      if (progressData.type === "progress") {
-        analysisProgress.set(videoId, {
-          videoId,
-          status: "processing",
-          progress: progressData.progress,
-          currentFrame: progressData.currentFrame,
-          totalFrames: progressData.totalFrames,
-          message: progressData.message,
-          startedAt: analysisProgress.get(videoId)?.startedAt,
-        });
-      }
-    } catch (e) {
-      // Not JSON, just log message
-    }
-  });
-
-  // Handle stderr
-  pythonProcess.stderr.on("data", (data) => {
-    console.error(`[Video Analysis ${videoId}] Error: ${data}`);
-  });
-
   // Handle completion
-  pythonProcess.on("close", async (code) => {
+  const onComplete = async (code: number) => {
     const db = await getDb();
     if (code === 0) {
       // Success
@@ -234,11 +385,7 @@ export async function startVideoAnalysis(
       
       // Update database
       if (db) {
-        const resultPath = path.join(__dirname, "../analysis_results", `${videoId}.json`);
-        let results = null;
-        if (fs.existsSync(resultPath)) {
-          results = JSON.parse(fs.readFileSync(resultPath, "utf-8"));
-        }
+        const results = readResultsFile(videoId);
         
         await db
           .update(videoAnalysisResults)
@@ -278,7 +425,49 @@ export async function startVideoAnalysis(
       
       console.error(`[Video Analysis ${videoId}] Failed with code ${code}`);
     }
-  });
+  };
+
+  // Handle progress updates from the worker
+  const onMessage = async (message: any) => {
+    if (message.type === "jobStart") {
+      // Update progress to processing
+      analysisProgress.set(videoId, {
+        videoId,
+        status: "processing",
+        progress: 5,
+        startedAt: analysisProgress.get(videoId)?.startedAt,
+        message: "Initializing video analysis...",
+      });
+
+      // Update database status to processing
+      const db = await getDb();
+      if (db) {
+        await db
+          .update(videoAnalysisResults)
+          .set({ status: "processing", progress: 5 })
+          .where(eq(videoAnalysisResults.videoId, videoId));
+      }
+    } else if (message.type === "progress") {
+      analysisProgress.set(videoId, {
+        videoId,
+        status: "processing",
+        progress: message.progress,
+        currentFrame: message.currentFrame,
+        totalFrames: message.totalFrames,
+        message: message.message,
+        startedAt: analysisProgress.get(videoId)?.startedAt,
+      });
+    }
+  };
+
+  // Queue the video on the persistent analysis worker (stays "queued"
+  // until the worker picks it up)
+  runWorkerJob(
+    scriptPath,
+    { videoPath, videoId, outputPath, outputFormat: "ndjson", inferenceOutput },
+    onMessage,
+    onComplete
+  );
   } catch (error) {
     console.error(`[Video Analysis] Error starting analysis for ${videoId}:`, error);
     analysisProgress.set(videoId, {
@@ -308,13 +497,20 @@ export async function getAnalysisResults(videoId: string): Promise<VideoAnalysis
     return null;
   }
 
-  const resultPath = path.join(__dirname, "../analysis_results", `${videoId}.json`);
-  if (!fs.existsSync(resultPath)) {
+  return readResultsFile(videoId);
+}
+
+/**
+ * Get the tracks written so far for a video that is still being analyzed
+ * locally (the videoAnalysis.getPartialResults route)
+ */
+export async function getPartialAnalysisResults(videoId: string): Promise<VideoAnalysisResult | null> {
+  const progress = analysisProgress.get(videoId);
+  if (!progress || progress.status !== "processing") {
     return null;
   }
 
-  const resultData = fs.readFileSync(resultPath, "utf-8");
-  return JSON.parse(resultData) as VideoAnalysisResult;
+  return readResultsFile(videoId);
 }
 
 /**
@@ -8,6 +8,18 @@ import cv2
 import numpy as np
 import sys
 import os
+import re
+import time
+import hashlib
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICE_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'video-analysis-service', 'src')
+PYTHON_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python')
+
+# Runtime package each exported backend needs
+BACKEND_PACKAGES = {'onnx': 'onnxruntime', 'openvino': 'openvino'}
 
 def create_test_video(output_path, duration_seconds=5, fps=30):
     """
@@ -61,6 +73,442 @@ def create_test_video(output_path, duration_seconds=5, fps=30):
     print(f"✓ Test video created: {output_path}")
     print(f"  Duration: {duration_seconds}s, FPS: {fps}, Frames: {total_frames}")
 
+class ThrottledVideoHandler(SimpleHTTPRequestHandler):
+    """
+    Serves fixture files at a capped bandwidth, like a slow upload
+    source. Honors single `Range: bytes=a-b` requests when support_ranges
+    is set.
+    """
+    bytes_per_second = 1024 * 1024
+    support_ranges = True
+    block_size = 16 * 1024
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if self.support_ranges and match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        if self.support_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(self.block_size, remaining))
+                    self.wfile.write(block)
+                    remaining -= len(block)
+                    time.sleep(len(block) / self.bytes_per_second)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client stopped reading
+
+def start_video_server(directory, bytes_per_second, support_ranges=True):
+    """Serve `directory` over HTTP on a random local port; returns (server, base_url)"""
+    handler = type('Handler', (ThrottledVideoHandler,), {
+        'bytes_per_second': bytes_per_second,
+        'support_ranges': support_ranges
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def frame_digests(cap):
+    """MD5 of every decoded frame"""
+    digests = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        digests.append(hashlib.md5(frame.tobytes()).hexdigest())
+    return digests
+
+def test_streaming_ingest(video_path):
+    """Test decoding a video while it downloads from a throttled server"""
+    try:
+        sys.path.insert(0, SERVICE_SRC)
+        from video_stream import RemoteVideoStream, supports_stream_capture
+        
+        if not supports_stream_capture():
+            print("- Streaming ingest skipped (OpenCV can't decode from streams)")
+            return True
+        
+        expected = frame_digests(cv2.VideoCapture(video_path))
+        size = os.path.getsize(video_path)
+        # Throttle so the download alone takes about two seconds
+        bytes_per_second = max(size // 2, 64 * 1024)
+        
+        for support_ranges in (True, False):
+            server, base_url = start_video_server(os.path.dirname(video_path), bytes_per_second, support_ranges)
+            stream = RemoteVideoStream(f"{base_url}/{os.path.basename(video_path)}", chunk_size=64 * 1024)
+            try:
+                cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+                if not cap.isOpened():
+                    print(f"✗ Could not open streamed video (ranges={support_ranges})")
+                    return False
+                
+                ret, first_frame = cap.read()
+                downloaded_at_first_frame = stream.stats()['bytesDownloaded'] / size
+                digests = [hashlib.md5(first_frame.tobytes()).hexdigest()] if ret else []
+                digests += frame_digests(cap)
+                cap.release()
+                
+                if digests != expected:
+                    print(f"✗ Streamed frames differ from the local file (ranges={support_ranges})")
+                    return False
+                # With range requests the trailing MP4 index is fetched
+                # directly, so decoding starts early in the download
+                if support_ranges and downloaded_at_first_frame >= 0.5:
+                    print(f"✗ First frame only decoded after {downloaded_at_first_frame:.0%} was downloaded")
+                    return False
+                if stream.error:
+                    print(f"✗ Download error: {stream.error}")
+                    return False
+                
+                print(f"✓ Streaming ingest (ranges={support_ranges}): {len(digests)} frames match, "
+                      f"first frame after {downloaded_at_first_frame:.0%} downloaded, "
+                      f"{stream.range_requests} range requests")
+            finally:
+                stream.close()
+                server.shutdown()
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Streaming ingest test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_track_metrics():
+    """Test movement metrics on unevenly spaced samples"""
+    try:
+        sys.path.insert(0, PYTHON_SRC)
+        from metrics import compute_track_metrics
+        
+        # 1, 1 and 3 m steps (at 50 px/m) over 1, 1 and 2 s
+        positions = [(0, 0), (50, 0), (100, 0), (250, 0)]
+        timestamps = [0.0, 1.0, 2.0, 4.0]
+        metrics = compute_track_metrics(positions, timestamps, pixels_per_meter=50)
+        
+        # averageSpeed is the plain mean of the per-step speeds (3.6, 3.6
+        # and 5.4 km/h), not weighted by step duration (which gives 4.5)
+        expected = {'totalDistance': 5.0, 'timeOnIce': 4.0, 'averageSpeed': 4.2, 'maxSpeed': 5.4}
+        actual = {key: metrics[key] for key in expected}
+        if actual != expected:
+            print(f"✗ Track metrics {actual}, expected {expected}")
+            return False
+        
+        print("✓ Track metrics on unevenly spaced samples")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Track metrics test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_rink_calibration_gap():
+    """Test that no step joins rink meters and pixel-scaled points within a track"""
+    try:
+        sys.path.insert(0, PYTHON_SRC)
+        from rink_calibration import RinkMapping
+        from metrics import compute_track_metrics
+        from event_detection import EventDetector
+        
+        # 100 px/s along x at 10 fps; calibrated as 20 px/m (5 m/s) for
+        # frames 0-9, then a failed re-estimate from frame 10 on
+        frame_numbers = np.arange(20)
+        timestamps = frame_numbers / 10
+        points = np.column_stack((100 * timestamps, np.full(20, 300.0)))
+        mapping = RinkMapping([(0, np.diag([0.05, 0.05, 1.0])), (10, None)])
+        positions = mapping.to_rink(frame_numbers, points)
+        if not np.isnan(positions[10:]).all() or np.isnan(positions[:10]).any():
+            print("✗ Points seen without a transform aren't NaN once the video is calibrated")
+            return False
+        
+        metrics = compute_track_metrics(positions, timestamps, pixels_per_meter=1.0)
+        expected = {'totalDistance': 4.5, 'timeOnIce': 1.9, 'averageSpeed': 18.0, 'maxSpeed': 18.0}
+        actual = {key: metrics[key] for key in expected}
+        if actual != expected:
+            print(f"✗ Metrics across the calibration gap {actual}, expected {expected}")
+            return False
+        
+        detector = EventDetector(fps=10)
+        for frame_number, t, position in zip(frame_numbers, timestamps, positions):
+            detector.update(frame_number, t, np.array([1]), position[None])
+        types = {event['type'] for event in detector.finish()}
+        if types != {'playerEntered'}:
+            print(f"✗ Events across the calibration gap: {sorted(types)}")
+            return False
+        
+        # Never calibrated: the rough pixel scale throughout
+        uncalibrated = RinkMapping([(0, None)]).to_rink(frame_numbers, points)
+        if not np.allclose(uncalibrated, points / 50):
+            print("✗ Uncalibrated points don't fall back to the pixel scale")
+            return False
+        
+        print("✓ Rink calibration gap splits tracks' steps")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Rink calibration gap test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_event_detection():
+    """Test event detection on synthetic trajectories at 10 fps"""
+    try:
+        sys.path.insert(0, PYTHON_SRC)
+        from event_detection import EventDetector
+        
+        def turner(t):
+            """5 m/s along x, turning to y at 2 s"""
+            return (5 * min(t, 2.0), 5 * max(t - 2.0, 0.0))
+        
+        def stopper(t):
+            """6 m/s along x, stopping dead at 2 s"""
+            return (6 * min(t, 2.0), 10.0)
+        
+        detector = EventDetector(fps=10)
+        for frame_number in range(71):
+            t = frame_number / 10
+            track_ids, positions = [1], [turner(t)]
+            # Player 2 is gone after 3 s; player 9 takes over its slot once it expires
+            if frame_number <= 30:
+                track_ids.append(2)
+                positions.append(stopper(t))
+            if frame_number >= 62:
+                track_ids.append(9)
+                positions.append((30.0, 30.0))
+            detector.update(frame_number, t, np.array(track_ids), np.array(positions))
+            if frame_number == 30:
+                stopper_slot = detector.slots[2]
+        
+        events = [(event['type'], event['trackId'], event['frameNumber'], event['timestamp'])
+                  for event in detector.finish()]
+        expected = [
+            ('playerEntered', 1, 1, 0.1),
+            ('playerEntered', 2, 1, 0.1),
+            ('sprint', 2, 5, 0.5),
+            ('hardStop', 2, 24, 2.4),
+            ('directionChange', 1, 24, 2.4),
+            # Reported at the last sighting, once unseen for LEAVE_SECONDS
+            ('playerLeft', 2, 30, 3.0),
+            ('playerEntered', 9, 63, 6.3)
+        ]
+        if events != expected:
+            print(f"✗ Events {events}, expected {expected}")
+            return False
+        if 2 in detector.slots or detector.slots[9] != stopper_slot:
+            print(f"✗ Expired slot {stopper_slot} not reused: {detector.slots}")
+            return False
+        
+        print("✓ Event detection on synthetic trajectories")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Event detection test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_result_cache():
+    """Test result cache hits, misses, invalidation and LRU eviction"""
+    try:
+        import tempfile
+        sys.path.insert(0, PYTHON_SRC)
+        from result_cache import ResultCache, code_version
+        
+        with tempfile.TemporaryDirectory() as work_dir:
+            def result_file(name, size):
+                path = os.path.join(work_dir, name)
+                with open(path, 'wb') as f:
+                    f.write(b'x' * size)
+                return path
+            
+            source = result_file('analysis.py', 10)
+            version = code_version([source])
+            cache = ResultCache(os.path.join(work_dir, 'cache'), max_bytes=250)
+            key = ResultCache.key('video-a', targetFps=10, codeVersion=version)
+            
+            if cache.get(key) is not None:
+                print("✗ Result cache hit before anything was stored")
+                return False
+            cache.put(key, {'result.json': result_file('a.json', 100)})
+            cached = cache.get(key)
+            if cached is None or os.path.getsize(cached['result.json']) != 100:
+                print(f"✗ Result cache missed a stored entry: {cached}")
+                return False
+            
+            # Changed settings or analysis code must not reuse the entry
+            with open(source, 'ab') as f:
+                f.write(b'# changed')
+            for other_key in (ResultCache.key('video-a', targetFps=5, codeVersion=version),
+                              ResultCache.key('video-a', targetFps=10, codeVersion=code_version([source]))):
+                if cache.get(other_key) is not None:
+                    print("✗ Result cache hit after the settings or code changed")
+                    return False
+            
+            # The least recently used entry goes once the budget is exceeded
+            key_b = ResultCache.key('video-b')
+            cache.put(key_b, {'result.json': result_file('b.json', 100)})
+            time.sleep(0.01)
+            cache.get(key)
+            key_c = ResultCache.key('video-c')
+            cache.put(key_c, {'result.json': result_file('c.json', 100)})
+            if cache.get(key_b) is not None or cache.get(key) is None or cache.get(key_c) is None:
+                print("✗ Result cache didn't evict the least recently used entry")
+                return False
+            
+            # An entry over the whole budget is skipped rather than copied and evicted
+            key_d = ResultCache.key('video-d')
+            cache.put(key_d, {'result.json': result_file('d.json', 300)})
+            stats = cache.stats()
+            leftovers = [name for name in os.listdir(cache.directory) if name.startswith('.')]
+            if cache.get(key_d) is not None or stats['entries'] != 2 or leftovers:
+                print(f"✗ Result cache stored an entry over its budget: {stats}")
+                return False
+            
+            print(f"✓ Result cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['entries']} entries in {stats['bytes']} of {stats['maxBytes']} bytes")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Result cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_pose_association():
+    """Test matching poses to overlapping player boxes by IoU and keypoints in box"""
+    try:
+        sys.path.insert(0, PYTHON_SRC)
+        from association import associate_poses
+        
+        def pose(x1, x2):
+            """17 confident keypoints spread over x1..x2"""
+            keypoints = np.zeros((17, 3))
+            keypoints[:, 0] = np.linspace(x1, x2, 17)
+            keypoints[:, 1] = np.linspace(110, 290, 17)
+            keypoints[:, 2] = 0.9
+            return keypoints
+        
+        # Two players whose boxes overlap, listed in the opposite order
+        # to the poses, so pairing by index would swap them
+        track_ids = [7, 3]
+        track_boxes = np.array([[100, 100, 200, 300], [160, 100, 260, 300]], dtype=np.float32)
+        keypoints = np.stack([
+            pose(205, 255),  # player 3
+            pose(105, 155),  # player 7
+            pose(300, 325)   # overlaps player 3's box, but scores under min_score
+        ])
+        pose_boxes = np.array([[158, 102, 258, 298], [102, 102, 198, 298], [230, 100, 330, 300]],
+                              dtype=np.float32)
+        
+        matched_ids, matched_keypoints = associate_poses(keypoints, pose_boxes, track_ids, track_boxes)
+        if matched_ids != [3, 7] or not np.array_equal(matched_keypoints, keypoints[:2]):
+            print(f"✗ Poses matched to tracks {matched_ids}, expected [3, 7] with the third pose unmatched")
+            return False
+        
+        print("✓ Pose association on overlapping players")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Pose association test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_segment_stitching():
+    """Test stitching track IDs across the boundary of two overlapping segments"""
+    try:
+        sys.path.insert(0, PYTHON_SRC)
+        from segmented_analysis import stitch_segments
+        
+        def box(x):
+            return [x, 100, x + 40, 200]
+        
+        def segment(frame_numbers, players):
+            """Analyzed frames of one segment; players maps local track ID -> (first, last, box at frame)"""
+            frames = []
+            for frame_number in frame_numbers:
+                visible = [(track_id, at(frame_number)) for track_id, (first, last, at) in players.items()
+                           if first <= frame_number <= last]
+                frames.append((
+                    frame_number,
+                    frame_number / 30,
+                    ([track_id for track_id, _ in visible],
+                     np.array([bbox for _, bbox in visible], dtype=np.float32).reshape(-1, 4),
+                     np.full(len(visible), 0.9, dtype=np.float32)),
+                    (None, None)
+                ))
+            return frames
+        
+        # Frames 1-20 and 21-40, the second decoded from frame 11
+        plan = [(1, 1, 20), (11, 21, 40)]
+        skater = lambda frame_number: box(10 * frame_number)
+        first = segment(range(1, 21), {1: (1, 40, skater), 2: (1, 5, lambda _: box(600))})
+        # The second segment's tracker numbers from 1 again: the skater is
+        # its track 2, and its track 1 is a new player that would collide
+        # with the first segment's track 1. Its overlap boxes are shifted
+        # slightly, as a second tracker's would be.
+        second = segment(range(11, 41), {
+            2: (11, 40, lambda frame_number: box(10 * frame_number + 2)),
+            1: (30, 40, lambda _: box(900))
+        })
+        stitched = stitch_segments([first, second], plan)
+        
+        frame_numbers = [frame_number for frame_number, _, _, _ in stitched]
+        if frame_numbers != list(range(1, 41)):
+            print(f"✗ Stitched frames aren't 1-40 once each: {frame_numbers}")
+            return False
+        
+        ids_at = {frame_number: dict(zip(track_ids, bboxes.tolist()))
+                  for frame_number, _, (track_ids, bboxes, _), _ in stitched}
+        skater_ids = {track_id for frame_number, tracks in ids_at.items() for track_id, bbox in tracks.items()
+                      if bbox[0] in (10 * frame_number, 10 * frame_number + 2)}
+        if len(skater_ids) != 1:
+            print(f"✗ The skater crossing the boundary got track IDs {sorted(skater_ids)}")
+            return False
+        skater_id = skater_ids.pop()
+        short_id = next(track_id for track_id in ids_at[1] if track_id != skater_id)
+        new_id = next(track_id for track_id in ids_at[40] if track_id != skater_id)
+        if len({skater_id, short_id, new_id}) != 3:
+            print(f"✗ Track IDs collide across segments: {skater_id}, {short_id}, {new_id}")
+            return False
+        # Overlap frames keep the first segment's results
+        if any(ids_at[frame_number][skater_id][0] != 10 * frame_number for frame_number in range(11, 21)):
+            print("✗ Overlap frames were taken from the second segment")
+            return False
+        
+        print("✓ Segment stitching keeps track IDs across the boundary")
+        return True
+    
+    except Exception as e:
+        print(f"✗ Segment stitching test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def test_yolo_import():
     """Test if YOLOv8 can be imported"""
     try:
@@ -98,6 +546,246 @@ def test_model_download():
         print(f"✗ Model download failed: {e}")
         return False
 
+def read_frames(video_path, limit=None):
+    """Decoded frames of a video, up to `limit`"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while limit is None or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def test_batched_tracking(video_path, batch_sizes=(1, 8), max_pixels=0.01):
+    """
+    Test that batched detection with tracker replay gives the same boxes
+    and track IDs as per-frame `model.track(frame, persist=True)`
+    """
+    try:
+        from ultralytics import YOLO
+        sys.path.insert(0, PYTHON_SRC)
+        from analyze_video import DETECTION_ARGS, detection_arrays
+        from batch_inference import TRACKER_CONFIG, ReplayTracker, track_batch
+        
+        frames = read_frames(video_path)
+        model = YOLO('yolov8n.pt')
+        reference = [
+            detection_arrays(model.track(frame, persist=True, tracker=TRACKER_CONFIG, verbose=False,
+                                         **DETECTION_ARGS)[0])
+            for frame in frames
+        ]
+        
+        for batch_size in batch_sizes:
+            # A fresh model and tracker, so no state carries over between runs
+            model = YOLO('yolov8n.pt')
+            tracker = ReplayTracker(TRACKER_CONFIG)
+            tracked = []
+            for start in range(0, len(frames), batch_size):
+                results = track_batch(model, tracker, frames[start:start + batch_size], **DETECTION_ARGS)
+                tracked += [detection_arrays(result) for result in results]
+            
+            for frame_number, ((ids, boxes, _), (expected_ids, expected_boxes, _)) in enumerate(zip(tracked, reference)):
+                if list(ids) != list(expected_ids):
+                    print(f"✗ batch_size={batch_size} frame {frame_number}: track IDs {list(ids)}, "
+                          f"per-frame tracking gave {list(expected_ids)}")
+                    return False
+                if len(boxes) and np.abs(boxes - expected_boxes).max() > max_pixels:
+                    print(f"✗ batch_size={batch_size} frame {frame_number}: boxes off by "
+                          f"{np.abs(boxes - expected_boxes).max():.3f}px")
+                    return False
+            
+            track_count = len({track_id for ids, _, _ in tracked for track_id in ids})
+            box_count = sum(len(ids) for ids, _, _ in tracked)
+            print(f"✓ Batched tracking (batch_size={batch_size}) matches per-frame tracking: "
+                  f"{len(frames)} frames, {box_count} boxes, {track_count} tracks")
+        
+        return True
+    
+    except Exception as e:
+        print(f"✗ Batched tracking test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_segmented_analysis(video_path, overlap_seconds=0.3):
+    """
+    Test that analyzing in two segment processes covers the same frames
+    as one process, each once, and that the first segment's tracking up
+    to the overlap is the single process's
+    """
+    try:
+        import io
+        import json
+        import tempfile
+        import contextlib
+        sys.path.insert(0, PYTHON_SRC)
+        from analyze_video import analyze_video
+        from inference_store import load_inference
+        from segmented_analysis import plan_segments
+        
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        plan = plan_segments(total_frames, 2, int(round(overlap_seconds * fps)))
+        if len(plan) != 2:
+            print("- Segmented analysis skipped (video too short for two segments)")
+            return True
+        overlap_start = plan[1][0]
+        
+        frames, results = {}, {}
+        with tempfile.TemporaryDirectory() as output_dir:
+            for workers in (1, 2):
+                output_path = os.path.join(output_dir, f"workers{workers}.json")
+                inference_path = os.path.join(output_dir, f"workers{workers}.inference.npz")
+                # Progress lines go to stdout; keep them out of the test output
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exit_code = analyze_video(video_path, 'test', output_path, workers=workers,
+                                              segment_overlap=overlap_seconds, inference_output=inference_path)
+                if exit_code:
+                    print(f"✗ Analysis with workers={workers} failed")
+                    return False
+                with open(output_path) as f:
+                    results[workers] = json.load(f)
+                # The saved inference holds every analyzed frame's tracked
+                # boxes, before short tracks are dropped
+                frames[workers] = [
+                    (frame_number, track_ids, bboxes)
+                    for frame_number, _, (track_ids, bboxes, _), _ in load_inference(inference_path).frames()
+                ]
+        
+        frame_numbers = {workers: [frame[0] for frame in analyzed] for workers, analyzed in frames.items()}
+        if frame_numbers[2] != frame_numbers[1]:
+            print(f"✗ Segments analyzed {len(frame_numbers[2])} frames ({len(set(frame_numbers[2]))} distinct), "
+                  f"one process {len(frame_numbers[1])}")
+            return False
+        
+        def relabel(analyzed):
+            """Frames before the overlap with track IDs numbered by first appearance"""
+            labels = {}
+            return [
+                (frame_number, [labels.setdefault(track_id, len(labels)) for track_id in track_ids], bboxes.tolist())
+                for frame_number, track_ids, bboxes in analyzed
+                if frame_number < overlap_start
+            ]
+        if relabel(frames[2]) != relabel(frames[1]):
+            print("✗ The first segment's tracking differs from single-process analysis")
+            return False
+        
+        for track in results[2]['playerTracking']:
+            track_frames = [frame['frameNumber'] for frame in track['frames']]
+            if track_frames != sorted(set(track_frames)):
+                print(f"✗ Track {track['trackId']} repeats frames across the segment boundary")
+                return False
+        
+        print(f"✓ Segmented analysis (workers=2) covers the same {len(frame_numbers[1])} frames as one process, "
+              f"identical before frame {overlap_start}; "
+              f"{len(results[1]['playerTracking'])} vs {len(results[2]['playerTracking'])} tracks")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Segmented analysis test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def compare_predictions(reference, candidate, min_conf=0.3, max_pixels=2.0, max_conf_diff=0.02):
+    """
+    Problems found comparing one frame's results of an exported model
+    with PyTorch's: every PyTorch box of at least min_conf needs a
+    matching box within max_pixels and max_conf_diff, and matching poses
+    keypoints within max_pixels.
+    """
+    from association import box_iou, greedy_match
+    
+    problems = []
+    reference_boxes = reference.boxes.xyxy.cpu().numpy()
+    reference_conf = reference.boxes.conf.cpu().numpy()
+    confident = reference_conf >= min_conf
+    candidate_boxes = candidate.boxes.xyxy.cpu().numpy()
+    candidate_conf = candidate.boxes.conf.cpu().numpy()
+    if not confident.any():
+        return problems
+    if len(candidate_boxes) == 0:
+        return [f"{int(confident.sum())} boxes missing"]
+    
+    rows = np.flatnonzero(confident)
+    matches = dict(greedy_match(box_iou(reference_boxes[rows], candidate_boxes), 0.5))
+    for row, reference_row in enumerate(rows):
+        if row not in matches:
+            problems.append(f"box {reference_boxes[reference_row].round(1).tolist()} missing")
+            continue
+        column = matches[row]
+        offset = np.abs(reference_boxes[reference_row] - candidate_boxes[column]).max()
+        conf_diff = abs(reference_conf[reference_row] - candidate_conf[column])
+        if offset > max_pixels or conf_diff > max_conf_diff:
+            problems.append(f"box off by {offset:.2f}px, confidence by {conf_diff:.3f}")
+        if reference.keypoints is not None and candidate.keypoints is not None:
+            reference_keypoints = reference.keypoints.xy.cpu().numpy()[reference_row]
+            candidate_keypoints = candidate.keypoints.xy.cpu().numpy()[column]
+            keypoint_offset = np.abs(reference_keypoints - candidate_keypoints).max()
+            if keypoint_offset > max_pixels:
+                problems.append(f"keypoints off by {keypoint_offset:.2f}px")
+    return problems
+
+def test_exported_backends(video_path):
+    """Test that ONNX Runtime and OpenVINO exports predict like the PyTorch models"""
+    try:
+        import importlib.util
+        import tempfile
+        sys.path.insert(0, PYTHON_SRC)
+        from inference_backends import load_model
+        
+        cap = cv2.VideoCapture(video_path)
+        frames = []
+        while len(frames) < 10:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        
+        with tempfile.TemporaryDirectory() as export_dir:
+            for backend, package in BACKEND_PACKAGES.items():
+                if importlib.util.find_spec(package) is None:
+                    print(f"- {backend} backend skipped ({package} is not installed)")
+                    continue
+                
+                for weights in ('yolov8n.pt', 'yolov8n-pose.pt'):
+                    reference_model = load_model(weights)
+                    start = time.time()
+                    model = load_model(weights, backend=backend, imgsz=640, export_dir=export_dir,
+                                       intra_op_threads=2, inter_op_threads=1)
+                    export_seconds = time.time() - start
+                    # A second load reuses the cached export
+                    start = time.time()
+                    load_model(weights, backend=backend, imgsz=640, export_dir=export_dir)
+                    reload_seconds = time.time() - start
+                    
+                    problems = []
+                    for index, frame in enumerate(frames):
+                        reference = reference_model(frame, conf=0.2, imgsz=640, verbose=False)[0]
+                        candidate = model(frame, conf=0.2, imgsz=640, verbose=False)[0]
+                        problems += [f"frame {index}: {problem}" for problem in compare_predictions(reference, candidate)]
+                    if problems:
+                        print(f"✗ {backend} {weights} differs from PyTorch:")
+                        for problem in problems[:10]:
+                            print(f"  {problem}")
+                        return False
+                    
+                    print(f"✓ {backend} {weights} matches PyTorch on {len(frames)} frames "
+                          f"(exported in {export_seconds:.1f}s, reloaded in {reload_seconds:.1f}s)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Exported backend test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def test_video_analysis(video_path):
     """Test running analysis on a video"""
     try:
@@ -158,7 +846,37 @@ def main():
         print("\n✗ YOLOv8 import failed. Cannot continue.")
         return 1
     
-    # Test 3: Create test video
+    # Test 3: Movement metrics
+    if not test_track_metrics():
+        print("\n✗ Track metrics test failed.")
+        return 1
+    
+    # Test 4: Rink calibration gap
+    if not test_rink_calibration_gap():
+        print("\n✗ Rink calibration gap test failed.")
+        return 1
+    
+    # Test 5: Event detection
+    if not test_event_detection():
+        print("\n✗ Event detection test failed.")
+        return 1
+    
+    # Test 6: Pose association
+    if not test_pose_association():
+        print("\n✗ Pose association test failed.")
+        return 1
+    
+    # Test 7: Segment stitching
+    if not test_segment_stitching():
+        print("\n✗ Segment stitching test failed.")
+        return 1
+    
+    # Test 8: Result cache
+    if not test_result_cache():
+        print("\n✗ Result cache test failed.")
+        return 1
+    
+    # Test 9: Create test video
     test_video_path = "/tmp/hockey_test_video.mp4"
     try:
         create_test_video(test_video_path, duration_seconds=3, fps=30)
@@ -166,16 +884,36 @@ def main():
         print(f"\n✗ Failed to create test video: {e}")
         return 1
     
-    # Test 4: Download models
+    # Test 10: Streaming ingest
+    if not test_streaming_ingest(test_video_path):
+        print("\n✗ Streaming ingest test failed.")
+        return 1
+    
+    # Test 11: Download models
     if not test_model_download():
         print("\n✗ Model download failed. Cannot continue.")
         return 1
     
-    # Test 5: Run analysis
+    # Test 12: Run analysis
     if not test_video_analysis(test_video_path):
         print("\n✗ Video analysis test failed.")
         return 1
     
+    # Test 13: Batched tracking
+    if not test_batched_tracking(test_video_path):
+        print("\n✗ Batched tracking test failed.")
+        return 1
+    
+    # Test 14: Segmented analysis
+    if not test_segmented_analysis(test_video_path):
+        print("\n✗ Segmented analysis test failed.")
+        return 1
+    
+    # Test 15: Exported CPU backends
+    if not test_exported_backends(test_video_path):
+        print("\n✗ Exported backend test failed.")
+        return 1
+    
     # Cleanup
     if os.path.exists(test_video_path):
         os.remove(test_video_path)
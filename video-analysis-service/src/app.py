@@ -3,42 +3,136 @@ Video Analysis Microservice
 Standalone service for hockey video analysis using YOLOv8
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
+import io
 import os
+import re
 import sys
 import json
 import tempfile
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 import cv2
-from ultralytics import YOLO
 import numpy as np
 from datetime import datetime
 
+# Shared analysis modules live in the repository's python/ directory
+sys.path.insert(0, os.environ.get(
+    'ANALYSIS_LIB_PATH',
+    str(Path(__file__).resolve().parents[2] / 'python')
+))
+from pipeline import FramePipeline
+from batch_inference import TRACK_BUFFER, TRACKER_CONFIG, ReplayTracker, track_batch
+from sampling import SamplingPolicy, sample_frames
+from track_store import TrackStore
+from metrics import compute_track_metrics
+from result_writer import NpzResultWriter, NumpyEncoder, copy_result
+from result_cache import ResultCache, code_version, hash_file
+from inference_backends import DEFAULT_EXPORT_DIR
+from instrumentation import Instrumentation, profiled, prometheus_text
+from profiles import PROFILES, get_profile, inference_args, load_profile_models
+from job_store import JobStore, job_to_json
+from video_stream import DEFAULT_CHUNK_SIZE, RemoteVideoStream, supports_stream_capture
+
+# Maximum decoded frames buffered ahead of inference
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 32))
+
+# Background jobs: how many run at once, and how many more may wait
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 1))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 16))
+JOB_DATA_DIR = os.environ.get('JOB_DATA_DIR', os.path.join(tempfile.gettempdir(), 'hockey-analysis-jobs'))
+
+# Download settings; streaming ingest decodes while the video downloads
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+STREAMING_INGEST = os.environ.get('STREAMING_INGEST', '1') != '0'
+
+RESULT_FORMATS = ('json', 'npz')
+
+# Results are cached by video content hash; 0 bytes disables the cache
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(JOB_DATA_DIR, 'cache'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# Performance profile (see python/profiles.py) for requests that don't name one;
+# nano keeps the output of releases before profiles (every frame at 640px)
+ANALYSIS_PROFILE = os.environ.get('ANALYSIS_PROFILE', 'nano')
+
+# Inference backend (pytorch, onnx or openvino) overriding every profile's;
+# onnx/openvino models are exported once into MODEL_EXPORT_DIR
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND') or None
+MODEL_EXPORT_DIR = os.environ.get('MODEL_EXPORT_DIR', DEFAULT_EXPORT_DIR)
+# Thread pools of each model; unset leaves the runtime's defaults
+INTRA_OP_THREADS = int(os.environ.get('INTRA_OP_THREADS', 0)) or None
+INTER_OP_THREADS = int(os.environ.get('INTER_OP_THREADS', 0)) or None
+
+# When set, each analysis is profiled with cProfile into <videoId>-<time>.prof here
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or None
+
+# Stage timings of every analysis this process has run, served on /metrics
+service_instruments = Instrumentation()
+
 app = Flask(__name__)
 CORS(app)
 
+
+def load_models(profile=ANALYSIS_PROFILE):
+    """Load the detection and pose models of a performance profile on the configured backend"""
+    return load_profile_models(
+        get_profile(profile, INFERENCE_BACKEND),
+        export_dir=MODEL_EXPORT_DIR,
+        intra_op_threads=INTRA_OP_THREADS,
+        inter_op_threads=INTER_OP_THREADS
+    )
+
+
 # Load YOLO models
-print("Loading YOLO models...")
+print(f"Loading YOLO models ({ANALYSIS_PROFILE} profile)...")
 try:
-    detection_model = YOLO('yolov8n.pt')  # Nano model for speed
-    pose_model = YOLO('yolov8n-pose.pt')
+    detection_model, pose_model = load_models()
     print("Models loaded successfully")
 except Exception as e:
     print(f"Error loading models: {e}")
     detection_model = None
     pose_model = None
 
+# Job state lives in SQLite, results as files next to it
+os.makedirs(os.path.join(JOB_DATA_DIR, 'results'), exist_ok=True)
+job_store = JobStore(os.path.join(JOB_DATA_DIR, 'jobs.db'))
+job_store.fail_unfinished("Interrupted by service restart")
+job_executor = ThreadPoolExecutor(max_workers=JOB_CONCURRENCY, thread_name_prefix='analysis-job')
+# One slot per running or waiting job; no free slot means backpressure
+job_slots = threading.BoundedSemaphore(JOB_CONCURRENCY + JOB_QUEUE_LIMIT)
+# YOLO predictors keep per-call state, so each job thread gets its own models
+job_models = threading.local()
+# Shared models of profiles other than the default, loaded on first request
+profile_models = {}
+profile_models_lock = threading.Lock()
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES) if RESULT_CACHE_MAX_BYTES > 0 else None
+# Cached results expire whenever the analysis code changes
+SERVICE_CODE_VERSION = code_version([
+    __file__,
+    *Path(__file__).resolve().parent.glob('video_stream.py'),
+    *Path(sys.path[0]).glob('*.py')
+])
 
-def download_video(url: str, output_path: str) -> bool:
+
+class AnalysisCancelled(Exception):
+    """Raised inside analyze_video once its cancel_event is set"""
+
+
+def download_video(url: str, output_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> bool:
     """Download video from URL"""
     try:
         response = requests.get(url, stream=True, timeout=300)
         response.raise_for_status()
         
         with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=chunk_size):
                 f.write(chunk)
         return True
     except Exception as e:
@@ -46,16 +140,106 @@ def download_video(url: str, output_path: str) -> bool:
         return False
 
 
-def analyze_video(video_path: str, video_id: str) -> dict:
-    """Analyze video and return results"""
+@contextmanager
+def open_video_source(url: str, on_downloaded=None):
+    """
+    Yield a video source for analyze_video: a RemoteVideoStream that is
+    decoded while it downloads, or a fully downloaded temp file when
+    streaming ingest is disabled or this OpenCV build can't read streams.
+    on_downloaded(content_hash) is called once the whole video is in,
+    which for a stream is while it is already being analyzed.
+    """
+    print(f"Downloading video from {url}")
+    if STREAMING_INGEST and supports_stream_capture():
+        try:
+            stream = RemoteVideoStream(url, chunk_size=DOWNLOAD_CHUNK_SIZE, on_complete=on_downloaded)
+        except requests.RequestException as e:
+            raise Exception(f"Failed to download video: {e}")
+        try:
+            yield stream
+        finally:
+            stream.close()
+        return
+    
+    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_file:
+        video_path = tmp_file.name
+    try:
+        if not download_video(url, video_path):
+            raise Exception("Failed to download video")
+        if on_downloaded:
+            on_downloaded(hash_file(video_path))
+        yield video_path
+    finally:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
+def open_capture(video_source):
+    """VideoCapture for a file path or a file-like stream"""
+    if isinstance(video_source, (str, os.PathLike)):
+        return cv2.VideoCapture(video_source)
+    return cv2.VideoCapture(video_source, cv2.CAP_FFMPEG, [])
+
+
+def write_json_results(path, results, tracks):
+    """
+    Write results to path as one JSON document whose playerTracking is
+    `tracks`, (track_id, TrackColumns, metrics) tuples. Tracks are
+    expanded to their per-frame records one at a time as they are
+    written, so the whole document is never held in memory.
+    """
+    with open(path, 'w') as f:
+        f.write('{')
+        for i, (key, value) in enumerate(results.items()):
+            f.write((', ' if i else '') + json.dumps(key) + ': ')
+            if key != 'playerTracking':
+                f.write(json.dumps(value, cls=NumpyEncoder))
+                continue
+            f.write('[')
+            for j, (track_id, track, metrics) in enumerate(tracks):
+                record = {"trackId": track_id, "frames": track.to_frames(), "metrics": metrics}
+                f.write((', ' if j else '') + json.dumps(record, cls=NumpyEncoder))
+            f.write(']')
+        f.write('}')
+
+
+def analyze_video(video_source, video_id: str, target_fps: float = None,
+                  motion_threshold: float = None, binary_path: str = None,
+                  models: tuple = None, progress_callback=None,
+                  cancel_event: threading.Event = None, profile: str = ANALYSIS_PROFILE,
+                  json_path: str = None) -> dict:
+    """
+    Analyze a video file path or RemoteVideoStream and return results.
+    With json_path the results are written there as JSON, and the
+    returned playerTracking entries carry only trackId and metrics.
+    With binary_path the tracks,
+    metrics and summary are also written there as a compressed .npz.
+    models overrides the shared (detection, pose) models and
+    progress_callback(progress, current_frame, total_frames) is called
+    alongside each progress message. Setting cancel_event stops the
+    analysis with AnalysisCancelled. profile sets the model input size
+    and precision; models must be that profile's. Per-stage timings go
+    to the summary, to "metrics" messages and to /metrics.
+    
+    Players are tracked with ByteTrack. Each call has its own tracker, so
+    IDs start fresh per video and shared models carry no tracking state.
+    A track the tracker has dropped is finished right away, so live
+    tracker state stays flat on long videos. Finished tracks are kept as
+    TrackColumns arrays until the results are written, rather than as
+    per-frame dicts.
+    """
     
-    if not detection_model or not pose_model:
+    model_args = inference_args(get_profile(profile))
+    instruments = Instrumentation(parent=service_instruments)
+    
+    detector, pose_estimator = models or (detection_model, pose_model)
+    if not detector or not pose_estimator:
         return {
             "error": "Models not loaded",
             "status": "failed"
         }
     
-    cap = cv2.VideoCapture(video_path)
+    cap = open_capture(video_source)
     if not cap.isOpened():
         return {
             "error": "Could not open video",
@@ -65,8 +249,10 @@ def analyze_video(video_path: str, video_id: str) -> dict:
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    # Track players across frames
-    player_tracks = {}
+    # Track players across frames; finished ones stay columnar until serialization
+    player_tracks = TrackStore()
+    finished_tracks = []
+    tracker = ReplayTracker(TRACKER_CONFIG)
     frame_number = 0
     
     results = {
@@ -88,144 +274,404 @@ def analyze_video(video_path: str, video_id: str) -> dict:
     
     total_players_detected = 0
     
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_number += 1
-        
-        # Progress update every 10 frames
-        if frame_number % 10 == 0:
-            progress = int((frame_number / total_frames) * 100)
-            print(json.dumps({
-                "type": "progress",
-                "progress": progress,
-                "currentFrame": frame_number,
-                "totalFrames": total_frames
-            }), flush=True)
-        
-        # Detect persons
-        detections = detection_model(frame, classes=[0], verbose=False)  # class 0 is person
-        
-        if len(detections) > 0 and len(detections[0].boxes) > 0:
-            boxes = detections[0].boxes
-            total_players_detected += len(boxes)
+    # Which frames get inference; pose runs once per 5 source frames
+    sampling = SamplingPolicy(fps, target_fps=target_fps, motion_threshold=motion_threshold)
+    # A track the tracker hasn't matched for this many source frames has been dropped by it
+    stale_frames = (TRACK_BUFFER + 1) * sampling.max_frame_step
+    stale_check_interval = max(1, int(fps))
+    last_stale_check = 0
+    
+    binary_writer = None
+    if binary_path:
+        binary_writer = NpzResultWriter(binary_path, {
+            "videoId": video_id,
+            "totalFrames": total_frames,
+            "fps": fps,
+            "duration": results["metadata"]["duration"]
+        })
+    
+    def finish_track(track_id, track):
+        # Skip tracks with too few detections (10 source frames' worth)
+        if len(track) < sampling.min_track_detections:
+            return
+        with instruments.time('metrics'):
+            metrics = compute_track_metrics(track.positions, track.timestamps)
+        finished_tracks.append((track_id, track, metrics))
+        if binary_writer:
+            with instruments.time('serialization'):
+                binary_writer.write_track(track_id, track, metrics)
+    
+    def infer(batch):
+        outputs = []
+        for _, _, frame, run_pose in batch:
+            # Detect and track persons
+            with instruments.time('detection'):
+                detections = track_batch(detector, tracker, [frame], classes=[0], **model_args)[0]  # class 0 is person
             
-            # Track each detected person
-            for i, box in enumerate(boxes):
-                track_id = f"player_{i}"
-                bbox = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                
-                if track_id not in player_tracks:
-                    player_tracks[track_id] = {
-                        "trackId": i,
-                        "frames": [],
-                        "metrics": {
-                            "totalDistance": 0,
-                            "averageSpeed": 0,
-                            "maxSpeed": 0,
-                            "timeOnIce": 0
-                        }
-                    }
-                
-                # Calculate center position
-                center_x = float((bbox[0] + bbox[2]) / 2)
-                center_y = float((bbox[1] + bbox[3]) / 2)
-                
-                player_tracks[track_id]["frames"].append({
-                    "frameNumber": frame_number,
-                    "timestamp": frame_number / fps if fps > 0 else 0,
-                    "bbox": {
-                        "x": float(bbox[0]),
-                        "y": float(bbox[1]),
-                        "width": float(bbox[2] - bbox[0]),
-                        "height": float(bbox[3] - bbox[1])
-                    },
-                    "confidence": confidence,
-                    "position": {"x": center_x, "y": center_y}
-                })
-        
-        # Pose estimation (every 5 frames to save processing)
-        if frame_number % 5 == 0:
-            pose_results = pose_model(frame, verbose=False)
-            # Process pose data if needed
-    
-    cap.release()
-    
-    # Calculate metrics for each player
-    for track_id, track_data in player_tracks.items():
-        frames = track_data["frames"]
-        if len(frames) > 1:
-            # Calculate distance traveled
-            total_distance = 0
-            for i in range(1, len(frames)):
-                prev_pos = frames[i-1]["position"]
-                curr_pos = frames[i]["position"]
-                distance = np.sqrt(
-                    (curr_pos["x"] - prev_pos["x"])**2 + 
-                    (curr_pos["y"] - prev_pos["y"])**2
-                )
-                total_distance += distance
+            # Pose estimation (every 5 frames to save processing)
+            if run_pose:
+                with instruments.time('pose'):
+                    pose_results = pose_estimator(frame, verbose=False, **model_args)
+                # Process pose data if needed
+            
+            outputs.append(detections)
+        return outputs
+    
+    def aggregate(batch, outputs):
+        nonlocal frame_number, total_players_detected, last_stale_check
+        if cancel_event and cancel_event.is_set():
+            raise AnalysisCancelled()
+        for (current_frame, timestamp, _, _), detections in zip(batch, outputs):
+            # Progress update every 10 frames (sampled frame numbers may
+            # skip over exact multiples)
+            if current_frame // 10 > frame_number // 10:
+                progress = int((current_frame / total_frames) * 100)
+                print(json.dumps({
+                    "type": "progress",
+                    "progress": progress,
+                    "currentFrame": current_frame,
+                    "totalFrames": total_frames
+                }), flush=True)
+                print(json.dumps({"type": "pipeline", **pipeline.stats()}), flush=True)
+                print(json.dumps({"type": "metrics", **instruments.snapshot()}), flush=True)
+                if progress_callback:
+                    progress_callback(progress, current_frame, total_frames)
+            frame_number = current_frame
+            instruments.add_frames()
             
-            # Estimate metrics (simplified)
-            time_on_ice = len(frames) / fps if fps > 0 else 0
-            avg_speed = (total_distance / time_on_ice) if time_on_ice > 0 else 0
+            # Detections the tracker hasn't confirmed carry no ID and are left out
+            boxes = detections.boxes
+            if boxes is not None and boxes.id is not None and len(boxes) > 0:
+                with instruments.time('aggregation'):
+                    total_players_detected += len(boxes)
+                    
+                    # Track each detected person
+                    player_tracks.add_frame(
+                        current_frame,
+                        timestamp,
+                        boxes.id.int().tolist(),
+                        boxes.xyxy.cpu().numpy(),
+                        boxes.conf.cpu().numpy()
+                    )
             
-            track_data["metrics"] = {
-                "totalDistance": float(total_distance),
-                "averageSpeed": float(avg_speed * 0.01),  # Convert to km/h estimate
-                "maxSpeed": float(avg_speed * 0.015),
-                "timeOnIce": float(time_on_ice)
-            }
-        
-        results["playerTracking"].append(track_data)
+            if current_frame - last_stale_check >= stale_check_interval:
+                for track_id, track in player_tracks.pop_stale(current_frame, stale_frames):
+                    finish_track(track_id, track)
+                last_stale_check = current_frame
+    
+    # Decode, inference and aggregation run as overlapping stages
+    pipeline = FramePipeline(infer, aggregate, queue_size=PIPELINE_QUEUE_SIZE)
+    try:
+        pipeline.run(instruments.time_iterator('decode', sample_frames(cap, fps, sampling)))
+    finally:
+        cap.release()
+    
+    # A failed download looks like a short video to the decoder
+    download_error = getattr(video_source, 'error', None)
+    if download_error:
+        return {
+            "error": f"Failed to download video: {download_error}",
+            "status": "failed"
+        }
+    
+    # Calculate metrics for the players still tracked at the end
+    for track_id, track in player_tracks.items():
+        finish_track(track_id, track)
     
     # Summary statistics
     results["summary"] = {
-        "totalPlayers": len(player_tracks),
-        "averagePlayersPerFrame": total_players_detected / frame_number if frame_number > 0 else 0,
-        "framesAnalyzed": frame_number
+        "totalPlayers": len(finished_tracks),
+        "averagePlayersPerFrame": total_players_detected / sampling.frames_analyzed if sampling.frames_analyzed > 0 else 0,
+        "framesAnalyzed": sampling.frames_analyzed,
+        "profile": profile,
+        "pipeline": pipeline.stats(),
+        "sampling": sampling.stats(),
+        "performance": instruments.snapshot()
     }
+    if isinstance(video_source, RemoteVideoStream):
+        results["summary"]["ingest"] = video_source.stats()
+    
+    if binary_writer:
+        with instruments.time('serialization'):
+            binary_writer.close([], results["summary"])
+    
+    if json_path:
+        with instruments.time('serialization'):
+            write_json_results(json_path, results, finished_tracks)
+        results["playerTracking"] = [
+            {"trackId": track_id, "metrics": metrics} for track_id, _, metrics in finished_tracks
+        ]
+    else:
+        results["playerTracking"] = [
+            {"trackId": track_id, "frames": track.to_frames(), "metrics": metrics}
+            for track_id, track, metrics in finished_tracks
+        ]
     
     return results
 
 
+def parse_analysis_request(data):
+    """
+    Validate an /analyze or /jobs request body. Returns (options, error)
+    where options holds videoUrl, videoId, targetFps, motionThreshold,
+    resultFormat and profile.
+    """
+    if not data or 'videoUrl' not in data or 'videoId' not in data:
+        return None, "Missing videoUrl or videoId"
+    
+    result_format = data.get('resultFormat', 'json')
+    if result_format not in RESULT_FORMATS:
+        return None, f"Unknown resultFormat: {result_format}"
+    
+    profile = data.get('profile') or ANALYSIS_PROFILE
+    if profile not in PROFILES:
+        return None, f"Unknown profile: {profile}"
+    
+    return {
+        'videoUrl': data['videoUrl'],
+        'videoId': data['videoId'],
+        'targetFps': data.get('targetFps'),
+        'motionThreshold': data.get('motionThreshold'),
+        'resultFormat': result_format,
+        'profile': profile
+    }, None
+
+
+def profile_path(video_id):
+    """Where an analysis of video_id is profiled to under PROFILE_DIR"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(video_id))
+    return os.path.join(PROFILE_DIR, f"{safe_id}-{int(time.time())}.prof")
+
+
+def analyze_url(options: dict, result_path: str, models: tuple = None, progress_callback=None):
+    """
+    Download and analyze options['videoUrl'], writing the result in
+    options['resultFormat'] to result_path. Once the download completes
+    its content hash is looked up in the result cache; on a hit the
+    analysis still running on the stream is cancelled and the cached
+    result is copied instead, on a miss the fresh result is cached.
+    """
+    video_id = options['videoId']
+    result_format = options['resultFormat']
+    profile = get_profile(options['profile'], INFERENCE_BACKEND)
+    # The profile's analysis rate applies unless the request sets one
+    target_fps = options['targetFps'] if options['targetFps'] is not None else profile['target_fps']
+    cancel_event = threading.Event()
+    cache_entry = {}
+    
+    def on_downloaded(content_hash):
+        if not result_cache:
+            return
+        key = result_cache.key(
+            content_hash,
+            profile=profile,
+            resultFormat=result_format,
+            targetFps=target_fps,
+            motionThreshold=options['motionThreshold'],
+            codeVersion=SERVICE_CODE_VERSION
+        )
+        cache_entry['key'] = key
+        files = result_cache.get(key)
+        if files and 'result' in files:
+            cache_entry['files'] = files
+            cancel_event.set()
+    
+    results = None
+    with open_video_source(options['videoUrl'], on_downloaded) as video_source:
+        if not cancel_event.is_set():
+            print(f"Analyzing video {video_id}")
+            try:
+                with profiled(profile_path(video_id)) if PROFILE_DIR else nullcontext():
+                    results = analyze_video(
+                        video_source,
+                        video_id,
+                        target_fps=target_fps,
+                        motion_threshold=options['motionThreshold'],
+                        binary_path=result_path if result_format == 'npz' else None,
+                        json_path=result_path if result_format == 'json' else None,
+                        models=models or get_shared_models(options['profile']),
+                        progress_callback=progress_callback,
+                        cancel_event=cancel_event,
+                        profile=options['profile']
+                    )
+            except AnalysisCancelled:
+                pass
+    
+    if results is None:
+        print(f"Serving cached result for video {video_id}")
+        copy_result(cache_entry['files']['result'], result_path, result_format, video_id, indent=None)
+        return
+    
+    if results.get("status") != "completed":
+        raise Exception(results.get("error", "Analysis failed"))
+
+    if 'key' in cache_entry:
+        try:
+            result_cache.put(cache_entry['key'], {'result': result_path})
+        except OSError as e:
+            print(f"WARNING: could not cache result: {e}")
+
+
+def get_shared_models(profile):
+    """Models shared by synchronous /analyze requests for a profile"""
+    if profile == ANALYSIS_PROFILE:
+        return detection_model, pose_model
+    with profile_models_lock:
+        if profile not in profile_models:
+            profile_models[profile] = load_models(profile)
+        return profile_models[profile]
+
+
+def get_job_models(profile=ANALYSIS_PROFILE):
+    """This job thread's own detection and pose models for a profile, loaded on first use"""
+    if not hasattr(job_models, 'models'):
+        job_models.models = {}
+    if profile not in job_models.models:
+        job_models.models[profile] = load_models(profile)
+    return job_models.models[profile]
+
+
+def run_job(job_id: str, options: dict):
+    """Download and analyze a video for a background job, recording progress in the job store"""
+    try:
+        job_store.update(job_id, status='running', started_at=time.time())
+        
+        result_path = os.path.join(JOB_DATA_DIR, 'results', f"{job_id}.{options['resultFormat']}")
+        
+        def on_progress(progress, current_frame, total_frames):
+            job_store.update(job_id, progress=progress, current_frame=current_frame, total_frames=total_frames)
+        
+        print(f"Starting job {job_id} for video {options['videoId']}")
+        analyze_url(options, result_path, models=get_job_models(options['profile']), progress_callback=on_progress)
+        
+        job_store.update(job_id, status='completed', progress=100, result_path=result_path, completed_at=time.time())
+    
+    except Exception as e:
+        print(f"Error in job {job_id}: {e}")
+        job_store.update(job_id, status='failed', error=str(e), completed_at=time.time())
+    
+    finally:
+        job_slots.release()
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "ok",
         "models_loaded": detection_model is not None and pose_model is not None,
+        "profile": ANALYSIS_PROFILE,
+        "backend": INFERENCE_BACKEND or PROFILES.get(ANALYSIS_PROFILE, {}).get('backend'),
+        "jobs": job_store.counts(),
+        "cache": result_cache.stats() if result_cache else None,
         "timestamp": datetime.utcnow().isoformat()
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage timings, frames, memory, jobs and cache counters in the Prometheus text format"""
+    extra = [
+        ('hockey_analysis_jobs', 'gauge', 'Background jobs by status',
+         [({'status': status}, count) for status, count in sorted(job_store.counts().items())])
+    ]
+    if result_cache:
+        cache_stats = result_cache.stats()
+        extra += [
+            ('hockey_analysis_cache_hits_total', 'counter', 'Result cache hits',
+             [({}, cache_stats['hits'])]),
+            ('hockey_analysis_cache_misses_total', 'counter', 'Result cache misses',
+             [({}, cache_stats['misses'])]),
+            ('hockey_analysis_cache_bytes', 'gauge', 'Size of the cached results',
+             [({}, cache_stats['bytes'])])
+        ]
+    return Response(prometheus_text(service_instruments, extra=extra), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a video for background analysis and return its job id"""
+    options, error = parse_analysis_request(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    # Backpressure: refuse new work once running + waiting jobs hit the cap
+    if not job_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many jobs queued, retry later"})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+    
+    try:
+        job_id = job_store.create(options['videoId'], options['videoUrl'], options['resultFormat'])
+        job_executor.submit(run_job, job_id, options)
+    except Exception as e:
+        job_slots.release()
+        return jsonify({"error": str(e), "status": "failed"}), 500
+    
+    return jsonify({
+        "jobId": job_id,
+        "status": "queued",
+        "profile": options['profile'],
+        "statusUrl": f"/jobs/{job_id}",
+        "resultUrl": f"/jobs/{job_id}/result"
+    }), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and progress"""
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_to_json(job))
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Result of a completed job, as JSON or an .npz download"""
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] != 'completed':
+        return jsonify({"error": f"Job is {job['status']}", **job_to_json(job)}), 409
+    
+    if job['result_format'] == 'npz':
+        return send_file(
+            job['result_path'],
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=f"{job['video_id']}.npz"
+        )
+    return send_file(job['result_path'], mimetype='application/json')
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """Analyze video endpoint"""
-    data = request.json
+    options, error = parse_analysis_request(request.json)
+    if error:
+        return jsonify({"error": error}), 400
     
-    if not data or 'videoUrl' not in data or 'videoId' not in data:
-        return jsonify({"error": "Missing videoUrl or videoId"}), 400
+    video_id = options['videoId']
+    result_format = options['resultFormat']
     
-    video_url = data['videoUrl']
-    video_id = data['videoId']
-    
-    # Download video to temp file
-    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as tmp_file:
-        video_path = tmp_file.name
+    with tempfile.NamedTemporaryFile(suffix=f'.{result_format}', delete=False) as tmp_file:
+        result_path = tmp_file.name
     
     try:
-        print(f"Downloading video from {video_url}")
-        if not download_video(video_url, video_path):
-            return jsonify({"error": "Failed to download video"}), 500
+        analyze_url(options, result_path)
         
-        print(f"Analyzing video {video_id}")
-        results = analyze_video(video_path, video_id)
-        
-        return jsonify(results)
+        with open(result_path, 'rb') as f:
+            artifact = io.BytesIO(f.read())
+        if result_format == 'npz':
+            return send_file(
+                artifact,
+                mimetype='application/octet-stream',
+                as_attachment=True,
+                download_name=f'{video_id}.npz'
+            )
+        return send_file(artifact, mimetype='application/json')
     
     except Exception as e:
         print(f"Error analyzing video: {e}")
@@ -233,8 +679,8 @@ def analyze():
     
     finally:
         # Cleanup temp file
-        if os.path.exists(video_path):
-            os.remove(video_path)
+        if os.path.exists(result_path):
+            os.remove(result_path)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+"""
+Job state store for the analysis service
+Keeps job status and progress in SQLite so it is shared by the worker
+threads and request handlers and survives a restart. Result payloads
+are files; the store only records where they are.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Column -> JSON key for the job records returned by the API
+JOB_FIELDS = {
+    'id': 'jobId',
+    'video_id': 'videoId',
+    'status': 'status',
+    'progress': 'progress',
+    'current_frame': 'currentFrame',
+    'total_frames': 'totalFrames',
+    'result_format': 'resultFormat',
+    'error': 'error',
+    'created_at': 'createdAt',
+    'started_at': 'startedAt',
+    'completed_at': 'completedAt'
+}
+
+# Epoch-second columns rendered as ISO timestamps
+TIME_COLUMNS = ('created_at', 'started_at', 'completed_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    video_url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    current_frame INTEGER,
+    total_frames INTEGER,
+    result_format TEXT NOT NULL,
+    result_path TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    completed_at REAL
+)
+"""
+
+
+class JobStore:
+    """SQLite-backed job records, safe to use from several threads"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(SCHEMA)
+
+    def create(self, video_id, video_url, result_format):
+        """Insert a queued job and return its id"""
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, video_id, video_url, status, result_format, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, video_id, video_url, result_format, time.time())
+            )
+        return job_id
+
+    def update(self, job_id, **fields):
+        """Set columns on a job, e.g. update(job_id, status='running')"""
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def get(self, job_id):
+        """The job's row as a dict, or None if there is no such job"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self):
+        """Number of jobs in each status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def fail_unfinished(self, message):
+        """Mark jobs a previous process left queued or running as failed"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, completed_at = ? "
+                "WHERE status IN ('queued', 'running')",
+                (message, time.time())
+            )
+
+
+def job_to_json(job):
+    """API representation of a job row"""
+    record = {}
+    for column, key in JOB_FIELDS.items():
+        value = job[column]
+        if column in TIME_COLUMNS and value is not None:
+            value = datetime.utcfromtimestamp(value).isoformat()
+        record[key] = value
+    return record
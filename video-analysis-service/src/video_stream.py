@@ -0,0 +1,222 @@
+"""
+Streaming video ingest
+Downloads a video into a temp file on a background thread while OpenCV
+decodes it through a file-like reader, so analysis starts before the
+download finishes. Reads of data that hasn't arrived yet block until it
+does. Reads far ahead of the download (e.g. an MP4 `moov` index stored
+at the end of the file) are served with HTTP range requests when the
+server supports them. The downloaded bytes are hashed on the way in, so
+the content hash is known as soon as the download completes.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import requests
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Reads starting more than this far past the downloaded prefix are
+# fetched with a range request, in blocks of at least this size, instead
+# of waiting for the download to get there
+RANGE_BLOCK_SIZE = 64 * 1024
+
+
+def supports_stream_capture():
+    """Whether this OpenCV build can decode from a Python file-like object"""
+    return hasattr(cv2, 'IStreamReader')
+
+
+class RemoteVideoStream(io.BufferedIOBase):
+    """
+    Seekable, readable view of a video being downloaded from `url`.
+    Pass it to `cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])`.
+    on_complete(content_hash) is called from the download thread with the
+    SHA-256 of the video once it has downloaded successfully.
+    """
+
+    def __init__(self, url, chunk_size=DEFAULT_CHUNK_SIZE, timeout=300, on_complete=None):
+        super().__init__()
+        self.url = url
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.on_complete = on_complete
+        self.content_hash = None
+        self._sha256 = hashlib.sha256()
+
+        self._response = requests.get(url, stream=True, timeout=timeout)
+        self._response.raise_for_status()
+        length = self._response.headers.get('Content-Length')
+        self.size = int(length) if length is not None else None
+        self.accepts_ranges = self._response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+
+        fd, self.path = tempfile.mkstemp(suffix='.video')
+        os.close(fd)
+        self._writer = open(self.path, 'wb')
+        self._reader = open(self.path, 'rb')
+
+        self._cond = threading.Condition()
+        self._downloaded = 0
+        self._done = False
+        self._closed_event = threading.Event()
+        self.error = None
+
+        # Out-of-order blocks fetched with range requests: [(start, bytes)]
+        self._ranges = []
+        self._pos = 0
+
+        self.started_at = time.perf_counter()
+        self.download_seconds = None
+        self.range_requests = 0
+
+        self._thread = threading.Thread(target=self._download, name='video-download', daemon=True)
+        self._thread.start()
+
+    def _chunks(self):
+        """Yield response data as it arrives, at most chunk_size bytes at a time"""
+        raw = self._response.raw
+        if not hasattr(raw, 'read1'):  # urllib3 1.x
+            yield from self._response.iter_content(chunk_size=self.chunk_size)
+            return
+        while True:
+            # Unlike iter_content, doesn't wait for a full chunk to arrive
+            chunk = raw.read1(self.chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+
+    def _download(self):
+        complete = False
+        try:
+            for chunk in self._chunks():
+                if self._closed_event.is_set():
+                    return
+                self._writer.write(chunk)
+                self._writer.flush()
+                self._sha256.update(chunk)
+                with self._cond:
+                    self._downloaded += len(chunk)
+                    self._cond.notify_all()
+            complete = True
+        except Exception as e:
+            if not self._closed_event.is_set():
+                self.error = e
+        finally:
+            self._writer.close()
+            self._response.close()
+            with self._cond:
+                self._done = True
+                if self.size is None and self.error is None:
+                    self.size = self._downloaded
+                self.download_seconds = time.perf_counter() - self.started_at
+                self._cond.notify_all()
+
+        if complete:
+            self.content_hash = self._sha256.hexdigest()
+            if self.on_complete:
+                self.on_complete(self.content_hash)
+
+    def _wait_for(self, end):
+        """Block until the downloaded prefix reaches `end` or the download stops"""
+        with self._cond:
+            while self._downloaded < end and not self._done:
+                self._cond.wait()
+            return self._downloaded
+
+    def _total_size(self):
+        if self.size is None:
+            self._wait_for(float('inf'))
+        return self.size
+
+    def _read_range(self, start, size):
+        """Serve a read far ahead of the download from range-request blocks"""
+        for block_start, data in self._ranges:
+            if block_start <= start and start + size <= block_start + len(data):
+                offset = start - block_start
+                return data[offset:offset + size]
+
+        end = min(self._total_size(), start + max(size, RANGE_BLOCK_SIZE)) - 1
+        response = requests.get(self.url, headers={'Range': f'bytes={start}-{end}'}, timeout=self.timeout)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError("Server ignored the range request")
+        self.range_requests += 1
+        self._ranges.append((start, response.content))
+        return response.content[:size]
+
+    # io.BufferedIOBase interface
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._total_size() + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._total_size() - self._pos
+        if size <= 0:
+            return b''
+
+        start = self._pos
+        try:
+            if (self.accepts_ranges and self.size is not None
+                    and start > self._downloaded + RANGE_BLOCK_SIZE):
+                data = self._read_range(start, size)
+            else:
+                available = self._wait_for(start + size)
+                if available <= start:
+                    return b''  # End of file, or the download failed
+                self._reader.seek(start)
+                data = self._reader.read(min(size, available - start))
+        except Exception as e:
+            # Surface as end of stream to the decoder; callers check .error
+            self.error = self.error or e
+            return b''
+
+        self._pos += len(data)
+        return data
+
+    def read1(self, size=-1):
+        return self.read(size)
+
+    def close(self):
+        if self.closed:
+            return
+        self._closed_event.set()
+        self._response.close()  # Unblocks a download waiting on the network
+        self._thread.join(timeout=5)
+        self._reader.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        super().close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'bytesDownloaded': self._downloaded,
+                'totalBytes': self.size,
+                'downloadComplete': self._done,
+                'downloadSeconds': round(self.download_seconds, 3) if self.download_seconds is not None else None,
+                'rangeRequests': self.range_requests,
+                'chunkSize': self.chunk_size
+            }